@@ -1,23 +1,24 @@
 import asyncio
 import os
 import sys
+from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 from loguru import logger
 
 from WebUI.utils.singleton import Singleton
-# 引入键值数据库
+# 引入键值数据库和消息数据库
 from database.keyvalDB import KeyvalDB
+from database.messsagDB import MessageDB
+from utils.bot_stats import BotStats, MESSAGES, USERS
 from utils.plugin_manager import PluginManager
 
 # 确保可以导入根目录模块
 ROOT_DIR = Path(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 sys.path.insert(0, str(ROOT_DIR))
 
-# 键值数据库键名常量
-KEY_MESSAGE_COUNT = "bot:stats:message_count"
-KEY_USER_COUNT = "bot:stats:user_count"
+# 键值数据库键名常量，统计数据的键名见 utils.bot_stats
 KEY_LOG_POSITION = "bot:logs:last_position"
 
 
@@ -66,6 +67,9 @@ class BotBridge(metaclass=Singleton):
         # 初始化数据库
         self._db = KeyvalDB()
 
+        # 和机器人共用的统计计数器
+        self._stats = BotStats()
+
         # 异步初始化数据库
         loop = get_or_create_eventloop()
         loop.run_until_complete(self._db.initialize())
@@ -75,10 +79,7 @@ class BotBridge(metaclass=Singleton):
         获取接收消息数量
         """
         try:
-            result = await self._db.get(KEY_MESSAGE_COUNT)
-            count = int(result) if result is not None else 0
-
-            return count
+            return await self._stats.get(MESSAGES)
         except Exception as e:
             logger.log('WEBUI', f"获取消息计数失败: {str(e)}")
             return 0
@@ -88,9 +89,7 @@ class BotBridge(metaclass=Singleton):
         增加消息计数
         """
         try:
-            current = await self.get_message_count()
-            new_count = current + amount
-            await self._db.set(KEY_MESSAGE_COUNT, str(new_count))
+            self._stats.incr(MESSAGES, amount)
 
             return True
         except Exception as e:
@@ -102,10 +101,7 @@ class BotBridge(metaclass=Singleton):
         获取用户数量
         """
         try:
-            result = await self._db.get(KEY_USER_COUNT)
-            count = int(result) if result is not None else 0
-
-            return count
+            return await self._stats.get(USERS)
         except Exception as e:
             logger.log('WEBUI', f"获取用户计数失败: {str(e)}")
             return 0
@@ -115,9 +111,7 @@ class BotBridge(metaclass=Singleton):
         增加用户计数
         """
         try:
-            current = await self.get_user_count()
-            new_count = current + amount
-            await self._db.set(KEY_USER_COUNT, str(new_count))
+            self._stats.incr(USERS, amount)
 
             return True
         except Exception as e:
@@ -156,6 +150,32 @@ class BotBridge(metaclass=Singleton):
             logger.log('WEBUI', f"获取日志位置失败: {str(e)}")
             return 0
 
+    async def search_messages(self, query: str, from_wxid: str = "", sender_wxid: str = "",
+                              start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                              limit: int = 20, cursor: str = "", order: str = "rank") -> Dict[str, Any]:
+        """
+        搜索消息记录
+
+        返回:
+            Dict[str, Any]: {"messages": 消息列表, "cursor": 下一页的cursor，没有更多时为None}
+        """
+        messages, next_cursor = await MessageDB().search_messages(
+            query, from_wxid=from_wxid or None, sender_wxid=sender_wxid or None,
+            start_time=start_time, end_time=end_time, limit=limit, cursor=cursor or None, order=order)
+        return {
+            "messages": [{
+                "id": msg.id,
+                "msg_id": msg.msg_id,
+                "sender_wxid": msg.sender_wxid,
+                "from_wxid": msg.from_wxid,
+                "msg_type": msg.msg_type,
+                "content": msg.content,
+                "timestamp": msg.timestamp.strftime("%Y-%m-%d %H:%M:%S") if msg.timestamp else "",
+                "is_group": msg.is_group
+            } for msg in messages],
+            "cursor": next_cursor
+        }
+
     def save_profile(self, avatar_url: str = "", nickname: str = "", wxid: str = "", alias: str = ""):
         """保存个人资料信息"""
         self.avatar_url = avatar_url
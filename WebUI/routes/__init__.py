@@ -9,6 +9,7 @@ def register_blueprints(app):
     from .auth import auth_bp
     from .overview import overview_bp
     from .logs import logs_bp
+    from .messages import messages_bp
     from .config import config_bp
     from .plugin import plugin_bp
     from .tools import tools_bp
@@ -21,6 +22,7 @@ def register_blueprints(app):
     app.register_blueprint(auth_bp)
     app.register_blueprint(overview_bp)
     app.register_blueprint(logs_bp)
+    app.register_blueprint(messages_bp)
     app.register_blueprint(config_bp)
     app.register_blueprint(plugin_bp)
     app.register_blueprint(tools_bp)
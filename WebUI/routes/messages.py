@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from flask import Blueprint, render_template, jsonify, request, current_app
+
+from WebUI.services.data_service import data_service
+from WebUI.utils.auth_utils import login_required
+
+# 创建消息记录蓝图
+messages_bp = Blueprint('messages', __name__, url_prefix='/messages')
+
+
+def _parse_time(value):
+    """解析前端传来的时间，支持 datetime-local 和日期格式，为空时返回 None"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+@messages_bp.route('/')
+@login_required
+def index():
+    """消息记录页面首页"""
+    return render_template('messages/index.html', page_title='消息记录')
+
+
+@messages_bp.route('/api/search')
+@login_required
+def search():
+    """搜索消息记录"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({
+            'code': 1,
+            'msg': '请输入搜索内容'
+        })
+
+    try:
+        result = data_service.search_messages(
+            query,
+            from_wxid=request.args.get('from_wxid', '').strip(),
+            sender_wxid=request.args.get('sender_wxid', '').strip(),
+            start_time=_parse_time(request.args.get('start')),
+            end_time=_parse_time(request.args.get('end')),
+            limit=min(max(request.args.get('limit', 20, type=int), 1), 100),
+            cursor=request.args.get('cursor', ''),
+            order=request.args.get('order', 'rank')
+        )
+        return jsonify({
+            'code': 0,
+            'msg': '搜索成功',
+            'data': result
+        })
+    except ValueError as e:
+        return jsonify({
+            'code': 1,
+            'msg': f'参数错误: {str(e)}'
+        })
+    except Exception as e:
+        current_app.logger.error(f"搜索消息失败: {str(e)}")
+        return jsonify({
+            'code': 1,
+            'msg': f'搜索消息失败: {str(e)}'
+        })
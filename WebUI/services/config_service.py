@@ -60,7 +60,8 @@ class ConfigService(metaclass=Singleton):
         # 字段选项（用于表单下拉选择）
         self.field_options = {
             "WechatAPIServer.mode": ["release", "debug"],
-            "XYBot.ignore-mode": ["None", "Whitelist", "Blacklist"]
+            "XYBot.ignore-mode": ["None", "Whitelist", "Blacklist"],
+            "XYBot.keyvalDB-backend": ["sqlite", "redis"]
         }
 
         # 字段验证规则
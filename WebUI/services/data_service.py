@@ -222,6 +222,28 @@ class DataService(metaclass=Singleton):
             logger.error(f"格式化运行时长失败: {str(e)}")
             return "未知"
 
+    @async_to_sync
+    async def search_messages(self, query, from_wxid="", sender_wxid="", start_time=None, end_time=None,
+                              limit=20, cursor="", order="rank"):
+        """
+        搜索消息记录
+
+        参数:
+            query (str): 搜索内容，多个词用空格分隔
+            from_wxid (str): 会话wxid，为空时搜索全部
+            sender_wxid (str): 发送人wxid，为空时搜索全部
+            start_time (datetime): 开始时间
+            end_time (datetime): 结束时间
+            limit (int): 每页条数
+            cursor (str): 上一页返回的cursor
+            order (str): rank 按相关度，time 按时间
+
+        返回:
+            dict: {"messages": 消息列表, "cursor": 下一页的cursor}
+        """
+        return await bot_bridge.search_messages(query, from_wxid, sender_wxid, start_time, end_time,
+                                                limit, cursor, order)
+
     @async_to_sync
     async def increment_message_count(self, amount=1):
         """
@@ -0,0 +1,80 @@
+// 当前搜索条件和下一页的cursor
+let currentSearch = null;
+let nextCursor = null;
+
+$(document).ready(function () {
+    $('#searchForm').submit(function (e) {
+        e.preventDefault();
+        currentSearch = {
+            q: $('#searchQuery').val().trim(),
+            from_wxid: $('#searchFromWxid').val().trim(),
+            sender_wxid: $('#searchSenderWxid').val().trim(),
+            start: $('#searchStart').val(),
+            end: $('#searchEnd').val(),
+            order: $('#searchOrder').val()
+        };
+        nextCursor = null;
+        $('#messageResults').empty();
+        searchMessages();
+    });
+
+    $('#loadMore').click(function () {
+        searchMessages();
+    });
+});
+
+// 搜索消息，有cursor时加载下一页
+function searchMessages() {
+    if (!currentSearch || !currentSearch.q) {
+        return;
+    }
+
+    const params = Object.assign({}, currentSearch);
+    if (nextCursor) {
+        params.cursor = nextCursor;
+    }
+
+    $('#loadMore').prop('disabled', true);
+    $.ajax({
+        url: '/messages/api/search',
+        type: 'GET',
+        data: params,
+        dataType: 'json',
+        success: function (response) {
+            if (response.code === 0) {
+                renderMessages(response.data.messages);
+                nextCursor = response.data.cursor;
+                $('#loadMore').toggleClass('d-none', !nextCursor);
+            } else {
+                showNotification(response.msg, 'danger');
+            }
+        },
+        error: function (xhr, status, error) {
+            showNotification('搜索消息失败: ' + error, 'danger');
+        },
+        complete: function () {
+            $('#loadMore').prop('disabled', false);
+        }
+    });
+}
+
+// 渲染搜索结果，追加到表格末尾
+function renderMessages(messages) {
+    const results = $('#messageResults');
+
+    if (!messages || messages.length === 0) {
+        if (results.children().length === 0) {
+            results.html('<tr><td colspan="4" class="text-center text-muted">没有找到消息</td></tr>');
+        }
+        return;
+    }
+
+    messages.forEach(function (msg) {
+        const row = $('<tr>');
+        row.append($('<td class="text-nowrap">').text(msg.timestamp));
+        row.append($('<td>').text(msg.from_wxid));
+        row.append($('<td>').text(msg.sender_wxid));
+        row.append($('<td class="message-content">').text(msg.content || ''));
+        results.append(row);
+    });
+}
@@ -1,18 +1,23 @@
 from WechatAPI.errors import *
 from .base import WechatAPIClientBase, Proxy, Section
+from .broadcast import BroadcastMixin, BroadcastResult
 from .chatroom import ChatroomMixin
+from .chatroom_members import ChatroomMemberCache
+from .contacts import ContactDirectory
 from .friend import FriendMixin
 from .hongbao import HongBaoMixin
 from .login import LoginMixin
 from .message import MessageMixin
 from .protect import protector
 from .protect import protector
+from .scheduler import SendPriority, SendScheduler, send_priority
 from .tool import ToolMixin
+from .transcoder import Transcoder, transcoder
 from .user import UserMixin
 
 
 class WechatAPIClient(LoginMixin, MessageMixin, FriendMixin, ChatroomMixin, UserMixin,
-                      ToolMixin, HongBaoMixin):
+                      ToolMixin, HongBaoMixin, BroadcastMixin):
 
     # 这里都是需要结合多个功能的方法
 
@@ -40,8 +45,7 @@ class WechatAPIClient(LoginMixin, MessageMixin, FriendMixin, ChatroomMixin, User
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
         output = ""
-        for id in at:
-            nickname = await self.get_nickname(id)
+        for nickname in await self.get_nickname(at):
             output += f"@{nickname}\u2005"
 
         output += content
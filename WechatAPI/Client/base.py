@@ -1,4 +1,8 @@
+import asyncio
 from dataclasses import dataclass
+from typing import Any, Optional
+
+import aiohttp
 
 from WechatAPI.errors import *
 
@@ -34,9 +38,15 @@ class Section:
 class WechatAPIClientBase:
     """微信API客户端基类
 
+    所有接口请求都通过 :meth:`_request` 发出，共用一个长连接的 aiohttp 会话，
+    会话在第一次请求时创建，用 :meth:`close` 关闭。
+
     Args:
         ip (str): 服务器IP地址
         port (int): 服务器端口
+        pool_size (int, optional): 连接池最多保持的连接数. 默认为100
+        timeout (float, optional): 连接和等待响应数据的超时时间(秒)，不限制请求的总时间. 默认为30
+        keepalive (float, optional): 空闲连接保持的时间(秒). 默认为60
 
     Attributes:
         wxid (str): 微信ID
@@ -45,10 +55,19 @@ class WechatAPIClientBase:
         phone (str): 手机号
         ignore_protect (bool): 是否忽略保护机制
     """
-    def __init__(self, ip: str, port: int):
+    # 上传、下载文件的接口的总超时时间(秒)，和 aiohttp 默认的一样
+    MEDIA_TIMEOUT = 300
+
+    def __init__(self, ip: str, port: int, pool_size: int = 100, timeout: float = 30, keepalive: float = 60):
         self.ip = ip
         self.port = port
 
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
         self.wxid = ""
         self.nickname = ""
         self.alias = ""
@@ -59,6 +78,58 @@ class WechatAPIClientBase:
         # 调用所有 Mixin 的初始化方法
         super().__init__()
 
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.ip}:{self.port}"
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共用的会话，没有时创建
+
+        会话绑定在创建它的事件循环上，WebUI 重启机器人会换一个事件循环，这时重新创建。
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive)
+            self._session = aiohttp.ClientSession(base_url=self.base_url,
+                                                  connector=connector,
+                                                  # 只限制连接和读取的等待时间，大文件可以传得久一些
+                                                  timeout=aiohttp.ClientTimeout(total=None,
+                                                                                sock_connect=self.timeout,
+                                                                                sock_read=self.timeout))
+            self._session_loop = loop
+        return self._session
+
+    async def _request(self, path: str, json_param: Optional[dict] = None, method: str = "POST",
+                       timeout: Optional[float] = None, text: bool = False) -> Any:
+        """向WechatAPI发送请求
+
+        Args:
+            path (str): 接口路径，例如 "/SendTextMsg"
+            json_param (dict, optional): 请求体
+            method (str, optional): 请求方法. 默认为POST
+            timeout (float, optional): 本次请求的超时时间(秒)，不填使用会话的超时时间
+            text (bool, optional): 是否返回文本而不是JSON. 默认为False
+
+        Returns:
+            Any: 响应的JSON数据，text为True时为响应文本
+        """
+        kwargs = {}
+        if json_param is not None:
+            kwargs["json"] = json_param
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        async with self._get_session().request(method, path, **kwargs) as response:
+            if text:
+                return await response.text()
+            return await response.json()
+
+    async def close(self):
+        """关闭共用的会话"""
+        session, self._session, self._session_loop = self._session, None, None
+        if session is not None and not session.closed:
+            await session.close()
+
     @staticmethod
     def error_handler(json_resp):
         """处理API响应中的错误码
@@ -75,6 +146,7 @@ class WechatAPIClientBase:
             UserLoggedOut: 用户已退出登录时抛出
             ParsePacketError: 解析数据包错误时抛出
             DatabaseError: 数据库错误时抛出
+            OperationTooFrequent: 操作过于频繁时抛出
             Exception: 其他类型错误时抛出
         """
         code = json_resp.get("Code")
@@ -101,6 +173,6 @@ class WechatAPIClientBase:
         elif code == -11:  # 登陆异常
             raise UserLoggedOut(json_resp.get("Message"))
         elif code == -12:  # 操作过于频繁
-            raise Exception(json_resp.get("Message"))
+            raise OperationTooFrequent(json_resp.get("Message"))
         elif code == -13:  # 上传失败
             raise Exception(json_resp.get("Message"))
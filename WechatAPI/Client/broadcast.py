@@ -0,0 +1,274 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from loguru import logger
+
+from .base import *
+from .scheduler import SendPriority
+from ..errors import *
+
+# 群发可以使用的消息类型: 类型 -> 实际发送的方法
+# 续发时只会调用这里列出的方法
+_SENDERS = {
+    "text": "_send_text_message",
+    "image": "_send_image_message",
+    "voice": "_send_encoded_voice",
+    "link": "_send_link_message",
+    "emoji": "_send_emoji_message",
+    "card": "_send_card_message",
+    "app": "_send_app_message",
+    "cdn_file": "_send_cdn_file_msg",
+    "cdn_img": "_send_cdn_img_msg",
+    "cdn_video": "_send_cdn_video_msg",
+}
+
+# 体积大的参数单独保存成文件，任务文件里只记录文件路径
+_FILE_FIELDS = ("image", "voice_base64")
+
+
+@dataclass
+class BroadcastResult:
+    """群发结果
+
+    Args:
+        job_id (str): 群发任务ID
+        total (int): 目标总数
+        sent (int): 发送成功的数量，包括续发前已经发送的
+        failed (dict): 发送失败的目标和失败原因
+    """
+    job_id: str
+    total: int
+    sent: int = 0
+    failed: dict = field(default_factory=dict)
+
+
+class BroadcastMixin(WechatAPIClientBase):
+    # 群发进度的保存目录（相对于运行目录，和数据库放在一起），进程崩溃后可以用 resume_broadcasts 续发
+    broadcast_state_dir = os.path.join("database", "broadcast")
+
+    async def broadcast(self, targets: list[str], payload: dict, job_id: str = None,
+                        progress: Callable[[int, int], None] = None, max_retries: int = 3,
+                        min_interval: float = 0.2, max_interval: float = 30) -> BroadcastResult:
+        """群发消息。
+
+        消息只构造一次（图片只编码一次，语音只转码一次），再以低优先级交给发送调度器逐个发送，
+        不会挤占指令回复。遇到"操作过于频繁"会放慢速度并重试，发送顺利时逐渐加快。
+        发送进度会保存到硬盘，进程崩溃重启后可以用 :meth:`resume_broadcasts` 继续发送。
+
+        Args:
+            targets (list[str]): 接收人wxid列表
+            payload (dict): 消息内容，type 为消息类型，其余为对应 send_* 方法的参数，例如
+                ``{"type": "image", "image": image_bytes}``、
+                ``{"type": "link", "url": url, "title": title, "description": desc, "thumb_url": thumb}``、
+                ``{"type": "voice", "voice": voice_bytes, "format": "mp3"}``
+            job_id (str, optional): 群发任务ID，相同ID的任务会跳过已经发送过的目标. 默认根据消息内容和目标生成
+            progress (Callable[[int, int], None], optional): 进度回调，参数为(已处理数, 总数)
+            max_retries (int, optional): 每个目标"操作过于频繁"时最多重试的次数. 默认为3
+            min_interval (float, optional): 两次发送之间的最短间隔(秒). 默认为0.2
+            max_interval (float, optional): 两次发送之间的最长间隔(秒). 默认为30
+
+        Returns:
+            BroadcastResult: 群发结果
+
+        Raises:
+            UserLoggedOut: 未登录时调用
+            ValueError: 消息类型不支持时
+        """
+        if not self.wxid:
+            raise UserLoggedOut("请先登录")
+
+        method, kwargs = await self._build_broadcast_payload(payload)
+        targets = list(dict.fromkeys(targets))
+        if job_id is None:
+            job_id = self._broadcast_job_id(method, kwargs, targets)
+
+        await asyncio.to_thread(self._save_broadcast_job, job_id, method, kwargs, targets)
+        return await self._run_broadcast(job_id, method, kwargs, targets, progress,
+                                         max_retries, min_interval, max_interval)
+
+    async def resume_broadcasts(self, max_age: float = 3600) -> list[BroadcastResult]:
+        """继续发送上次没有发送完的群发任务。
+
+        Args:
+            max_age (float, optional): 超过这个时间(秒)的任务不再续发，直接丢弃. 默认为3600
+
+        Returns:
+            list[BroadcastResult]: 每个续发任务的结果
+        """
+        if not os.path.isdir(self.broadcast_state_dir):
+            return []
+
+        results = []
+        names = await asyncio.to_thread(os.listdir, self.broadcast_state_dir)
+        for name in sorted(names):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            try:
+                job = await asyncio.to_thread(self._load_broadcast_job, job_id)
+            except (OSError, ValueError) as e:
+                logger.warning("读取群发任务失败: {} {}", job_id, e)
+                await asyncio.to_thread(self._remove_broadcast_job, job_id)
+                continue
+
+            if time.time() - job.get("created", 0) > max_age or job.get("method") not in _SENDERS.values():
+                logger.info("群发任务已过期，不再续发: {}", job_id)
+                await asyncio.to_thread(self._remove_broadcast_job, job_id)
+                continue
+
+            logger.info("续发群发任务: {}", job_id)
+            results.append(await self._run_broadcast(job_id, job["method"], job["kwargs"], job["targets"]))
+        return results
+
+    async def _build_broadcast_payload(self, payload: dict) -> tuple[str, dict]:
+        """把群发的消息内容构造成 (发送方法, 参数)，媒体数据在这里编码好"""
+        kwargs = dict(payload)
+        msg_type = kwargs.pop("type", None)
+        if msg_type not in _SENDERS:
+            raise ValueError(f"不支持群发的消息类型: {msg_type}")
+
+        if msg_type == "text":
+            kwargs.setdefault("at", "")
+        elif msg_type == "image":
+            image = kwargs["image"]
+            if isinstance(image, bytes):
+                kwargs["image"] = base64.b64encode(image).decode()
+            elif isinstance(image, os.PathLike):
+                kwargs["image"] = base64.b64encode(await asyncio.to_thread(Path(image).read_bytes)).decode()
+        elif msg_type == "voice":
+            voice_base64, duration, voice_type = await self._encode_voice(kwargs["voice"],
+                                                                          kwargs.get("format", "amr"))
+            kwargs = {"voice_base64": voice_base64, "duration": duration, "voice_type": voice_type}
+
+        return _SENDERS[msg_type], kwargs
+
+    async def _run_broadcast(self, job_id: str, method: str, kwargs: dict, targets: list[str],
+                             progress: Callable[[int, int], None] = None, max_retries: int = 3,
+                             min_interval: float = 0.2, max_interval: float = 30) -> BroadcastResult:
+        done = await asyncio.to_thread(self._load_broadcast_progress, job_id)
+        result = BroadcastResult(job_id=job_id, total=len(targets), sent=len(done & set(targets)))
+        queue = asyncio.Queue()
+        for target in targets:
+            if target not in done:
+                queue.put_nowait(target)
+        if result.sent:
+            logger.info("群发任务 {} 已发送 {} 个，继续发送剩余 {} 个", job_id, result.sent, queue.qsize())
+
+        sender = getattr(self, method)
+        # 所有worker共用的发送间隔: 过于频繁时加倍，发送顺利时逐渐缩短
+        pace = {"interval": min_interval}
+        retries = {}
+        progress_log = await asyncio.to_thread(open, self._broadcast_path(job_id, ".done"), "a", encoding="utf-8")
+
+        def report():
+            handled = result.sent + len(result.failed)
+            if progress:
+                progress(handled, result.total)
+            if handled % 50 == 0 or handled == result.total:
+                logger.info("群发任务 {} 进度: {}/{}", job_id, handled, result.total)
+
+        async def worker():
+            while not queue.empty():
+                target = queue.get_nowait()
+                try:
+                    await self.send_scheduler.submit(target, sender, priority=SendPriority.LOW, **kwargs)
+                except OperationTooFrequent as e:
+                    pace["interval"] = min(max_interval, pace["interval"] * 2)
+                    retries[target] = retries.get(target, 0) + 1
+                    if retries[target] <= max_retries:
+                        logger.warning("群发过于频繁，{:.1f}秒后重试: {} ({}/{})",
+                                       pace["interval"], target, retries[target], max_retries)
+                        await asyncio.sleep(pace["interval"])
+                        queue.put_nowait(target)
+                        continue
+                    result.failed[target] = str(e)
+                except (UserLoggedOut, BanProtection):
+                    # 整个任务都发不出去，保留进度等下次续发
+                    raise
+                except Exception as e:
+                    logger.warning("群发失败: {} {}", target, e)
+                    result.failed[target] = str(e)
+                else:
+                    result.sent += 1
+                    await asyncio.to_thread(self._append_broadcast_progress, progress_log, target)
+                    pace["interval"] = max(min_interval, pace["interval"] * 0.8)
+
+                report()
+                await asyncio.sleep(pace["interval"])
+
+        try:
+            # worker数和调度器的并发数一致，真正的限速由调度器和上面的发送间隔负责
+            workers = [asyncio.create_task(worker()) for _ in range(max(1, self.send_scheduler.concurrency))]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for task in workers:
+                    task.cancel()
+                raise
+        finally:
+            await asyncio.to_thread(progress_log.close)
+
+        await asyncio.to_thread(self._remove_broadcast_job, job_id)
+        logger.info("群发任务 {} 完成: 成功 {} 个，失败 {} 个", job_id, result.sent, len(result.failed))
+        return result
+
+    @staticmethod
+    def _broadcast_job_id(method: str, kwargs: dict, targets: list[str]) -> str:
+        digest = hashlib.sha1(json.dumps([method, kwargs, targets], sort_keys=True, default=str).encode())
+        return f"{time.strftime('%Y%m%d')}-{digest.hexdigest()[:12]}"
+
+    def _broadcast_path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.broadcast_state_dir, job_id + suffix)
+
+    def _save_broadcast_job(self, job_id: str, method: str, kwargs: dict, targets: list[str]):
+        """保存群发任务，在线程中调用"""
+        path = self._broadcast_path(job_id, ".json")
+        if os.path.exists(path):
+            return
+        os.makedirs(self.broadcast_state_dir, exist_ok=True)
+
+        kwargs = dict(kwargs)
+        files = {}
+        for name in _FILE_FIELDS:
+            if isinstance(kwargs.get(name), str):
+                files[name] = self._broadcast_path(job_id, "." + name)
+                Path(files[name]).write_text(kwargs.pop(name), encoding="utf-8")
+
+        job = {"method": method, "kwargs": kwargs, "files": files, "targets": targets, "created": time.time()}
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def _load_broadcast_job(self, job_id: str) -> dict:
+        """读取群发任务，单独保存的参数读回 kwargs，在线程中调用"""
+        with open(self._broadcast_path(job_id, ".json"), "r", encoding="utf-8") as f:
+            job = json.load(f)
+        for name, path in job.get("files", {}).items():
+            job["kwargs"][name] = Path(path).read_text(encoding="utf-8")
+        return job
+
+    @staticmethod
+    def _append_broadcast_progress(progress_log, target: str):
+        progress_log.write(target + "\n")
+        progress_log.flush()
+
+    def _load_broadcast_progress(self, job_id: str) -> set[str]:
+        try:
+            with open(self._broadcast_path(job_id, ".done"), "r", encoding="utf-8") as f:
+                return {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def _remove_broadcast_job(self, job_id: str):
+        for suffix in (".json", ".done", *("." + name for name in _FILE_FIELDS)):
+            try:
+                os.remove(self._broadcast_path(job_id, suffix))
+            except FileNotFoundError:
+                pass
@@ -1,13 +1,18 @@
 from typing import Union, Any
 
-import aiohttp
 
 from .base import *
+from .chatroom_members import ChatroomMemberCache
 from .protect import protector
 from ..errors import *
 
 
 class ChatroomMixin(WechatAPIClientBase):
+    def __init__(self, ip: str, port: int, **kwargs):
+        super().__init__(ip, port, **kwargs)
+        # 群成员列表缓存，读取群成员请用 chatroom_members.get
+        self.chatroom_members = ChatroomMemberCache(self)
+
     async def add_chatroom_member(self, chatroom: str, wxid: str) -> bool:
         """添加群成员(群聊最多40人)
 
@@ -23,15 +28,13 @@ class ChatroomMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/AddChatroomMember', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
+        json_resp = await self._request("/AddChatroomMember", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_announce(self, chatroom: str) -> dict:
         """获取群聊公告
@@ -45,17 +48,15 @@ class ChatroomMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomInfo', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._request("/GetChatroomInfo", json_param)
 
-            if json_resp.get("Success"):
-                data = dict(json_resp.get("Data"))
-                data.pop("BaseResponse")
-                return data
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            data = dict(json_resp.get("Data"))
+            data.pop("BaseResponse")
+            return data
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_info(self, chatroom: str) -> dict:
         """获取群聊信息
@@ -71,18 +72,16 @@ class ChatroomMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomInfoNoAnnounce', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._request("/GetChatroomInfoNoAnnounce", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("ContactList")[0]
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("ContactList")[0]
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_member_list(self, chatroom: str) -> list[dict]:
-        """获取群聊成员列表
+        """获取群聊成员列表，每次都会请求接口，一般请用有缓存的 ``chatroom_members.get``
 
         Args:
             chatroom: 群聊id
@@ -93,15 +92,13 @@ class ChatroomMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomMemberDetail', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._request("/GetChatroomMemberDetail", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("NewChatroomData").get("ChatRoomMember")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("NewChatroomData").get("ChatRoomMember")
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_qrcode(self, chatroom: str) -> dict[str, Any]:
         """获取群聊二维码
@@ -117,16 +114,14 @@ class ChatroomMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(86400):
             raise BanProtection("获取二维码需要在登录后24小时才可使用")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomQRCode', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._request("/GetChatroomQRCode", json_param)
 
-            if json_resp.get("Success"):
-                data = json_resp.get("Data")
-                return {"base64": data.get("qrcode").get("buffer"), "description": data.get("revokeQrcodeWording")}
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            data = json_resp.get("Data")
+            return {"base64": data.get("qrcode").get("buffer"), "description": data.get("revokeQrcodeWording")}
+        else:
+            self.error_handler(json_resp)
 
     async def invite_chatroom_member(self, wxid: Union[str, list], chatroom: str) -> bool:
         """邀请群聊成员(群聊大于40人)
@@ -146,15 +141,13 @@ class ChatroomMixin(WechatAPIClientBase):
         if isinstance(wxid, list):
             wxid = ",".join(wxid)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/InviteChatroomMember', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
+        json_resp = await self._request("/InviteChatroomMember", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
         
     async def get_chatroom_name(self, chatroom: str) -> dict:
         """
@@ -209,7 +202,7 @@ class ChatroomMixin(WechatAPIClientBase):
         Returns:
             str: 群聊用户名
         """
-        group_info = await self.get_chatroom_member_list(chatroom)
+        group_info = await self.chatroom_members.get(chatroom)
 
         for user in group_info:
             if user.get("UserName") == user_id:
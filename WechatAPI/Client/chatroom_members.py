@@ -0,0 +1,139 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List
+
+from loguru import logger
+
+
+class ChatroomMemberCache:
+    """群成员列表缓存
+
+    群成员列表一次要拉取几百人，这里缓存下来，进群、踢人的系统消息到达时用 :meth:`add` / :meth:`remove` 增量更新，
+    只有超过 refresh_interval 后才重新完整拉取一次（拉取在后台进行，期间继续返回旧的列表）。
+    退群不会收到系统消息，靠定期完整拉取更新。
+
+    设置了 store 时，成员列表会保存到数据库，重启后先用数据库里的列表，再在后台刷新。
+    store 需要提供 ``async_get_chatroom_member_list(chatroom)`` 和 ``async_set_chatroom_member_list(chatroom, members)``。
+
+    Args:
+        client: WechatAPI客户端
+        refresh_interval: 完整拉取的间隔(秒)
+        store: 持久化存储，例如 XYBotDB
+    """
+
+    def __init__(self, client, refresh_interval: float = 3600, store=None):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.store = store
+
+        # 群聊id -> 成员列表，成员格式和 get_chatroom_member_list 的返回值一致
+        self._members: Dict[str, List[dict]] = {}
+        # 群聊id -> 上次完整拉取的时间，从数据库读出来的列表没有记录，视为需要刷新
+        self._refreshed: Dict[str, float] = {}
+        # 正在完整拉取的群聊，同一个群同时只拉取一次
+        self._refreshing: Dict[str, asyncio.Future] = {}
+        self._tasks: set = set()
+
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, chatroom: str) -> List[dict]:
+        """获取群成员列表，返回的列表可以随意修改"""
+        members = self._members.get(chatroom)
+        if members is None and self.store is not None:
+            members = await self.store.async_get_chatroom_member_list(chatroom)
+            if members:
+                # 另一个协程可能已经拉取到了新的列表
+                members = self._members.setdefault(chatroom, members)
+            else:
+                members = None
+
+        if members is None:
+            self.misses += 1
+            return list(await self.refresh(chatroom))
+
+        self.hits += 1
+        if time.monotonic() - self._refreshed.get(chatroom, float("-inf")) > self.refresh_interval:
+            self._refresh_in_background(chatroom)
+        return list(members)
+
+    async def get_wxids(self, chatroom: str) -> List[str]:
+        return [member.get("UserName") for member in await self.get(chatroom)]
+
+    async def refresh(self, chatroom: str) -> List[dict]:
+        """立即完整拉取一次群成员列表"""
+        future = self._refreshing.get(chatroom)
+        if future is None:
+            future = asyncio.ensure_future(self._refresh(chatroom))
+            self._refreshing[chatroom] = future
+            future.add_done_callback(lambda _: self._refreshing.pop(chatroom, None))
+        return await asyncio.shield(future)
+
+    def add(self, chatroom: str, members: Iterable[dict]):
+        """有人进群时调用，members 至少包含 UserName，没有缓存这个群时忽略"""
+        cached = self._members.get(chatroom)
+        if cached is None:
+            return
+        existing = {member.get("UserName") for member in cached}
+        added = [member for member in members if member.get("UserName") not in existing]
+        if added:
+            self._members[chatroom] = cached + added
+            self._save(chatroom)
+
+    def remove(self, chatroom: str, wxids: Iterable[str]):
+        """有人被移出群聊时调用，没有缓存这个群时忽略"""
+        cached = self._members.get(chatroom)
+        if cached is None:
+            return
+        wxids = set(wxids)
+        kept = [member for member in cached if member.get("UserName") not in wxids]
+        if len(kept) != len(cached):
+            self._members[chatroom] = kept
+            self._save(chatroom)
+
+    def invalidate(self, chatroom: str = None):
+        """下次读取时重新完整拉取，不传参数时对所有群生效"""
+        if chatroom is None:
+            self._refreshed.clear()
+        else:
+            self._refreshed.pop(chatroom, None)
+
+    def stats(self) -> dict:
+        return {"chatrooms": len(self._members), "refreshing": len(self._refreshing),
+                "hits": self.hits, "misses": self.misses}
+
+    async def _refresh(self, chatroom: str) -> List[dict]:
+        members = await self.client.get_chatroom_member_list(chatroom) or []
+        self._members[chatroom] = members
+        self._refreshed[chatroom] = time.monotonic()
+        self._save(chatroom)
+        return members
+
+    def _refresh_in_background(self, chatroom: str):
+        if chatroom in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self.refresh(chatroom)
+            except Exception as e:
+                logger.warning("刷新群成员列表失败: {} {}", chatroom, e)
+
+        self._track(refresh())
+
+    def _save(self, chatroom: str):
+        if self.store is None:
+            return
+
+        async def save(members):
+            try:
+                await self.store.async_set_chatroom_member_list(chatroom, members)
+            except Exception as e:
+                logger.warning("保存群成员列表失败: {} {}", chatroom, e)
+
+        self._track(save(list(self._members[chatroom])))
+
+    def _track(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,189 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+
+class ContactDirectory:
+    """联系人目录，带缓存和自动合并请求
+
+    - 查询过的联系人按 ttl 缓存，超过 max_entries 时淘汰最久没用过的
+    - 同一时刻各插件零散查询的单个 wxid 会自动合并，每 batch_size 个调用一次 GetContractDetail
+      （DataLoader 的做法：先收集一小段时间内的请求，再一次性查询）
+    - 查不到的 wxid 也缓存 negative_ttl 秒，避免反复查询不存在的联系人
+    - 联系人资料变化时用 :meth:`invalidate` 或 :meth:`update` 更新缓存
+
+    Args:
+        client: WechatAPI客户端
+        ttl: 缓存有效期(秒)
+        negative_ttl: 查不到的联系人的缓存有效期(秒)
+        max_entries: 最多缓存的联系人数
+        batch_size: 每次查询的联系人数上限，接口最多支持20个
+        batch_delay: 收集请求的时间(秒)
+        max_concurrency: 最多同时进行的批量请求数
+    """
+
+    def __init__(self, client, ttl: float = 3600, max_entries: int = 5000, batch_size: int = 20,
+                 batch_delay: float = 0.01, max_concurrency: int = 2, negative_ttl: float = 60):
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_concurrency = max_concurrency
+
+        # wxid -> (联系人信息, 过期时间)
+        self._cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+        # 等待合并查询的 wxid -> future
+        self._queued: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+        # 已经发出查询、还没返回的 wxid -> future
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+
+    async def get(self, wxid: str) -> dict:
+        """获取单个联系人信息，不存在时返回空字典"""
+        cached = self._get_cached(wxid)
+        if cached is not None:
+            return cached
+        return await self._load(wxid)
+
+    async def get_many(self, wxids: Iterable[str]) -> List[dict]:
+        """获取多个联系人信息，不限数量，按输入顺序返回"""
+        wxids = list(wxids)
+        return list(await asyncio.gather(*(self.get(wxid) for wxid in wxids)))
+
+    async def nickname(self, wxid: str) -> str:
+        """获取昵称，查不到时返回空字符串"""
+        return self.get_nickname(await self.get(wxid))
+
+    async def nicknames(self, wxids: Iterable[str]) -> List[str]:
+        return [self.get_nickname(contact) for contact in await self.get_many(wxids)]
+
+    @staticmethod
+    def get_nickname(contact: dict) -> str:
+        try:
+            return contact.get("NickName").get("string") or ""
+        except AttributeError:
+            return ""
+
+    def update(self, contacts: Iterable[dict]):
+        """用新的联系人资料覆盖缓存"""
+        for contact in contacts:
+            wxid = self._wxid_of(contact)
+            if wxid:
+                self._put(wxid, contact)
+
+    def invalidate(self, wxids: Iterable[str] = None):
+        """删除缓存，不传参数时清空全部缓存"""
+        if wxids is None:
+            self._cache.clear()
+            return
+        if isinstance(wxids, str):
+            wxids = [wxids]
+        for wxid in wxids:
+            self._cache.pop(wxid, None)
+
+    def apply_sync(self, data: dict):
+        """根据同步消息中的 ModContacts / DelContacts 更新缓存"""
+        if not data:
+            return
+        self.update(data.get("ModContacts") or [])
+        self.invalidate([self._wxid_of(contact) for contact in data.get("DelContacts") or []])
+
+    def stats(self) -> dict:
+        return {"entries": len(self._cache), "hits": self.hits, "misses": self.misses, "requests": self.requests}
+
+    @staticmethod
+    def _wxid_of(contact: dict) -> str:
+        username = contact.get("UserName")
+        if isinstance(username, dict):
+            return username.get("string") or ""
+        return username or ""
+
+    def _get_cached(self, wxid: str) -> Optional[dict]:
+        entry = self._cache.get(wxid)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._cache[wxid]
+            self.misses += 1
+            return None
+        self._cache.move_to_end(wxid)
+        self.hits += 1
+        return entry[0]
+
+    def _put(self, wxid: str, contact: dict, ttl: float = None):
+        self._cache[wxid] = (contact, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._cache.move_to_end(wxid)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _load(self, wxid: str) -> dict:
+        future = self._inflight.get(wxid) or self._queued.get(wxid)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._queued[wxid] = future
+            if len(self._queued) >= self.batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.batch_delay, self._flush)
+        # shield: 一个调用方被取消时，不影响合并在同一批里的其他调用方
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        """把排队的 wxid 按 batch_size 分批发出查询"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._queued:
+            batch = {}
+            while self._queued and len(batch) < self.batch_size:
+                wxid, future = self._queued.popitem(last=False)
+                batch[wxid] = future
+            self._inflight.update(batch)
+            task = asyncio.ensure_future(self._fetch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: Dict[str, asyncio.Future]):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # WebUI 重启机器人会换一个事件循环
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+
+        try:
+            async with self._slots:
+                self.requests += 1
+                contacts = await self.client.get_contract_detail(list(batch))
+            found = {}
+            for contact in contacts or []:
+                wxid = self._wxid_of(contact)
+                if wxid:
+                    found[wxid] = contact
+                    self._put(wxid, contact)
+
+            for wxid, future in batch.items():
+                if wxid not in found and self.negative_ttl > 0:
+                    # 不存在的联系人短时间内不再查询
+                    self._put(wxid, {}, self.negative_ttl)
+                if not future.done():
+                    future.set_result(found.get(wxid, {}))
+        except Exception as e:
+            logger.debug("批量获取联系人失败: {} {}", list(batch), e)
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for wxid in batch:
+                self._inflight.pop(wxid, None)
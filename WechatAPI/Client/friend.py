@@ -1,15 +1,17 @@
 from typing import Union
 
-import aiohttp
-
 from .base import *
+from .contacts import ContactDirectory
 from .protect import protector
 from ..errors import *
 
-from loguru import logger
-
 
 class FriendMixin(WechatAPIClientBase):
+    def __init__(self, ip: str, port: int, **kwargs):
+        super().__init__(ip, port, **kwargs)
+        # 联系人缓存，get_nickname 等查询会自动合并成批量请求
+        self.contacts = ContactDirectory(self)
+
     async def accept_friend(self, scene: int, v1: str, v2: str) -> bool:
         """接受好友请求
 
@@ -37,15 +39,13 @@ class FriendMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Scene": scene, "V1": v1, "V2": v2}
-            response = await session.post(f'http://{self.ip}:{self.port}/AcceptFriend', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Scene": scene, "V1": v1, "V2": v2}
+        json_resp = await self._request("/AcceptFriend", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def get_contact(self, wxid: Union[str, list[str]]) -> Union[dict, list[dict]]:
         """获取联系人信息
@@ -62,19 +62,17 @@ class FriendMixin(WechatAPIClientBase):
         if isinstance(wxid, list):
             wxid = ",".join(wxid)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "RequestWxids": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContact', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                contact_list = json_resp.get("Data").get("ContactList")
-                if len(contact_list) == 1:
-                    return contact_list[0]
-                else:
-                    return contact_list
+        json_param = {"Wxid": self.wxid, "RequestWxids": wxid}
+        json_resp = await self._request("/GetContact", json_param)
+
+        if json_resp.get("Success"):
+            contact_list = json_resp.get("Data").get("ContactList")
+            if len(contact_list) == 1:
+                return contact_list[0]
             else:
-                self.error_handler(json_resp)
+                return contact_list
+        else:
+            self.error_handler(json_resp)
 
     async def get_contract_detail(self, wxid: Union[str, list[str]], chatroom: str = "") -> list:
         """获取联系人详情
@@ -95,15 +93,13 @@ class FriendMixin(WechatAPIClientBase):
             wxid = ",".join(wxid)
 
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "RequestWxids": wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContractDetail', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "RequestWxids": wxid, "Chatroom": chatroom}
+        json_resp = await self._request("/GetContractDetail", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("ContactList")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("ContactList")
+        else:
+            self.error_handler(json_resp)
 
     async def get_contract_list(self, wx_seq: int = 0, chatroom_seq: int = 0) -> dict:
         """获取联系人列表
@@ -118,40 +114,26 @@ class FriendMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "CurrentWxcontactSeq": wx_seq, "CurrentChatroomContactSeq": chatroom_seq}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContractList', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "CurrentWxcontactSeq": wx_seq, "CurrentChatroomContactSeq": chatroom_seq}
+        json_resp = await self._request("/GetContractList", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
 
     async def get_nickname(self, wxid: Union[str, list[str]]) -> Union[str, list[str]]:
         """获取用户昵称
 
+        结果会缓存，同时发起的查询会合并成一次请求，见 :class:`ContactDirectory`
+
         Args:
-            wxid: 用户wxid，可以是单个wxid或最多20个wxid的列表
+            wxid: 用户wxid，可以是单个wxid或wxid列表，列表长度不限
 
         Returns:
-            Union[str, list[str]]: 如果输入单个wxid返回str，如果输入wxid列表则返回对应的昵称列表
+            Union[str, list[str]]: 如果输入单个wxid返回str，如果输入wxid列表则返回对应的昵称列表，查不到的昵称为空字符串
         """
-        data = await self.get_contract_detail(wxid)
-
-        logger.debug(f"获取昵称: {data}")
-
         if isinstance(wxid, str):
-            try:
-                return data[0].get("NickName").get("string")
-            except:
-                return ""
+            return await self.contacts.nickname(wxid)
         else:
-            result = []
-            for contact in data:
-                try:
-                    result.append(contact.get("NickName").get("string"))
-                except:
-                    result.append("")
-            return result
-            
\ No newline at end of file
+            return await self.contacts.nicknames(wxid)
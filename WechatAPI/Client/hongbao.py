@@ -1,5 +1,3 @@
-import aiohttp
-
 from .base import *
 from ..errors import *
 
@@ -19,12 +17,10 @@ class HongBaoMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Xml": xml, "EncryptKey": encrypt_key, "EncryptUserinfo": encrypt_userinfo}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetHongBaoDetail', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Xml": xml, "EncryptKey": encrypt_key, "EncryptUserinfo": encrypt_userinfo}
+        json_resp = await self._request("/GetHongBaoDetail", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
@@ -0,0 +1,92 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+
+class MediaCache:
+    """已上传媒体的CDN XML缓存，按内容哈希索引
+
+    同一张图片、同一个视频发给很多人时，只有第一次真正上传。上传成功后，机器人自己发出的消息
+    会从同步消息里回来，里面带着这次上传的CDN XML，用 :meth:`observe` 记下来。
+    之后再发送相同内容时直接用 send_cdn_*_msg 转发，转发失败时调用方应 :meth:`invalidate` 并重新上传。
+
+    Args:
+        ttl: CDN XML 的有效期(秒)，微信CDN上的文件会过期，过期后重新上传
+        max_entries: 最多缓存的条数，超过时淘汰最久没用过的
+        pending_ttl: 上传后等待回显消息的最长时间(秒)
+    """
+
+    def __init__(self, ttl: float = 86400, max_entries: int = 1024, pending_ttl: float = 300):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.pending_ttl = pending_ttl
+
+        # (类型, 哈希) -> (xml, 过期时间)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        # 等待回显的上传: NewMsgId -> (类型, 哈希, 等待截止时间)
+        self._pending: Dict[str, Tuple[str, str, float]] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data: Union[str, bytes]) -> str:
+        """媒体内容的哈希，data 可以是原始字节或 base64 字符串（同一份内容要用同一种形式）"""
+        if isinstance(data, str):
+            data = data.encode()
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, kind: str, digest: str) -> Optional[str]:
+        """取出可用于转发的CDN XML，没有或已过期时返回 None"""
+        entry = self._entries.get((kind, digest))
+        if entry is None or entry[1] < time.time():
+            if entry is not None:
+                del self._entries[(kind, digest)]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end((kind, digest))
+        self.hits += 1
+        return entry[0]
+
+    def put(self, kind: str, digest: str, xml: str):
+        self._entries[(kind, digest)] = (xml, time.time() + self.ttl)
+        self._entries.move_to_end((kind, digest))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def is_stale_error(error: Exception) -> bool:
+        """转发失败的原因是不是缓存的 XML 不能用了，只有这时才应该 invalidate 并重新上传
+
+        服务器拒绝 XML 时 error_handler 抛出的是 ValueError(参数错误)或普通 Exception(链接过期、上传失败、其他错误)。
+        操作过于频繁、未登录、网络超时等错误和 XML 无关，重新上传只会更慢，应当直接抛出。
+        """
+        return type(error) in (Exception, ValueError)
+
+    def invalidate(self, kind: str, digest: str):
+        """转发失败时删除缓存，下次重新上传"""
+        self._entries.pop((kind, digest), None)
+
+    def expect(self, new_msg_id, kind: str, digest: str):
+        """记录一次上传，等待这条消息的回显"""
+        if not new_msg_id:
+            return
+        now = time.time()
+        if len(self._pending) > self.max_entries:
+            self._pending = {msg_id: item for msg_id, item in self._pending.items() if item[2] > now}
+        self._pending[str(new_msg_id)] = (kind, digest, now + self.pending_ttl)
+
+    def observe(self, new_msg_id, kind: str, xml: str) -> bool:
+        """收到机器人自己发出的媒体消息时调用，是等待中的上传时记下CDN XML"""
+        pending = self._pending.pop(str(new_msg_id), None)
+        if pending is None or pending[0] != kind or pending[2] < time.time() or not xml:
+            return False
+
+        self.put(kind, pending[1], xml)
+        return True
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "pending": len(self._pending),
+                "hits": self.hits, "misses": self.misses}
@@ -1,64 +1,35 @@
-import asyncio
 import base64
 import os
-from asyncio import Future
-from asyncio import Queue, sleep
 from io import BytesIO
 from pathlib import Path
 from typing import Union
 
-import aiohttp
-import pysilk
 from loguru import logger
-from pydub import AudioSegment
 from pymediainfo import MediaInfo
 
 from .base import *
+from .media_cache import MediaCache
 from .protect import protector
+from .scheduler import SendScheduler
+from .transcoder import transcoder
 from ..errors import *
 
 
 class MessageMixin(WechatAPIClientBase):
-    def __init__(self, ip: str, port: int):
-        # 初始化消息队列
-        super().__init__(ip, port)
-        self._message_queue = Queue()
-        self._is_processing = False
-
-    async def _process_message_queue(self):
+    def __init__(self, ip: str, port: int, **kwargs):
+        super().__init__(ip, port, **kwargs)
+        # 消息发送调度器，按接收人限速，限速设置见 SendScheduler.configure
+        self.send_scheduler = SendScheduler()
+        # 已上传图片、视频的CDN XML，相同内容再次发送时直接转发
+        self.media_cache = MediaCache()
+        # 同步消息记录器，设置后每次同步到的原始数据都会交给它保存，见 utils.sync_capture.SyncRecorder
+        self.sync_recorder = None
+
+    async def _queue_message(self, func, wxid: str, *args, **kwargs):
         """
-        处理消息队列的异步方法
+        将消息交给发送调度器，等待发送结果
         """
-        if self._is_processing:
-            return
-
-        self._is_processing = True
-        while True:
-            if self._message_queue.empty():
-                self._is_processing = False
-                break
-
-            func, args, kwargs, future = await self._message_queue.get()
-            try:
-                result = await func(*args, **kwargs)
-                future.set_result(result)
-            except Exception as e:
-                future.set_exception(e)
-            finally:
-                self._message_queue.task_done()
-                await sleep(1)  # 消息发送间隔1秒
-
-    async def _queue_message(self, func, *args, **kwargs):
-        """
-        将消息添加到队列
-        """
-        future = Future()
-        await self._message_queue.put((func, args, kwargs, future))
-
-        if not self._is_processing:
-            asyncio.create_task(self._process_message_queue())
-
-        return await future
+        return await self.send_scheduler.submit(wxid, func, *args, **kwargs)
 
     async def revoke_message(self, wxid: str, client_msg_id: int, create_time: int, new_msg_id: int) -> bool:
         """撤回消息。
@@ -82,20 +53,18 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "ClientMsgId": client_msg_id, "CreateTime": create_time,
-                          "NewMsgId": new_msg_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/RevokeMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("消息撤回成功: 对方wxid:{} ClientMsgId:{} CreateTime:{} NewMsgId:{}",
-                            wxid,
-                            client_msg_id,
-                            new_msg_id)
-                return True
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "ClientMsgId": client_msg_id, "CreateTime": create_time,
+                      "NewMsgId": new_msg_id}
+        json_resp = await self._request("/RevokeMsg", json_param)
+
+        if json_resp.get("Success"):
+            logger.info("消息撤回成功: 对方wxid:{} ClientMsgId:{} CreateTime:{} NewMsgId:{}",
+                        wxid,
+                        client_msg_id,
+                        new_msg_id)
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def send_text_message(self, wxid: str, content: str, at: Union[list, str] = "", type: int = 1) -> tuple[int, int, int]:
         """发送文本消息。
@@ -113,7 +82,7 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_text_message, wxid, content, type, at)
+        return await self._queue_message(self._send_text_message, wxid, content, at, type)
 
     async def _send_text_message(self, wxid: str, content: str, at: list[str] = None, type: int = 1) -> tuple[int, int, int]:
         """
@@ -124,26 +93,24 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        if isinstance(at, str):
+        if at is None:
+            at_str = ""
+        elif isinstance(at, str):
             at_str = at
         elif isinstance(at, list):
-            if at is None:
-                at = []
             at_str = ",".join(at)
         else:
             raise ValueError("Argument 'at' should be str or list")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": content, "Type": type, "At": at_str}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendTextMsg', json=json_param)
-            json_resp = await response.json()
-            if json_resp.get("Success"):
-                logger.info("发送文字消息: 对方wxid:{} at:{} 内容:{}", wxid, at, content)
-                data = json_resp.get("Data")
-                return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
-                    0].get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": content, "Type": type, "At": at_str}
+        json_resp = await self._request("/SendTextMsg", json_param)
+        if json_resp.get("Success"):
+            logger.info("发送文字消息: 对方wxid:{} at:{} 内容:{}", wxid, at, content)
+            data = json_resp.get("Data")
+            return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
+                0].get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> tuple[int, int, int]:
         """发送图片消息。
@@ -180,18 +147,29 @@ class MessageMixin(WechatAPIClientBase):
         else:
             raise ValueError("Argument 'image' can only be str, bytes, or os.PathLike")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": image}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendImageMsg', json=json_param)
-            json_resp = await response.json()
+        # 相同的图片上传过时直接转发
+        digest = self.media_cache.key(image)
+        xml = self.media_cache.get("image", digest)
+        if xml:
+            try:
+                return await self._send_cdn_img_msg(wxid, xml)
+            except Exception as e:
+                if not self.media_cache.is_stale_error(e):
+                    raise
+                logger.warning("转发已上传的图片失败，重新上传: {}", e)
+                self.media_cache.invalidate("image", digest)
+
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": image}
+        json_resp = await self._request("/SendImageMsg", json_param, timeout=self.MEDIA_TIMEOUT)
 
-            if json_resp.get("Success"):
-                json_param.pop('Base64')
-                logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
-                data = json_resp.get("Data")
-                return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            json_param.pop('Base64')
+            logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
+            data = json_resp.get("Data")
+            self.media_cache.expect(data.get("Newmsgid"), "image", digest)
+            return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
+        else:
+            self.error_handler(json_resp)
 
     async def send_video_message(self, wxid: str, video: Union[str, bytes, os.PathLike],
                                  image: [str, bytes, os.PathLike] = None):
@@ -213,24 +191,16 @@ class MessageMixin(WechatAPIClientBase):
                 """
         if not image:
             image = Path(os.path.join(Path(__file__).resolve().parent, "fallback.png"))
-        # get video base64 and duration
+        # get video base64
         if isinstance(video, str):
             vid_base64 = video
-            video = base64.b64decode(video)
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
         elif isinstance(video, bytes):
             vid_base64 = base64.b64encode(video).decode()
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
         elif isinstance(video, os.PathLike):
             with open(video, "rb") as f:
-                file_len = len(f.read())
                 vid_base64 = base64.b64encode(f.read()).decode()
-            media_info = MediaInfo.parse(video)
         else:
             raise ValueError("video should be str, bytes, or path")
-        duration = media_info.tracks[0].duration
 
         # get image base64
         if isinstance(image, str):
@@ -243,21 +213,40 @@ class MessageMixin(WechatAPIClientBase):
         else:
             raise ValueError("image should be str, bytes, or path")
 
+        # 相同的视频（和封面）上传过时直接转发
+        digest = self.media_cache.key(vid_base64 + image_base64)
+        xml = self.media_cache.get("video", digest)
+        if xml:
+            try:
+                return await self._send_cdn_video_msg(wxid, xml)
+            except Exception as e:
+                if not self.media_cache.is_stale_error(e):
+                    raise
+                logger.warning("转发已上传的视频失败，重新上传: {}", e)
+                self.media_cache.invalidate("video", digest)
+
+        # get video duration
+        video_byte = base64.b64decode(vid_base64)
+        file_len = len(video_byte)
+        media_info = MediaInfo.parse(BytesIO(video_byte))
+        duration = media_info.tracks[0].duration
+
         # 打印预估时间，300KB/s
         predict_time = int(file_len / 1024 / 300)
         logger.info("开始发送视频: 对方wxid:{} 视频base64略 图片base64略 预计耗时:{}秒", wxid, predict_time)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": vid_base64, "ImageBase64": image_base64,
-                          "PlayLength": duration}
-            async with session.post(f'http://{self.ip}:{self.port}/SendVideoMsg', json=json_param) as resp:
-                json_resp = await resp.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": vid_base64, "ImageBase64": image_base64,
+                      "PlayLength": duration}
+        # 上传很慢，超时时间按预估耗时放宽
+        json_resp = await self._request("/SendVideoMsg", json_param,
+                                        timeout=max(self.MEDIA_TIMEOUT, predict_time * 3 + 60))
 
         if json_resp.get("Success"):
             json_param.pop('Base64')
             json_param.pop('ImageBase64')
             logger.info("发送视频成功: 对方wxid:{} 时长:{} 视频base64略 图片base64略", wxid, duration)
             data = json_resp.get("Data")
+            self.media_cache.expect(data.get("newMsgId"), "video", digest)
             return data.get("clientMsgId"), data.get("newMsgId")
         else:
             self.error_handler(json_resp)
@@ -288,7 +277,17 @@ class MessageMixin(WechatAPIClientBase):
             raise UserLoggedOut("请先登录")
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
-        elif format not in ["amr", "wav", "mp3"]:
+
+        voice_base64, duration, voice_type = await self._encode_voice(voice, format)
+        return await self._send_encoded_voice(wxid, voice_base64, duration, voice_type)
+
+    async def _encode_voice(self, voice: Union[str, bytes, os.PathLike], format: str = "amr") -> tuple[str, int, int]:
+        """把语音转成发送用的格式
+
+        Returns:
+            tuple[str, int, int]: 返回(语音base64, 时长毫秒, 语音类型)
+        """
+        if format not in ["amr", "wav", "mp3"]:
             raise ValueError("format must be one of amr, wav, mp3")
 
         # read voice to byte
@@ -302,53 +301,32 @@ class MessageMixin(WechatAPIClientBase):
         else:
             raise ValueError("voice should be str, bytes, or path")
 
-        # get voice duration and b64
-        if format.lower() == "amr":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="amr")
-            voice_base64 = base64.b64encode(voice_byte).decode()
-        elif format.lower() == "wav":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="wav").set_channels(1)
-            audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
-        elif format.lower() == "mp3":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="mp3").set_channels(1)
-            audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
-        else:
-            raise ValueError("format must be one of amr, wav, mp3")
-
-        duration = len(audio)
+        # 转码在进程池里执行，不阻塞事件循环
+        voice_data, duration = await transcoder.encode_voice(voice_byte, format)
+        voice_base64 = base64.b64encode(voice_data).decode()
 
         format_dict = {"amr": 0, "wav": 4, "mp3": 4}
+        return voice_base64, duration, format_dict[format]
+
+    async def _send_encoded_voice(self, wxid: str, voice_base64: str, duration: int, voice_type: int) -> \
+            tuple[int, int, int]:
+        """发送已经转好格式的语音"""
+        if not self.wxid:
+            raise UserLoggedOut("请先登录")
+        elif not self.ignore_protect and protector.check(14400):
+            raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice_base64, "VoiceTime": duration,
-                          "Type": format_dict[format]}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendVoiceMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                json_param.pop('Base64')
-                logger.info("发送语音消息: 对方wxid:{} 时长:{} 格式:{} 音频base64略", wxid, duration, format)
-                data = json_resp.get("Data")
-                return int(data.get("ClientMsgId")), data.get("CreateTime"), data.get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
-
-    @staticmethod
-    def _get_closest_frame_rate(frame_rate: int) -> int:
-        supported = [8000, 12000, 16000, 24000]
-        closest_rate = None
-        smallest_diff = float('inf')
-        for num in supported:
-            diff = abs(frame_rate - num)
-            if diff < smallest_diff:
-                smallest_diff = diff
-                closest_rate = num
-
-        return closest_rate
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice_base64, "VoiceTime": duration,
+                      "Type": voice_type}
+        json_resp = await self._request("/SendVoiceMsg", json_param, timeout=self.MEDIA_TIMEOUT)
+
+        if json_resp.get("Success"):
+            json_param.pop('Base64')
+            logger.info("发送语音消息: 对方wxid:{} 时长:{} 类型:{} 音频base64略", wxid, duration, voice_type)
+            data = json_resp.get("Data")
+            return int(data.get("ClientMsgId")), data.get("CreateTime"), data.get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_link_message(self, wxid: str, url: str, title: str = "", description: str = "",
                                 thumb_url: str = "") -> tuple[str, int, int]:
@@ -378,23 +356,21 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Url": url, "Title": title, "Desc": description,
-                          "ThumbUrl": thumb_url}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendShareLink', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("发送链接消息: 对方wxid:{} 链接:{} 标题:{} 描述:{} 缩略图链接:{}",
-                            wxid,
-                            url,
-                            title,
-                            description,
-                            thumb_url)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Url": url, "Title": title, "Desc": description,
+                      "ThumbUrl": thumb_url}
+        json_resp = await self._request("/SendShareLink", json_param)
+
+        if json_resp.get("Success"):
+            logger.info("发送链接消息: 对方wxid:{} 链接:{} 标题:{} 描述:{} 缩略图链接:{}",
+                        wxid,
+                        url,
+                        title,
+                        description,
+                        thumb_url)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_emoji_message(self, wxid: str, md5: str, total_length: int) -> list[dict]:
         """发送表情消息。
@@ -420,16 +396,14 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_length}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendEmojiMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_length}
+        json_resp = await self._request("/SendEmojiMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("发送表情消息: 对方wxid:{} md5:{} 总长度:{}", wxid, md5, total_length)
-                return json_resp.get("Data").get("emojiItem")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("发送表情消息: 对方wxid:{} md5:{} 总长度:{}", wxid, md5, total_length)
+            return json_resp.get("Data").get("emojiItem")
+        else:
+            self.error_handler(json_resp)
 
     async def send_card_message(self, wxid: str, card_wxid: str, card_nickname: str, card_alias: str = "") -> tuple[
         int, int, int]:
@@ -458,22 +432,20 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "CardWxid": card_wxid, "CardAlias": card_alias,
-                          "CardNickname": card_nickname}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCardMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("发送名片消息: 对方wxid:{} 名片wxid:{} 名片备注:{} 名片昵称:{}", wxid,
-                            card_wxid,
-                            card_alias,
-                            card_nickname)
-                data = json_resp.get("Data")
-                return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
-                    0].get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "CardWxid": card_wxid, "CardAlias": card_alias,
+                      "CardNickname": card_nickname}
+        json_resp = await self._request("/SendCardMsg", json_param)
+
+        if json_resp.get("Success"):
+            logger.info("发送名片消息: 对方wxid:{} 名片wxid:{} 名片备注:{} 名片昵称:{}", wxid,
+                        card_wxid,
+                        card_alias,
+                        card_nickname)
+            data = json_resp.get("Data")
+            return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
+                0].get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_app_message(self, wxid: str, xml: str, type: int) -> tuple[str, int, int]:
         """发送应用消息。
@@ -499,18 +471,16 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Xml": xml, "Type": type}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendAppMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Xml": xml, "Type": type}
+        json_resp = await self._request("/SendAppMsg", json_param)
 
-            if json_resp.get("Success"):
-                json_param["Xml"] = json_param["Xml"].replace("\n", "")
-                logger.info("发送app消息: 对方wxid:{} 类型:{} xml:{}", wxid, type, json_param["Xml"])
-                return json_resp.get("Data").get("clientMsgId"), json_resp.get("Data").get(
-                    "createTime"), json_resp.get("Data").get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            json_param["Xml"] = json_param["Xml"].replace("\n", "")
+            logger.info("发送app消息: 对方wxid:{} 类型:{} xml:{}", wxid, type, json_param["Xml"])
+            return json_resp.get("Data").get("clientMsgId"), json_resp.get("Data").get(
+                "createTime"), json_resp.get("Data").get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_cdn_file_msg(self, wxid: str, xml: str) -> tuple[str, int, int]:
         """转发文件消息。
@@ -535,17 +505,15 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNFileMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._request("/SendCDNFileMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发文件消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发文件消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def send_cdn_img_msg(self, wxid: str, xml: str) -> tuple[str, int, int]:
         """转发图片消息。
@@ -570,17 +538,15 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNImgMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._request("/SendCDNImgMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发图片消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发图片消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
+        else:
+            self.error_handler(json_resp)
 
     async def send_cdn_video_msg(self, wxid: str, xml: str) -> tuple[str, int]:
         """转发视频消息。
@@ -605,17 +571,15 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNVideoMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._request("/SendCDNVideoMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发视频消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发视频消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def sync_message(self) -> dict:
         """同步消息。
@@ -630,12 +594,14 @@ class MessageMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": ""}
-            response = await session.post(f'http://{self.ip}:{self.port}/Sync', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": ""}
+        json_resp = await self._request("/Sync", json_param, timeout=10)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            data = json_resp.get("Data")
+            if self.sync_recorder is not None:
+                # 消息处理时会被原地修改，在交给调用方之前记录
+                self.sync_recorder.record(data, self.wxid)
+            return data
+        else:
+            self.error_handler(json_resp)
@@ -0,0 +1,288 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+
+class SendPriority(IntEnum):
+    """发送优先级，数值越小越先发送"""
+    HIGH = 0  # 管理员、指令的回复
+    NORMAL = 1  # 默认
+    LOW = 2  # 群发、定时推送
+
+
+_send_priority: ContextVar[SendPriority] = ContextVar("send_priority", default=SendPriority.NORMAL)
+
+
+@contextmanager
+def send_priority(priority: SendPriority):
+    """在这个上下文里发送的消息使用指定的优先级::
+
+        with send_priority(SendPriority.LOW):
+            await bot.send_text_message(wxid, "早报")
+
+    上下文里创建的任务也会继承这个优先级。
+    """
+    token = _send_priority.set(priority)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+def current_send_priority() -> SendPriority:
+    """当前上下文的发送优先级"""
+    return _send_priority.get()
+
+
+class TokenBucket:
+    """令牌桶
+
+    Args:
+        rate: 每秒补充的令牌数
+        burst: 桶的容量，即允许连续发送的条数
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """还要等多少秒才有一个令牌，有令牌时返回0"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class SendScheduler:
+    """消息发送调度器
+
+    取代原来全局一条队列、每条消息之间固定等1秒的做法:
+
+    - 每个接收人一个令牌桶，一个群刷屏不会拖慢其他群
+    - 一个全局令牌桶限制总的发送速率
+    - 不同接收人之间并发发送，最多同时发送 concurrency 条
+    - 同一个接收人的消息按提交顺序逐条发送
+    - 按优先级排队，指令回复排在群发前面（见 :func:`send_priority`）
+
+    Args:
+        rate: 每个接收人每秒最多发送的条数
+        burst: 每个接收人允许连续发送的条数
+        global_rate: 所有接收人加起来每秒最多发送的条数
+        concurrency: 最多同时发送的条数
+    """
+
+    # 令牌桶超过这个数量时，清理已经空闲的桶
+    _PRUNE_THRESHOLD = 1024
+
+    def __init__(self, rate: float = 1, burst: int = 2, global_rate: float = 5, concurrency: int = 5):
+        self.rate = rate
+        self.burst = burst
+        self.global_rate = global_rate
+        self.concurrency = concurrency
+
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset()
+
+    def _reset(self):
+        # 每个接收人待发送的消息: 堆 [(优先级, 序号, future, func, args, kwargs)]
+        self._pending: Dict[str, List[tuple]] = {}
+        # 正在发送的接收人
+        self._busy: Set[str] = set()
+        self._sending: Set[asyncio.Task] = set()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._global = TokenBucket(self.global_rate, max(1, int(self.global_rate)))
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def configure(self, rate: float = None, burst: int = None, global_rate: float = None,
+                  concurrency: int = None):
+        """修改限速设置，只能在没有消息排队时调用"""
+        if self._pending or self._busy:
+            raise RuntimeError("有消息正在发送，不能修改限速设置")
+
+        if rate is not None:
+            self.rate = rate
+        if burst is not None:
+            self.burst = burst
+        if global_rate is not None:
+            self.global_rate = global_rate
+        if concurrency is not None:
+            self.concurrency = concurrency
+        self._reset()
+
+    def submit(self, wxid: str, func: Callable[..., Awaitable[Any]], *args,
+               priority: SendPriority = None, **kwargs) -> asyncio.Future:
+        """提交一条待发送的消息，返回发送结果的 future
+
+        Args:
+            wxid: 接收人，用于限速
+            func: 实际发送的协程函数，调用方式为 ``func(wxid, *args, **kwargs)``
+            priority: 优先级，不填使用当前上下文的优先级
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # WebUI 重启机器人会换一个事件循环，旧循环里的状态都不能再用
+            self._loop = loop
+            self._reset()
+
+        if priority is None:
+            priority = current_send_priority()
+
+        future = loop.create_future()
+        heapq.heappush(self._pending.setdefault(wxid, []),
+                       (int(priority), next(self._seq), future, func, (wxid, *args), kwargs))
+
+        if wxid not in self._buckets and len(self._buckets) >= self._PRUNE_THRESHOLD:
+            self._prune()
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch())
+        else:
+            self._wake.set()
+        return future
+
+    def pending(self) -> int:
+        """排队中的消息数"""
+        return sum(len(heap) for heap in self._pending.values())
+
+    async def close(self):
+        """取消所有排队中和正在发送的消息"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        sending = list(self._sending)
+        for task in sending:
+            task.cancel()
+        if sending:
+            await asyncio.gather(*sending, return_exceptions=True)
+
+        for heap in self._pending.values():
+            for item in heap:
+                if not item[2].done():
+                    item[2].cancel()
+        self._pending.clear()
+
+    def _bucket(self, wxid: str) -> TokenBucket:
+        bucket = self._buckets.get(wxid)
+        if bucket is None:
+            bucket = self._buckets[wxid] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        for wxid in [wxid for wxid, bucket in self._buckets.items()
+                     if wxid not in self._pending and wxid not in self._busy and bucket.full(now)]:
+            del self._buckets[wxid]
+
+    async def _dispatch(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                item = await self._next()
+            except BaseException:
+                self._slots.release()
+                raise
+
+            if item is None:
+                self._slots.release()
+                return
+
+            wxid, (_, _, future, func, args, kwargs) = item
+            self._busy.add(wxid)
+            task = asyncio.create_task(self._send(wxid, future, func, args, kwargs))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _next(self) -> Optional[tuple]:
+        """等到有一条可以发送的消息，返回 (接收人, 消息)；没有排队的消息时返回 None"""
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+
+            best = None
+            wait = None
+            for wxid, heap in list(self._pending.items()):
+                # 调用方已经取消等待的消息不再发送
+                while heap and heap[0][2].done():
+                    heapq.heappop(heap)
+                if not heap:
+                    del self._pending[wxid]
+                    continue
+                if wxid in self._busy:
+                    continue
+
+                delay = self._bucket(wxid).delay(now)
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                elif best is None or heap[0][:2] < self._pending[best][0][:2]:
+                    best = wxid
+
+            if not self._pending:
+                return None
+
+            if best is not None:
+                delay = self._global.delay(now)
+                if delay <= 0:
+                    self._global.take(now)
+                    self._bucket(best).take(now)
+                    heap = self._pending[best]
+                    item = heapq.heappop(heap)
+                    if not heap:
+                        del self._pending[best]
+                    return best, item
+                wait = delay
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, wxid: str, future: asyncio.Future, func, args, kwargs):
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            else:
+                logger.debug("消息发送失败，调用方已不再等待: 对方wxid:{} 错误:{}", wxid, e)
+        except BaseException:
+            # 发送被取消（例如关闭时），等待结果的调用方不能一直等下去
+            future.cancel()
+            raise
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self._busy.discard(wxid)
+            self._slots.release()
+            self._wake.set()
@@ -1,13 +1,9 @@
 import base64
-import io
 import os
 
-import aiohttp
-import pysilk
-from pydub import AudioSegment
-
 from .base import *
 from .protect import protector
+from .transcoder import transcoder, wav_to_amr
 from ..errors import *
 
 
@@ -29,15 +25,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
-            response = await session.post(f'http://{self.ip}:{self.port}/CdnDownloadImg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
+        json_resp = await self._request("/CdnDownloadImg", json_param, timeout=self.MEDIA_TIMEOUT)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
 
     async def download_voice(self, msg_id: str, voiceurl: str, length: int) -> str:
         """下载语音文件。
@@ -57,15 +51,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "MsgId": msg_id, "Voiceurl": voiceurl, "Length": length}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadVoice', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "MsgId": msg_id, "Voiceurl": voiceurl, "Length": length}
+        json_resp = await self._request("/DownloadVoice", json_param, timeout=self.MEDIA_TIMEOUT)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def download_attach(self, attach_id: str) -> dict:
         """下载附件。
@@ -83,15 +75,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "AttachId": attach_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadAttach', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "AttachId": attach_id}
+        json_resp = await self._request("/DownloadAttach", json_param, timeout=self.MEDIA_TIMEOUT)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def download_video(self, msg_id) -> str:
         """下载视频。
@@ -109,15 +99,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "MsgId": msg_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadVideo', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "MsgId": msg_id}
+        json_resp = await self._request("/DownloadVideo", json_param, timeout=self.MEDIA_TIMEOUT)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def set_step(self, count: int) -> bool:
         """设置步数。
@@ -138,15 +126,13 @@ class ToolMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "StepCount": count}
-            response = await session.post(f'http://{self.ip}:{self.port}/SetStep', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "StepCount": count}
+        json_resp = await self._request("/SetStep", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def set_proxy(self, proxy: Proxy) -> bool:
         """设置代理。
@@ -164,18 +150,16 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid,
-                          "Proxy": {"ProxyIp": f"{proxy.ip}:{proxy.port}",
-                                    "ProxyUser": proxy.username,
-                                    "ProxyPassword": proxy.password}}
-            response = await session.post(f'http://{self.ip}:{self.port}/SetProxy', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid,
+                      "Proxy": {"ProxyIp": f"{proxy.ip}:{proxy.port}",
+                                "ProxyUser": proxy.username,
+                                "ProxyPassword": proxy.password}}
+        json_resp = await self._request("/SetProxy", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def check_database(self) -> bool:
         """检查数据库状态。
@@ -183,14 +167,12 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bool: 数据库正常返回True，否则返回False
         """
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(f'http://{self.ip}:{self.port}/CheckDatabaseOK')
-            json_resp = await response.json()
+        json_resp = await self._request("/CheckDatabaseOK", method="GET")
 
-            if json_resp.get("Running"):
-                return True
-            else:
-                return False
+        if json_resp.get("Running"):
+            return True
+        else:
+            return False
 
     @staticmethod
     def base64_to_file(base64_str: str, file_name: str, file_path: str) -> bool:
@@ -274,7 +256,7 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bytes: wav格式的字节数据
         """
-        return await pysilk.async_decode(silk_byte, to_wav=True)
+        return await transcoder.silk_to_wav(silk_byte)
 
     @staticmethod
     def wav_byte_to_amr_byte(wav_byte: bytes) -> bytes:
@@ -290,20 +272,8 @@ class ToolMixin(WechatAPIClientBase):
             Exception: 转换失败时抛出异常
         """
         try:
-            # 从字节数据创建 AudioSegment 对象
-            audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
-
-            # 设置 AMR 编码的标准参数
-            audio = audio.set_frame_rate(8000).set_channels(1)
-
-            # 创建一个字节缓冲区来存储 AMR 数据
-            output = io.BytesIO()
-
-            # 导出为 AMR 格式
-            audio.export(output, format="amr")
-
-            # 获取字节数据
-            return output.getvalue()
+            # 同步函数，直接在当前线程转码；异步代码中请使用 await transcoder.wav_to_amr(wav_byte)
+            return wav_to_amr(wav_byte)
 
         except Exception as e:
             raise Exception(f"转换WAV到AMR失败: {str(e)}")
@@ -330,10 +300,7 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bytes: silk格式的字节数据
         """
-        # get pcm data
-        audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
-        pcm = audio.raw_data
-        return await pysilk.async_encode(pcm, data_rate=audio.frame_rate, sample_rate=audio.frame_rate)
+        return await transcoder.wav_to_silk(wav_byte)
 
     @staticmethod
     async def wav_byte_to_silk_base64(wav_byte: bytes) -> str:
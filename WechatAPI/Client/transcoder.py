@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Tuple
+
+import pysilk
+from loguru import logger
+from pydub import AudioSegment
+
+# ---------- 在子进程中执行的转码函数，必须是模块级函数才能被 pickle ---------- #
+
+_SILK_FRAME_RATES = [8000, 12000, 16000, 24000]
+
+
+def _closest_frame_rate(frame_rate: int) -> int:
+    return min(_SILK_FRAME_RATES, key=lambda rate: abs(frame_rate - rate))
+
+
+def encode_voice(voice_byte: bytes, format: str) -> Tuple[bytes, int]:
+    """把amr/wav/mp3语音转成发送用的数据，返回(数据, 时长毫秒)。amr原样发送，wav/mp3转成silk"""
+    if format == "amr":
+        audio = AudioSegment.from_file(io.BytesIO(voice_byte), format="amr")
+        return voice_byte, len(audio)
+
+    audio = AudioSegment.from_file(io.BytesIO(voice_byte), format=format).set_channels(1)
+    audio = audio.set_frame_rate(_closest_frame_rate(audio.frame_rate))
+    return pysilk.encode(audio.raw_data, sample_rate=audio.frame_rate), len(audio)
+
+
+def silk_to_wav(silk_byte: bytes) -> bytes:
+    return pysilk.decode(silk_byte, to_wav=True)
+
+
+def wav_to_silk(wav_byte: bytes) -> bytes:
+    audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
+    return pysilk.encode(audio.raw_data, data_rate=audio.frame_rate, sample_rate=audio.frame_rate)
+
+
+def wav_to_amr(wav_byte: bytes) -> bytes:
+    audio = AudioSegment.from_wav(io.BytesIO(wav_byte)).set_frame_rate(8000).set_channels(1)
+    output = io.BytesIO()
+    audio.export(output, format="amr")
+    return output.getvalue()
+
+
+class Transcoder:
+    """音频转码服务
+
+    pydub/ffmpeg 和 silk 编解码都很吃CPU，直接在事件循环里跑会卡住消息处理。
+    这里把转码放到一个有上限的进程池里执行，并按输入内容的哈希缓存结果
+    （同一条语音被多个插件解码、同一段语音群发给很多人时只转码一次）。
+
+    Args:
+        max_workers: 进程池的进程数，默认为CPU数和2中较小的一个
+        max_pending: 最多同时提交到进程池的任务数，超过时排队等待
+        cache_size: 结果缓存的总大小上限(字节)
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None, cache_size: int = 64 * 1024 * 1024):
+        self.max_workers = max_workers or min(2, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.max_workers * 4
+        self.cache_size = cache_size
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # 正在转码的任务，相同的输入共享一次转码
+        self._running: Dict[tuple, asyncio.Future] = {}
+        self._cache: "OrderedDict[tuple, object]" = OrderedDict()
+        self._cache_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    async def encode_voice(self, voice_byte: bytes, format: str) -> Tuple[bytes, int]:
+        """amr/wav/mp3 转成发送用的数据，返回(数据, 时长毫秒)"""
+        return await self.run(encode_voice, voice_byte, format)
+
+    async def silk_to_wav(self, silk_byte: bytes) -> bytes:
+        return await self.run(silk_to_wav, silk_byte)
+
+    async def wav_to_silk(self, wav_byte: bytes) -> bytes:
+        return await self.run(wav_to_silk, wav_byte)
+
+    async def wav_to_amr(self, wav_byte: bytes) -> bytes:
+        return await self.run(wav_to_amr, wav_byte)
+
+    async def run(self, func: Callable, data: bytes, *args):
+        """在进程池中执行 func(data, *args)，结果按 (func, data的哈希, args) 缓存"""
+        key = (func.__name__, hashlib.sha256(data).digest(), args)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+
+        future = self._running.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._submit(func, data, *args))
+            self._running[key] = future
+            future.add_done_callback(lambda f: self._finish(key, f))
+        # shield: 某个调用方被取消时，不影响其他等待同一次转码的调用方
+        return await asyncio.shield(future)
+
+    def _finish(self, key: tuple, future: asyncio.Future):
+        self._running.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._remember(key, future.result())
+
+    def _remember(self, key: tuple, result):
+        size = self._sizeof(result)
+        if size > self.cache_size:
+            return
+        self._cache[key] = result
+        self._cache_bytes += size
+        while self._cache_bytes > self.cache_size:
+            _, old = self._cache.popitem(last=False)
+            self._cache_bytes -= self._sizeof(old)
+
+    @staticmethod
+    def _sizeof(result) -> int:
+        if isinstance(result, (bytes, bytearray)):
+            return len(result)
+        if isinstance(result, tuple):
+            return sum(len(item) for item in result if isinstance(item, (bytes, bytearray)))
+        return 0
+
+    async def _submit(self, func: Callable, data: bytes, *args):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # WebUI 重启机器人会换一个事件循环
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        async with self._slots:
+            try:
+                return await loop.run_in_executor(self._get_pool(), func, data, *args)
+            except BrokenProcessPool:
+                # 子进程意外退出（例如被系统杀掉），重建进程池再试一次
+                logger.warning("转码进程池已损坏，重建后重试")
+                self._pool = None
+                return await loop.run_in_executor(self._get_pool(), func, data, *args)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # 这时进程里已经有 WebUI、日志等线程，fork 可能复制到被其他线程持有的锁导致子进程卡死，所以用 spawn
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def shutdown(self):
+        """关闭进程池，缓存保留"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {"workers": self.max_workers, "running": len(self._running), "cached": len(self._cache),
+                "cache_bytes": self._cache_bytes, "hits": self.hits, "misses": self.misses}
+
+
+transcoder = Transcoder()
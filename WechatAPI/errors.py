@@ -33,3 +33,7 @@ class UserLoggedOut(Exception):
 class BanProtection(Exception):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+
+class OperationTooFrequent(Exception):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
@@ -26,6 +26,7 @@ from WebUI.services.websocket_service import shutdown_websocket
 from database.XYBotDB import XYBotDB
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from utils.bot_stats import BotStats
 
 # 全局变量
 message_db = None
@@ -65,6 +66,12 @@ async def shutdown_system():
     except Exception as e:
         logger.error(f"关闭WebSocket服务时出错: {str(e)}")
 
+    # 写回还在内存中的统计数据
+    try:
+        await BotStats().stop()
+    except Exception as e:
+        logger.error(f"写回统计数据时出错: {str(e)}")
+
     # 关闭数据库连接
     logger.info("正在关闭数据库连接...")
     for db, name in [(message_db, "消息数据库"), (keyval_db, "键值数据库")]:
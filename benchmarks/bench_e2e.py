@@ -0,0 +1,422 @@
+"""机器人核心的端到端吞吐量
+
+把一组接近真实情况的消息（文本、@机器人、指令、引用、图片、语音、进群系统消息）经过 MessagePipeline 送进
+XYBot.process_message，由 EventManager.emit 分发给自带的插件。WechatAPI 用 benchmarks.fake_server，
+数据库使用临时目录里的 sqlite，不会碰到正式的数据库。
+
+输出每秒处理的消息数、处理延迟的 p50/p99、内存分配情况和每个插件的耗时，结果保存到 benchmarks/results/，
+可以用 --compare 和之前（例如上一个提交）的结果对比。
+
+也可以用 --replay 回放线上录制的消息（见主配置的 sync-capture），按原速、N倍速或尽快送入，重现线上的消息高峰。
+--dump-sent 导出机器人发出的所有消息，--compare-sent 和之前导出的对比，用来检查优化有没有改变插件的回复。
+插件里的随机数用 --seed 固定，多个 worker 并发时抽取顺序不固定，对比回复时请加 --workers 1；带当前时间的回复（欢迎新人等）每次都会不同。
+
+用法（在项目根目录运行）:
+    python -m benchmarks.bench_e2e [--messages 5000] [--workers 8] [--latency 0] [--rate 0]
+                                   [--plugins SignIn,Leaderboard] [--trace-alloc] [--compare 旧结果.json]
+    python -m benchmarks.bench_e2e --replay logs/sync-capture.jsonl.gz [--speed 10] [--dump-sent 回复.json]
+                                   [--compare-sent 之前的回复.json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+
+# 结果对比时显示的指标: (路径, 名称, 越大越好)
+COMPARED_METRICS = [
+    (("throughput",), "消息/秒", True),
+    (("latency_ms", "p50"), "延迟p50(ms)", False),
+    (("latency_ms", "p99"), "延迟p99(ms)", False),
+    (("handler_ms", "p50"), "处理p50(ms)", False),
+    (("handler_ms", "p99"), "处理p99(ms)", False),
+    (("alloc", "blocks_per_message"), "内存块/消息", False),
+]
+
+
+def prepare_workdir(disabled_plugins: list[str]) -> str:
+    """建一个临时工作目录: 数据库指向临时文件，其余文件链接到项目目录
+
+    主配置、插件配置都是按当前目录的相对路径读取的，所以在临时目录里运行。
+    """
+    workdir = tempfile.mkdtemp(prefix="xybot-bench-")
+    for name in os.listdir(PROJECT_ROOT):
+        if name.startswith(".") or name in ("main_config.toml", "database"):
+            continue
+        os.symlink(os.path.join(PROJECT_ROOT, name), os.path.join(workdir, name))
+    os.makedirs(os.path.join(workdir, "database"))
+
+    with open(os.path.join(PROJECT_ROOT, "main_config.toml"), "r", encoding="utf-8") as f:
+        config = f.read()
+
+    database = os.path.join(workdir, "database")
+    replacements = {
+        "XYBotDB-url": f'"sqlite:///{database}/xybot.db"',
+        "msgDB-url": f'"sqlite+aiosqlite:///{database}/message.db"',
+        "keyvalDB-url": f'"sqlite+aiosqlite:///{database}/keyval.db"',
+        "ignore-protection": "true",
+        "disabled-plugins": json.dumps(disabled_plugins, ensure_ascii=False),
+        "auto-restart": "false",
+    }
+    for key, value in replacements.items():
+        config = re.sub(rf"^{re.escape(key)}\s*=.*$", lambda _: f"{key} = {value}", config, flags=re.M)
+
+    with open(os.path.join(workdir, "main_config.toml"), "w", encoding="utf-8") as f:
+        f.write(config)
+    return workdir
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"p50": 0, "p99": 0, "max": 0, "mean": 0}
+    values = sorted(values)
+    return {"p50": round(values[len(values) // 2], 3),
+            "p99": round(values[max(0, int(len(values) * 0.99) - 1)], 3),
+            "max": round(values[-1], 3),
+            "mean": round(statistics.mean(values), 3)}
+
+
+def scan_capture(server, path: str) -> tuple[int, dict]:
+    """先读一遍录制的消息: 统计消息数和类型，并把出现过的联系人、群聊和群成员加到假服务里"""
+    from utils.sync_capture import read_capture
+
+    total, kinds = 0, defaultdict(int)
+    for _, wxid, data in read_capture(path):
+        if wxid:
+            server.wxid = wxid
+        for message in data.get("AddMsgs") or []:
+            total += 1
+            kinds[message.get("MsgType")] += 1
+            server.learn(message)
+    return total, dict(kinds)
+
+
+def sent_by_chat(sent) -> dict:
+    """按接收人整理发出的消息，同一个会话内按发送顺序排列"""
+    by_chat = defaultdict(list)
+    for _, path, to_wxid, summary in sent:
+        by_chat[to_wxid].append(f"{path} {summary}")
+    return dict(sorted(by_chat.items()))
+
+
+def compare_sent(sent: dict, path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    chats = sorted(set(old) | set(sent))
+    different = [chat for chat in chats if old.get(chat) != sent.get(chat)]
+    print(f"回复对比: 共 {len(chats)} 个会话，{len(chats) - len(different)} 个一致，{len(different)} 个不同")
+    for chat in different[:10]:
+        before, after = old.get(chat, []), sent.get(chat, [])
+        index = next((i for i, (a, b) in enumerate(zip(before, after)) if a != b), min(len(before), len(after)))
+        print(f"  {chat}: 第 {index + 1} 条起不同（之前 {len(before)} 条，现在 {len(after)} 条）")
+        print(f"    之前: {before[index][:120] if index < len(before) else '(无)'}")
+        print(f"    现在: {after[index][:120] if index < len(after) else '(无)'}")
+
+
+def plugin_of(handler) -> str:
+    owner = getattr(handler, "__self__", None)
+    return type(owner).__name__ if owner is not None else getattr(handler, "__qualname__", str(handler))
+
+
+async def run(args) -> dict:
+    # 临时目录准备好之后再导入，单例读取的是临时目录里的配置
+    from loguru import logger
+    if not args.log:
+        logger.remove()
+
+    from WechatAPI import WechatAPIClient
+    from benchmarks.fake_server import FakeWechatAPI, MESSAGE_MIX
+    from database.keyvalDB import KeyvalDB
+    from database.messsagDB import MessageDB
+    from utils.event_manager import EventManager
+    from utils.message_pipeline import MessagePipeline
+    from utils.plugin_manager import PluginManager
+    from utils.sync_capture import replay_capture
+    from utils.xybot import XYBot
+
+    # 插件里的随机数也固定下来，方便对比两次运行的回复
+    random.seed(args.seed)
+
+    server = FakeWechatAPI(latency=args.latency / 1000, friends=args.friends, chatrooms=args.chatrooms,
+                           members=args.members, seed=args.seed)
+    if args.dump_sent or args.compare_sent:
+        server.sent = deque()
+    if args.replay:
+        total, kinds = scan_capture(server, args.replay)
+    port = await server.start()
+
+    await MessageDB().initialize()
+    await KeyvalDB().initialize()
+
+    bot = WechatAPIClient("127.0.0.1", port)
+    bot.wxid = server.wxid
+    bot.nickname = "FakeBot"
+    bot.ignore_protect = True
+    # 测的是机器人核心，不让发送限速影响处理延迟
+    bot.send_scheduler.configure(rate=1_000_000, burst=1_000_000, global_rate=1_000_000, concurrency=64)
+
+    plugin_manager = PluginManager()
+    plugin_manager.set_bot(bot)
+    loaded = await plugin_manager.load_plugins(load_disabled=False)
+
+    xybot = XYBot(bot)
+    xybot.update_profile(server.wxid, "FakeBot", "", "")
+
+    messages = []
+    if not args.replay:
+        mix = dict(MESSAGE_MIX)
+        for item in args.mix:
+            kind, _, weight = item.partition("=")
+            mix[kind] = float(weight)
+        messages = [server.random_message(mix) for _ in range(args.messages)]
+        total, kinds = len(messages), defaultdict(int)
+        for message in messages:
+            kinds[message["MsgType"]] += 1
+
+    # 每个插件的调用次数和耗时
+    plugin_cost = defaultdict(lambda: {"calls": 0, "total_ms": 0.0})
+    original_call = EventManager._call.__func__
+
+    async def timed_call(cls, handler, api_client, message, kwargs):
+        start = time.perf_counter()
+        try:
+            return await original_call(cls, handler, api_client, message, kwargs)
+        finally:
+            cost = plugin_cost[plugin_of(handler)]
+            cost["calls"] += 1
+            cost["total_ms"] += (time.perf_counter() - start) * 1000
+
+    EventManager._call = classmethod(timed_call)
+
+    latencies, handler_times = [], []
+    submitted_at = {}
+    done = asyncio.Event()
+    finished = 0
+
+    async def timed_process(message):
+        nonlocal finished
+        start = time.perf_counter()
+        try:
+            await xybot.process_message(message)
+        finally:
+            end = time.perf_counter()
+            handler_times.append((end - start) * 1000)
+            latencies.append((end - submitted_at.pop(id(message), start)) * 1000)
+            finished += 1
+            if finished == total:
+                done.set()
+
+    pipeline = MessagePipeline(timed_process, workers=args.workers, max_size=args.queue_size, self_wxid=bot.wxid)
+    pipeline.start()
+
+    gc.collect()
+    gc_before = [stat["collections"] for stat in gc.get_stats()]
+    blocks_before = sys.getallocatedblocks()
+    if args.trace_alloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+
+    async def submit(message):
+        submitted_at[id(message)] = time.perf_counter()
+        await pipeline.submit(message)
+
+    if args.replay:
+        await replay_capture(args.replay, submit, speed=args.speed, on_sync=bot.contacts.apply_sync)
+    interval = 1 / args.rate if args.rate > 0 else 0
+    for i, message in enumerate(messages):
+        if interval:
+            # 按固定速率送入（开环），落后时不补等待
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await submit(message)
+    if total:
+        await done.wait()
+
+    elapsed = time.perf_counter() - start
+    alloc = {"blocks_per_message": round((sys.getallocatedblocks() - blocks_before) / max(total, 1), 2),
+             "gc_collections": [after - before for before, after in
+                                zip(gc_before, (stat["collections"] for stat in gc.get_stats()))]}
+    if args.trace_alloc:
+        alloc.update(allocation_by_plugin(tracemalloc.take_snapshot(), total))
+        tracemalloc.stop()
+
+    EventManager._call = classmethod(original_call)
+    await pipeline.stop(drain=False)
+    await MessageDB().flush()
+    await plugin_manager.unload_plugins()
+    await bot.send_scheduler.close()
+    await bot.close()
+    await server.stop()
+
+    return {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "args": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "plugins": loaded,
+        "messages": total,
+        "message_types": dict(kinds),
+        "failed": pipeline.failed,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(total / elapsed, 1) if elapsed else 0,
+        "latency_ms": percentiles(latencies),
+        "handler_ms": percentiles(handler_times),
+        "plugins_ms": {name: {"calls": cost["calls"], "total_ms": round(cost["total_ms"], 2),
+                              "mean_ms": round(cost["total_ms"] / cost["calls"], 3)}
+                       for name, cost in sorted(plugin_cost.items(), key=lambda item: -item[1]["total_ms"])},
+        "api_calls": server.stats()["calls"],
+        "alloc": alloc,
+        "sent": sent_by_chat(server.sent) if args.dump_sent or args.compare_sent else None,
+    }
+
+
+def allocation_by_plugin(snapshot: tracemalloc.Snapshot, messages: int) -> dict:
+    """按文件所属的插件/模块汇总测量期间新分配、还没释放的内存"""
+    plugins_dir = os.path.join(PROJECT_ROOT, "plugins") + os.sep
+    by_owner = defaultdict(lambda: [0, 0])
+    for stat in snapshot.statistics("filename"):
+        filename = os.path.realpath(stat.traceback[0].filename)
+        if filename.startswith(plugins_dir):
+            owner = "plugins/" + filename[len(plugins_dir):].split(os.sep)[0]
+        elif filename.startswith(PROJECT_ROOT + os.sep):
+            owner = os.path.relpath(filename, PROJECT_ROOT)
+        else:
+            owner = "(其他)"
+        by_owner[owner][0] += stat.count
+        by_owner[owner][1] += stat.size
+
+    total_count = sum(count for count, _ in by_owner.values())
+    total_size = sum(size for _, size in by_owner.values())
+    top = sorted(by_owner.items(), key=lambda item: -item[1][1])[:15]
+    return {"traced_blocks_per_message": round(total_count / max(messages, 1), 2),
+            "traced_bytes_per_message": round(total_size / max(messages, 1), 1),
+            "traced_by_owner": {owner: {"blocks": count, "bytes": size} for owner, (count, size) in top}}
+
+
+def report(result: dict, top: int):
+    print(f"提交: {result['commit']}  消息数: {result['messages']}  插件: {len(result['plugins'])} 个  "
+          f"失败: {result['failed']}")
+    print(f"  吞吐量: {result['throughput']:.0f} 消息/秒  总耗时: {result['elapsed']:.2f}s")
+    for key, name in (("latency_ms", "端到端延迟"), ("handler_ms", "处理耗时  ")):
+        stats = result[key]
+        print(f"  {name}: p50 {stats['p50']:8.2f} ms  p99 {stats['p99']:8.2f} ms  max {stats['max']:8.2f} ms")
+    alloc = result["alloc"]
+    print(f"  内存块增长: {alloc['blocks_per_message']} 个/消息  GC次数: {alloc['gc_collections']}")
+    if "traced_bytes_per_message" in alloc:
+        print(f"  tracemalloc: {alloc['traced_blocks_per_message']} 个/消息  "
+              f"{alloc['traced_bytes_per_message']} 字节/消息（开启 tracemalloc 时吞吐量会明显下降）")
+        for owner, stats in alloc["traced_by_owner"].items():
+            print(f"    {owner:40s} {stats['blocks']:8d} 个 {stats['bytes']:10d} 字节")
+
+    print("  插件耗时（含等待接口的时间）:")
+    for name, cost in list(result["plugins_ms"].items())[:top]:
+        print(f"    {name:20s} 调用 {cost['calls']:6d} 次  共 {cost['total_ms']:9.1f} ms  平均 {cost['mean_ms']:7.3f} ms")
+    print(f"  接口调用: {result['api_calls']}")
+
+
+def compare(result: dict, path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    print(f"对比 {old.get('commit')} ({old.get('time')}) -> {result['commit']}:")
+    for keys, name, higher_is_better in COMPARED_METRICS:
+        before, after = old, result
+        for key in keys:
+            before = before.get(key, {}) if isinstance(before, dict) else {}
+            after = after.get(key, {}) if isinstance(after, dict) else {}
+        if not isinstance(before, (int, float)) or not isinstance(after, (int, float)):
+            continue
+        change = (after - before) / before * 100 if before else 0
+        better = change > 0 if higher_is_better else change < 0
+        mark = "" if abs(change) < 3 else ("↑ 变好" if better else "↓ 变差")
+        print(f"  {name:12s} {before:10.2f} -> {after:10.2f}  {change:+6.1f}%  {mark}")
+
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=8, help="MessagePipeline 的 worker 数")
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=0, help="每秒送入的消息数，为0时尽快送入")
+    parser.add_argument("--latency", type=float, default=0, help="假 WechatAPI 的接口延迟(毫秒)")
+    parser.add_argument("--friends", type=int, default=500)
+    parser.add_argument("--chatrooms", type=int, default=20)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--mix", action="append", default=[],
+                        help="调整消息类型的权重，例如 --mix image=20 --mix join=0，类型见 fake_server.MESSAGE_MIX")
+    parser.add_argument("--plugins", default="", help="只加载这些插件，逗号分隔，默认加载主配置中启用的插件")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", help="回放录制的同步消息（主配置 sync-capture 保存的文件），代替随机生成的消息")
+    parser.add_argument("--speed", type=float, default=0, help="回放速度，1为原速，10为十倍速，0为尽快送入")
+    parser.add_argument("--dump-sent", help="把机器人发出的消息按会话保存到这个文件")
+    parser.add_argument("--compare-sent", help="和之前 --dump-sent 保存的回复对比")
+    parser.add_argument("--trace-alloc", action="store_true", help="用 tracemalloc 统计各模块的内存分配")
+    parser.add_argument("--top", type=int, default=15, help="显示耗时最多的几个插件")
+    parser.add_argument("--log", action="store_true", help="输出机器人日志")
+    parser.add_argument("--output", help="结果保存路径，默认 benchmarks/results/时间-提交.json")
+    parser.add_argument("--compare", help="和之前保存的结果对比")
+    args = parser.parse_args()
+
+    import tomllib
+    with open(os.path.join(PROJECT_ROOT, "main_config.toml"), "rb") as f:
+        disabled = tomllib.load(f)["XYBot"].get("disabled-plugins", [])
+    if args.plugins:
+        wanted = {name.strip() for name in args.plugins.split(",") if name.strip()}
+        disabled = [name for name in os.listdir(os.path.join(PROJECT_ROOT, "plugins")) if name not in wanted]
+
+    for name in ("replay", "dump_sent", "compare_sent"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    cwd = os.getcwd()
+    workdir = prepare_workdir(disabled)
+    sys.path.insert(0, PROJECT_ROOT)
+    os.chdir(workdir)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    sent = result.pop("sent")
+    report(result, args.top)
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+    if args.dump_sent:
+        with open(args.dump_sent, "w", encoding="utf-8") as f:
+            json.dump(sent, f, ensure_ascii=False, indent=1)
+        print(f"发出的消息已保存: {args.dump_sent}")
+    if args.compare_sent:
+        compare_sent(sent, args.compare_sent)
+
+
+if __name__ == "__main__":
+    main()
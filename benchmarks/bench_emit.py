@@ -0,0 +1,91 @@
+"""EventManager.emit 单个处理函数的开销
+
+对比旧的“每个处理函数深拷贝一次消息”和现在的写时复制视图。
+
+用法（在项目根目录运行）:
+    python -m benchmarks.bench_emit [--handlers 30] [--rounds 2000]
+"""
+import argparse
+import asyncio
+import base64
+import copy
+import os
+import time
+
+from utils.event_manager import EventManager
+
+
+def make_message(payload_size: int) -> dict:
+    """构造一条接近真实情况的图片消息"""
+    return {
+        "MsgId": 123456789,
+        "NewMsgId": 1234567890123456789,
+        "MsgType": 3,
+        "FromWxid": "12345678@chatroom",
+        "ToWxid": "wxid_bot",
+        "SenderWxid": "wxid_sender",
+        "IsGroup": True,
+        "Status": 3,
+        "ImgStatus": 2,
+        "CreateTime": 1700000000,
+        "MsgSource": "<msgsource><silence>1</silence><membercount>500</membercount></msgsource>",
+        "PushContent": "",
+        "ImgBuf": {"iLen": 0},
+        "Ats": ["wxid_a", "wxid_b"],
+        "Content": base64.b64encode(os.urandom(payload_size)).decode(),
+    }
+
+
+class ReadOnlyPlugin:
+    """只读取消息字段的处理函数，大部分插件都是这样"""
+
+    async def handle(self, bot, message):
+        command = str(message["Content"])[:8].split(" ")
+        if message["FromWxid"] and command[0] == "签到":
+            return False
+        return True
+
+
+async def legacy_emit(handlers, api_client, message):
+    """旧的 emit 实现"""
+    for handler in handlers:
+        result = await handler(api_client, copy.deepcopy(message))
+        if isinstance(result, bool) and not result:
+            break
+
+
+async def bench(handler_count: int, rounds: int, payload_size: int):
+    plugins = [ReadOnlyPlugin() for _ in range(handler_count)]
+    handlers = [p.handle for p in plugins]
+    EventManager._handlers["bench_message"] = [(h, p, 50) for h, p in zip(handlers, plugins)]
+    message = make_message(payload_size)
+
+    results = {}
+    for name, emit in (("deepcopy", lambda: legacy_emit(handlers, None, message)),
+                       ("view", lambda: EventManager.emit("bench_message", None, message))):
+        for _ in range(min(rounds, 100)):  # 预热
+            await emit()
+        start = time.perf_counter()
+        for _ in range(rounds):
+            await emit()
+        elapsed = time.perf_counter() - start
+        results[name] = elapsed / rounds / handler_count * 1e6
+
+    EventManager._handlers.pop("bench_message", None)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--handlers", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'payload':>10} {'deepcopy(us/handler)':>22} {'view(us/handler)':>18} {'speedup':>8}")
+    for payload_size in (0, 16 * 1024, 512 * 1024):
+        r = asyncio.run(bench(args.handlers, args.rounds, payload_size))
+        print(f"{payload_size:>10} {r['deepcopy']:>22.2f} {r['view']:>18.2f} {r['deepcopy'] / r['view']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""WechatAPI 请求的往返延迟
+
+在本地起一个假的 WechatAPI（benchmarks.fake_server），对比旧的“每次请求新建 ClientSession”
+和现在 WechatAPIClientBase 共用的长连接会话。分别测顺序发送和并发发送。
+
+用法（在项目根目录运行）:
+    python -m benchmarks.bench_http [--requests 2000] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+from WechatAPI.Client.base import WechatAPIClientBase
+from benchmarks.fake_server import FakeWechatAPI
+
+HOST = "127.0.0.1"
+
+
+def make_param(i: int) -> dict:
+    return {"Wxid": "wxid_bot", "ToWxid": "wxid_target", "Content": f"消息{i}", "Type": 1, "At": ""}
+
+
+async def old_send(port: int, i: int) -> dict:
+    """旧版每个接口方法里的写法"""
+    async with aiohttp.ClientSession() as session:
+        response = await session.post(f'http://{HOST}:{port}/SendTextMsg', json=make_param(i))
+        return await response.json()
+
+
+async def run(send, total: int, concurrency: int) -> (float, list[float]):
+    """返回 (总耗时秒, 每个请求的延迟毫秒)"""
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await send(i)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, elapsed: float, latencies: list[float]):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"  {name}: {len(latencies) / elapsed:8.0f} 次/秒  "
+          f"平均 {statistics.mean(latencies):6.2f} ms  p50 {statistics.median(latencies):6.2f} ms  "
+          f"p99 {p99:6.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    server = FakeWechatAPI()
+    port = await server.start(HOST)
+    client = WechatAPIClientBase(HOST, port)
+    try:
+        for concurrency in (1, args.concurrency):
+            print(f"请求数: {args.requests} 并发: {concurrency}")
+            elapsed, latencies = await run(lambda i: old_send(port, i), args.requests, concurrency)
+            report("每次新建会话", elapsed, latencies)
+            elapsed, latencies = await run(lambda i: client._request("/SendTextMsg", make_param(i)),
+                                           args.requests, concurrency)
+            report("共用会话    ", elapsed, latencies)
+    finally:
+        await client.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""语音转码对事件循环的阻塞
+
+一边转码一边运行一个每1毫秒醒来一次的协程，记录它实际醒来比预期晚了多少（事件循环被卡住的时间）。
+对比旧的“pydub 在事件循环里跑、silk 编码用 pysilk.async_encode”和现在的转码进程池。
+每段语音内容都不一样，避免命中转码缓存。
+
+用法（在项目根目录运行）:
+    python -m benchmarks.bench_transcode [--clips 20] [--seconds 30]
+"""
+import argparse
+import asyncio
+import io
+import math
+import struct
+import time
+import wave
+
+import pysilk
+from pydub import AudioSegment
+
+from WechatAPI.Client.transcoder import Transcoder, _closest_frame_rate
+
+
+def make_wav(seconds: int, seed: int) -> bytes:
+    """生成一段单声道16bit正弦波WAV"""
+    rate = 44100
+    freq = 220 + seed
+    frames = b"".join(struct.pack("<h", int(12000 * math.sin(2 * math.pi * freq * i / rate)))
+                      for i in range(rate * seconds))
+    output = io.BytesIO()
+    with wave.open(output, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(frames)
+    return output.getvalue()
+
+
+async def old_encode(wav_byte: bytes) -> bytes:
+    """旧版 _send_voice_message 的 wav 分支"""
+    audio = AudioSegment.from_file(io.BytesIO(wav_byte), format="wav").set_channels(1)
+    audio = audio.set_frame_rate(_closest_frame_rate(audio.frame_rate))
+    return await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)
+
+
+async def measure(work) -> (float, float, float):
+    """返回 (总耗时秒, 最长卡顿毫秒, 累计卡顿毫秒)"""
+    stop = False
+    lags = []
+
+    async def ticker():
+        while not stop:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(max(0.0, time.perf_counter() - start - 0.001) * 1000)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    stop = True
+    await tick
+    return elapsed, max(lags, default=0), sum(lag for lag in lags if lag > 5)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--seconds", type=int, default=30)
+    args = parser.parse_args()
+
+    clips = [make_wav(args.seconds, i) for i in range(args.clips)]
+    transcoder = Transcoder()
+    # 先启动进程池，不把进程启动时间算进去
+    await transcoder.encode_voice(make_wav(1, 1000), "wav")
+
+    async def old():
+        await asyncio.gather(*(old_encode(clip) for clip in clips))
+
+    async def new():
+        await asyncio.gather(*(transcoder.encode_voice(clip, "wav") for clip in clips))
+
+    print(f"语音数: {args.clips} 每段时长: {args.seconds}秒 进程数: {transcoder.max_workers}")
+    for name, work in (("旧: 事件循环内转码", old), ("新: 转码进程池  ", new)):
+        elapsed, worst, total = await measure(work)
+        print(f"  {name}: 总耗时 {elapsed:6.2f}s  最长卡顿 {worst:8.1f} ms  累计卡顿(>5ms) {total:8.1f} ms")
+
+    transcoder.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
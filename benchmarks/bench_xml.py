@@ -0,0 +1,101 @@
+"""引用消息（MsgType 49）XML解析的开销
+
+对比旧的“每一步都 ET.fromstring + 一连串 find()”和现在的 parse_xml 缓存 + 声明式字段提取。
+每条消息内容都不一样，缓存只在同一条消息的多个处理步骤之间生效，和真实情况一致。
+
+用法（在项目根目录运行）:
+    python -m benchmarks.bench_xml [--rounds 20000]
+"""
+import argparse
+import html
+import re
+import time
+import xml.etree.ElementTree as ET
+
+from utils.message_xml import parse_xml, XML_TYPE_FIELDS, QUOTE_FIELDS, QUOTED_APPMSG_FIELDS
+
+QUOTED = ('<?xml version="1.0"?><msg><appmsg appid="" sdkver="0"><title>分享的链接</title><des>描述</des>'
+          '<action>view</action><type>5</type><showtype>0</showtype><soundtype>0</soundtype>'
+          '<url>https://example.com/a</url><lowurl></lowurl><dataurl></dataurl><lowdataurl></lowdataurl>'
+          '<appattach><totallen>0</totallen><attachid></attachid><emoticonmd5></emoticonmd5>'
+          '<fileext></fileext><cdnthumbaeskey></cdnthumbaeskey><aeskey></aeskey></appattach>'
+          '<extinfo></extinfo><sourceusername></sourceusername><sourcedisplayname></sourcedisplayname>'
+          '<thumburl></thumburl><md5></md5><statextstr></statextstr><directshare>0</directshare></appmsg></msg>')
+
+
+def make_content(i: int) -> str:
+    return ('<msg><appmsg appid="" sdkver="0"><title>这是啥</title><des></des><type>57</type>'
+            '<refermsg><type>49</type><svrid>%d</svrid><fromusr>123@chatroom</fromusr>'
+            '<chatusr>wxid_sender</chatusr><displayname>某人</displayname>'
+            '<msgsource>&lt;msgsource&gt;&lt;/msgsource&gt;</msgsource>'
+            '<content>wxid_sender:%s</content><createtime>1700000000</createtime></refermsg>'
+            '</appmsg><fromusername>wxid_sender</fromusername></msg>') % (i, html.escape(QUOTED))
+
+
+def unescape_quoted(content: str) -> str:
+    xml_content = re.sub(r'^[^:]+:', '', html.unescape(content), count=1)
+    return re.sub(r'&(?!amp;|lt;|gt;|apos;|quot;)', '&amp;', xml_content)
+
+
+def old_parse(content: str) -> dict:
+    """旧版 process_xml_message + process_quote_message 的解析步骤"""
+    root = ET.fromstring(content)
+    int(root.find("appmsg").find("type").text)
+
+    root = ET.fromstring(content)
+    appmsg = root.find("appmsg")
+    refermsg = appmsg.find("refermsg")
+    quote = {"MsgType": int(refermsg.find("type").text)}
+    for key, tag in (("NewMsgId", "svrid"), ("ToWxid", "fromusr"), ("FromWxid", "chatusr"),
+                     ("Nickname", "displayname"), ("MsgSource", "msgsource"), ("Content", "content"),
+                     ("Createtime", "createtime")):
+        quote[key] = refermsg.find(tag).text
+
+    quote_appmsg = ET.fromstring(unescape_quoted(quote["Content"])).find("appmsg")
+    for tag in ("title", "des", "action", "url", "lowurl", "dataurl", "lowdataurl", "songlyric", "extinfo",
+                "sourceusername", "sourcedisplayname", "thumburl", "md5", "statextstr"):
+        quote[tag] = quote_appmsg.find(tag).text if isinstance(quote_appmsg.find(tag), ET.Element) else ""
+    for tag in ("type", "showtype", "soundtype", "directshare"):
+        quote[tag] = int(quote_appmsg.find(tag).text) if isinstance(quote_appmsg.find(tag), ET.Element) else 0
+    quote["appattach"] = {}
+    for tag in ("attachid", "emoticonmd5", "fileext", "cdnthumbaeskey", "aeskey"):
+        quote["appattach"][tag] = quote_appmsg.find("appattach").find(tag).text if isinstance(
+            quote_appmsg.find("appattach").find(tag), ET.Element) else ""
+    quote["appattach"]["totallen"] = int(quote_appmsg.find("appattach").find("totallen").text) if isinstance(
+        quote_appmsg.find("appattach").find("totallen"), ET.Element) else 0
+    return quote
+
+
+def new_parse(content: str) -> dict:
+    """现在的解析步骤"""
+    XML_TYPE_FIELDS.extract(parse_xml(content))
+
+    quote = QUOTE_FIELDS.extract(parse_xml(content))["Quote"]
+    quote.update(QUOTED_APPMSG_FIELDS.extract(parse_xml(unescape_quoted(quote["Content"]))))
+    return quote
+
+
+def bench(func, contents) -> float:
+    start = time.perf_counter()
+    for content in contents:
+        func(content)
+    return (time.perf_counter() - start) / len(contents) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+
+    contents = [make_content(i) for i in range(args.rounds)]
+    assert old_parse(contents[0])["url"] == new_parse(contents[0])["url"]
+
+    old = bench(old_parse, contents)
+    new = bench(new_parse, contents)
+    print(f"消息数: {args.rounds}")
+    print(f"旧: {old:.1f} µs/条")
+    print(f"新: {new:.1f} µs/条 ({old / new:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
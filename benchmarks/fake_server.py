@@ -0,0 +1,540 @@
+"""本地的假 WechatAPI 服务
+
+用纯 Python 实现客户端用到的接口（发消息、CDN转发、联系人、群成员、下载、同步消息等），
+不需要 xywechatpad_binary，也不需要真实的微信账号，用来在一台机器上重复测量客户端、消息分发和数据库的性能。
+
+- 可以设置接口延迟和抖动，上传类接口可以按上传速度模拟耗时
+- 可以按概率注入错误码（-7 已退出登录、-12 操作过于频繁等）
+- 可以按固定速率生成收到的消息（文本、@机器人、指令、引用、图片、语音、进群系统消息），由 /Sync 返回
+- 发送图片、视频后，和真实服务一样会在 /Sync 中回显机器人自己发的消息（带CDN XML）
+- GET /FakeStats 返回各接口的调用次数和注入的错误数
+
+单独运行（在项目根目录）:
+    python -m benchmarks.fake_server --port 9000 --latency 20 --jitter 5 --inbound-rate 50 --error SendTextMsg:-12:0.05
+
+在基准测试里使用:
+    server = FakeWechatAPI(latency=0.02)
+    port = await server.start()
+    client = WechatAPIClient("127.0.0.1", port)
+    client.wxid = server.wxid
+    ...
+    await server.stop()
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import random
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+# 错误码对应的提示，和真实服务返回的 Message 类似
+ERROR_MESSAGES = {
+    -1: "参数错误",
+    -2: "其他错误",
+    -3: "序列化错误",
+    -4: "反序列化错误",
+    -5: "MMTLS初始化错误",
+    -6: "收到的数据包长度错误",
+    -7: "已退出登录",
+    -8: "链接过期",
+    -9: "解析数据包错误",
+    -10: "数据库错误",
+    -11: "登陆异常",
+    -12: "操作过于频繁",
+}
+
+# 上传媒体的接口，耗时按请求大小和上传速度计算
+UPLOAD_PATHS = {"/SendImageMsg", "/SendVideoMsg", "/SendVoiceMsg"}
+
+# 生成收到的消息时各类消息的权重
+MESSAGE_MIX = {
+    "text": 15,  # 私聊文本
+    "group_text": 45,  # 群聊文本
+    "at": 8,  # 群聊@机器人
+    "command": 15,  # 群聊指令
+    "quote": 5,  # 引用消息
+    "image": 6,  # 图片
+    "voice": 4,  # 语音
+    "join": 2,  # 进群系统消息
+}
+
+# 生成指令消息时使用的指令，都是自带插件中不需要访问外部服务的指令
+COMMANDS = ["签到", "积分", "排行榜", "群排行榜", "菜单", "随机群成员", "抽奖"]
+
+# 1x1 的 PNG，下载图片接口返回它
+_PIXEL = base64.b64encode(bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082")).decode()
+
+
+def _wrap(value: str) -> dict:
+    return {"string": value}
+
+
+class FakeWechatAPI:
+    """假的 WechatAPI 服务
+
+    Args:
+        wxid: 机器人的wxid
+        latency: 每个请求的基础延迟(秒)
+        jitter: 延迟的随机浮动范围(秒)
+        latencies: 单独设置某些接口的基础延迟，例如 ``{"/SendVideoMsg": 1.0}``
+        upload_speed: 上传类接口的上传速度(字节/秒)，为0时不计上传耗时
+        errors: 注入的错误，``{路径: [(错误码, 概率), ...]}``，路径为 ``*`` 时对所有接口生效
+        friends: 生成的好友数
+        chatrooms: 生成的群聊数
+        members: 每个群的成员数
+        inbound_rate: 每秒生成的收到消息数，为0时不生成
+        sync_batch: 每次 /Sync 最多返回的消息数
+        seed: 随机数种子，相同的种子生成相同的数据和消息
+    """
+
+    def __init__(self, wxid: str = "wxid_fakebot", latency: float = 0.0, jitter: float = 0.0,
+                 latencies: Dict[str, float] = None, upload_speed: float = 0,
+                 errors: Dict[str, List[Tuple[int, float]]] = None, friends: int = 200, chatrooms: int = 10,
+                 members: int = 100, inbound_rate: float = 0, sync_batch: int = 50, seed: int = 0):
+        self.wxid = wxid
+        self.latency = latency
+        self.jitter = jitter
+        self.latencies = dict(latencies or {})
+        self.upload_speed = upload_speed
+        self.errors: Dict[str, List[Tuple[int, float]]] = {path: list(rules) for path, rules in (errors or {}).items()}
+        self.inbound_rate = inbound_rate
+        self.sync_batch = sync_batch
+        self.random = random.Random(seed)
+
+        self.contacts: Dict[str, dict] = {}
+        self.chatroom_members: Dict[str, List[dict]] = {}
+        self._generate_contacts(friends, chatrooms, members)
+
+        self.inbox: deque = deque()
+        self.calls: Counter = Counter()
+        self.injected: Counter = Counter()
+        # 最近发出的消息，用于检查发送顺序、间隔和内容: (时间, 路径, 接收人, 内容摘要)
+        self.sent: deque = deque(maxlen=10000)
+
+        self._next_id = int(time.time()) * 1000
+        self._runner: Optional[web.AppRunner] = None
+        self._generator: Optional[asyncio.Task] = None
+
+    # ---------- 启动和停止 ---------- #
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=256 * 1024 * 1024, middlewares=[self._middleware])
+        routes = {
+            "/SendTextMsg": self.send_text,
+            "/SendImageMsg": self.send_image,
+            "/SendVideoMsg": self.send_video,
+            "/SendVoiceMsg": self.send_voice,
+            "/SendShareLink": self.send_app_like,
+            "/SendAppMsg": self.send_app_like,
+            "/SendCDNFileMsg": self.send_app_like,
+            "/SendCDNVideoMsg": self.send_app_like,
+            "/SendCDNImgMsg": self.send_cdn_image,
+            "/SendEmojiMsg": self.send_emoji,
+            "/SendCardMsg": self.send_text,
+            "/RevokeMsg": self.ok,
+            "/GetContact": self.get_contact,
+            "/GetContractDetail": self.get_contact,
+            "/GetContractList": self.get_contract_list,
+            "/GetChatroomMemberDetail": self.get_chatroom_member_detail,
+            "/GetChatroomInfo": self.get_chatroom_info,
+            "/GetChatroomInfoNoAnnounce": self.get_chatroom_info,
+            "/CdnDownloadImg": self.download_image,
+            "/DownloadVoice": self.download_buffer,
+            "/DownloadAttach": self.download_buffer,
+            "/DownloadVideo": self.download_buffer,
+            "/Sync": self.sync,
+            "/GetProfile": self.get_profile,
+            "/GetCachedInfo": self.get_cached_info,
+            "/Heartbeat": self.ok,
+            "/AutoHeartbeatStart": self.ok,
+            "/AutoHeartbeatStop": self.ok,
+            "/AutoHeartbeatStatus": self.heartbeat_status,
+            "/SetStep": self.ok,
+            "/SetProxy": self.ok,
+        }
+        for path, handler in routes.items():
+            app.router.add_post(path, handler)
+        app.router.add_get("/IsRunning", self.is_running)
+        app.router.add_get("/CheckDatabaseOK", self.check_database)
+        app.router.add_get("/FakeStats", self.fake_stats)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """启动服务，返回实际监听的端口（port 为0时随机选择）"""
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        if self.inbound_rate > 0:
+            self._generator = asyncio.create_task(self._generate_messages())
+        return site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._generator:
+            self._generator.cancel()
+            await asyncio.gather(self._generator, return_exceptions=True)
+            self._generator = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def inject(self, path: str, code: int, rate: float = 1.0):
+        """注入错误: 请求 path 时以 rate 的概率返回错误码 code"""
+        self.errors.setdefault(path, []).append((code, rate))
+
+    def clear_errors(self):
+        self.errors.clear()
+
+    def push(self, message: dict):
+        """放入一条收到的消息，下次 /Sync 时返回"""
+        self.inbox.append(message)
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "injected": dict(self.injected), "inbox": len(self.inbox),
+                "sent": len(self.sent)}
+
+    # ---------- 公共处理 ---------- #
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        path = request.path
+        if path == "/FakeStats":
+            return await handler(request)
+        self.calls[path] += 1
+
+        delay = self.latencies.get(path, self.latency)
+        if self.jitter:
+            delay += self.random.uniform(-self.jitter, self.jitter)
+        if self.upload_speed and path in UPLOAD_PATHS and request.content_length:
+            delay += request.content_length / self.upload_speed
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        for rule_path in (path, "*"):
+            for code, rate in self.errors.get(rule_path, ()):
+                if self.random.random() < rate:
+                    self.injected[f"{path} {code}"] += 1
+                    return web.json_response({"Success": False, "Code": code,
+                                              "Message": ERROR_MESSAGES.get(code, "注入的错误"), "Data": None})
+        return await handler(request)
+
+    @staticmethod
+    def _success(data=None) -> web.Response:
+        return web.json_response({"Success": True, "Code": 0, "Message": "", "Data": data})
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def _record(self, path: str, param: dict) -> Tuple[int, int, int]:
+        """记录一次发送，返回 (ClientMsgId, CreateTime, NewMsgId)"""
+        self.sent.append((time.time(), path, param.get("ToWxid"), self._summary(param)))
+        return self._new_id(), int(time.time()), self._new_id()
+
+    @staticmethod
+    def _summary(param: dict) -> str:
+        """发送内容的摘要，用于比较两次运行机器人的回复是否一致，媒体只记录MD5"""
+        if param.get("Base64"):
+            return "md5:" + hashlib.md5(param["Base64"].encode()).hexdigest()
+        if param.get("Url"):
+            return f"{param.get('Title', '')} {param.get('Desc', '')} {param['Url']}"
+        if param.get("Md5"):
+            return "emoji:" + param["Md5"]
+        if param.get("CardWxid"):
+            return "card:" + param["CardWxid"]
+        return str(param.get("Content") or param.get("Xml") or "")
+
+    # ---------- 发送消息 ---------- #
+
+    async def send_text(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        client_id, create_time, new_id = self._record(request.path, param)
+        return self._success({"List": [{"ClientMsgid": client_id, "Createtime": create_time, "NewMsgId": new_id}]})
+
+    async def send_image(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        client_id, create_time, new_id = self._record(request.path, param)
+        xml = (f'<?xml version="1.0"?><msg><img aeskey="{new_id:032x}" cdnmidimgurl="fake_cdn_{new_id}" '
+               f'length="{len(param.get("Base64", "")) * 3 // 4}" md5="{new_id:032x}" /></msg>')
+        self._echo(param.get("ToWxid"), 3, xml, new_id)
+        return self._success({"ClientImgId": _wrap(str(client_id)), "CreateTime": create_time, "Newmsgid": new_id})
+
+    async def send_video(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        client_id, _, new_id = self._record(request.path, param)
+        xml = (f'<?xml version="1.0"?><msg><videomsg aeskey="{new_id:032x}" cdnvideourl="fake_cdn_{new_id}" '
+               f'length="{len(param.get("Base64", "")) * 3 // 4}" playlength="{param.get("PlayLength", 0)}" /></msg>')
+        self._echo(param.get("ToWxid"), 43, xml, new_id)
+        return self._success({"clientMsgId": str(client_id), "newMsgId": new_id})
+
+    async def send_voice(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        client_id, create_time, new_id = self._record(request.path, param)
+        return self._success({"ClientMsgId": str(client_id), "CreateTime": create_time, "NewMsgId": new_id})
+
+    async def send_app_like(self, request: web.Request) -> web.Response:
+        """链接、App消息和CDN文件、视频转发的返回格式相同"""
+        param = await request.json()
+        client_id, create_time, new_id = self._record(request.path, param)
+        return self._success({"clientMsgId": str(client_id), "createTime": create_time, "newMsgId": new_id})
+
+    async def send_cdn_image(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        client_id, create_time, new_id = self._record(request.path, param)
+        return self._success({"ClientImgId": _wrap(str(client_id)), "CreateTime": create_time, "Newmsgid": new_id})
+
+    async def send_emoji(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        _, _, new_id = self._record(request.path, param)
+        return self._success({"emojiItem": [{"Md5": param.get("Md5"), "TotalLen": param.get("TotalLen"),
+                                             "NewMsgId": new_id, "Ret": 0}]})
+
+    async def ok(self, request: web.Request) -> web.Response:
+        if request.can_read_body:
+            await request.read()
+        return self._success({})
+
+    def _echo(self, to_wxid: str, msg_type: int, xml: str, new_msg_id: int):
+        """机器人自己发的媒体消息会从同步消息里回来"""
+        self.push(self.make_message(self.wxid, to_wxid, msg_type, xml, new_msg_id=new_msg_id))
+
+    # ---------- 联系人和群聊 ---------- #
+
+    def _generate_contacts(self, friends: int, chatrooms: int, members: int):
+        for i in range(friends):
+            wxid = f"wxid_fake{i:06d}"
+            self.contacts[wxid] = self._make_contact(wxid, f"用户{i}")
+
+        for i in range(chatrooms):
+            chatroom = f"{10000000000 + i}@chatroom"
+            self.contacts[chatroom] = self._make_contact(chatroom, f"测试群{i}")
+            people = [f"wxid_fake{self.random.randrange(max(friends, 1)):06d}" for _ in range(members)]
+            self.chatroom_members[chatroom] = [
+                {"UserName": wxid, "NickName": self.contacts.get(wxid, {}).get("NickName", {}).get("string", wxid),
+                 "DisplayName": "", "BigHeadImgUrl": f"https://fake.invalid/{wxid}.jpg",
+                 "InviterUserName": self.wxid}
+                for wxid in dict.fromkeys(people + [self.wxid])
+            ]
+
+    @staticmethod
+    def _make_contact(wxid: str, nickname: str) -> dict:
+        return {"UserName": _wrap(wxid), "NickName": _wrap(nickname), "Remark": _wrap(""), "Alias": "",
+                "BigHeadImgUrl": f"https://fake.invalid/{wxid}.jpg",
+                "SmallHeadImgUrl": f"https://fake.invalid/{wxid}_s.jpg"}
+
+    async def get_contact(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        wxids = [wxid for wxid in str(param.get("RequestWxids", "")).split(",") if wxid]
+        if len(wxids) > 20:
+            return web.json_response({"Success": False, "Code": -1, "Message": "一次最多查询20个联系人"})
+        contacts = [self.contacts[wxid] for wxid in wxids if wxid in self.contacts]
+        return self._success({"ContactList": contacts})
+
+    async def get_contract_list(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        page = 100
+        start = int(param.get("CurrentWxcontactSeq", 0))
+        wxids = list(self.contacts)
+        end = min(start + page, len(wxids))
+        return self._success({"ContactUsernameList": wxids[start:end], "CurrentWxcontactSeq": end,
+                              "CurrentChatRoomContactSeq": 0, "CountinueFlag": 1 if end < len(wxids) else 0})
+
+    async def get_chatroom_member_detail(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        members = self.chatroom_members.get(param.get("Chatroom"), [])
+        return self._success({"ChatroomUserName": param.get("Chatroom"),
+                              "NewChatroomData": {"MemberCount": len(members), "ChatRoomMember": members}})
+
+    async def get_chatroom_info(self, request: web.Request) -> web.Response:
+        param = await request.json()
+        chatroom = self.contacts.get(param.get("Chatroom")) or self._make_contact(param.get("Chatroom", ""), "")
+        return self._success({"ContactList": [chatroom]})
+
+    async def get_profile(self, request: web.Request) -> web.Response:
+        await request.read()
+        return self._success({"userInfo": {"UserName": _wrap(self.wxid), "NickName": _wrap("FakeBot"),
+                                           "BindMobile": _wrap(""), "Alias": ""},
+                              "userInfoExt": {"BigHeadImgUrl": ""}})
+
+    async def get_cached_info(self, request: web.Request) -> web.Response:
+        await request.read()
+        return self._success({"Wxid": self.wxid})
+
+    async def heartbeat_status(self, request: web.Request) -> web.Response:
+        await request.read()
+        return self._success({"Running": True})
+
+    async def is_running(self, request: web.Request) -> web.Response:
+        return web.Response(text="OK")
+
+    async def check_database(self, request: web.Request) -> web.Response:
+        return self._success({"Running": True})
+
+    async def fake_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    # ---------- 下载 ---------- #
+
+    async def download_image(self, request: web.Request) -> web.Response:
+        await request.read()
+        return self._success(_PIXEL)
+
+    async def download_buffer(self, request: web.Request) -> web.Response:
+        await request.read()
+        return self._success({"data": {"buffer": base64.b64encode(b"\x00" * 1024).decode()}})
+
+    # ---------- 收到的消息 ---------- #
+
+    async def sync(self, request: web.Request) -> web.Response:
+        await request.read()
+        messages = [self.inbox.popleft() for _ in range(min(self.sync_batch, len(self.inbox)))]
+        return self._success({"AddMsgs": messages, "ModContacts": [], "DelContacts": [], "KeyBuf": {"iLen": 0}})
+
+    def learn(self, message: dict):
+        """回放录制的消息前调用: 把消息里没见过的联系人、群聊和群成员加进来，查询时不会查不到"""
+        from_wxid = (message.get("FromUserName") or {}).get("string", "")
+        if not from_wxid or from_wxid == self.wxid:
+            return
+        if not from_wxid.endswith("@chatroom"):
+            self.contacts.setdefault(from_wxid, self._make_contact(from_wxid, from_wxid))
+            return
+
+        self.contacts.setdefault(from_wxid, self._make_contact(from_wxid, from_wxid))
+        members = self.chatroom_members.setdefault(from_wxid, [])
+        content = (message.get("Content") or {}).get("string", "")
+        sender, sep, _ = content.partition(":\n")
+        if not sep or not sender or " " in sender or "<" in sender:
+            return
+        self.contacts.setdefault(sender, self._make_contact(sender, sender))
+        if all(member["UserName"] != sender for member in members):
+            members.append({"UserName": sender, "NickName": sender, "DisplayName": ""})
+
+    def make_message(self, from_wxid: str, to_wxid: str, msg_type: int, content: str, msg_source: str = "",
+                     new_msg_id: int = None) -> dict:
+        """构造一条和 /Sync 返回格式一致的原始消息"""
+        return {
+            "MsgId": self._new_id(),
+            "FromUserName": _wrap(from_wxid),
+            "ToWxid": _wrap(to_wxid),
+            "MsgType": msg_type,
+            "Content": _wrap(content),
+            "Status": 3,
+            "ImgStatus": 1,
+            "ImgBuf": {"iLen": 0},
+            "CreateTime": int(time.time()),
+            "MsgSource": msg_source or "<msgsource><atuserlist></atuserlist></msgsource>",
+            "PushContent": "",
+            "NewMsgId": new_msg_id or self._new_id(),
+            "MsgSeq": self._new_id() % 1000000,
+        }
+
+    def random_message(self, mix: Dict[str, float] = None) -> dict:
+        """按 mix 的权重随机生成一条收到的消息，类型见 MESSAGE_MIX"""
+        mix = mix or MESSAGE_MIX
+        friends = [wxid for wxid in self.contacts if not wxid.endswith("@chatroom")] or ["wxid_fake000000"]
+        sender = self.random.choice(friends)
+        kind = self.random.choices(list(mix), weights=list(mix.values()))[0]
+        if kind == "text" or not self.chatroom_members:
+            return self.make_message(sender, self.wxid, 1, f"你好 {self.random.randrange(100000)}")
+
+        chatroom = self.random.choice(list(self.chatroom_members))
+        if kind == "group_text":
+            return self.make_message(chatroom, self.wxid, 1, f"{sender}:\n随便聊聊 {self.random.randrange(100000)}")
+        if kind == "at":
+            source = f"<msgsource><atuserlist>{self.wxid}</atuserlist></msgsource>"
+            return self.make_message(chatroom, self.wxid, 1, f"{sender}:\n@FakeBot\u2005在吗", source)
+        if kind == "command":
+            command = self.random.choice(COMMANDS)
+            return self.make_message(chatroom, self.wxid, 1, f"{sender}:\n{command}")
+        if kind == "quote":
+            xml = ('<?xml version="1.0"?><msg><appmsg appid="" sdkver="0"><title>这是什么</title><type>57</type>'
+                   f'<refermsg><type>1</type><svrid>{self._new_id()}</svrid><fromusr>{chatroom}</fromusr>'
+                   f'<chatusr>{self.random.choice(friends)}</chatusr><displayname>某人</displayname>'
+                   '<content>被引用的消息</content><createtime>1700000000</createtime></refermsg>'
+                   '</appmsg></msg>')
+            return self.make_message(chatroom, self.wxid, 49, f"{sender}:\n{xml}")
+        if kind == "image":
+            xml = (f'<?xml version="1.0"?><msg><img aeskey="{self._new_id():032x}" '
+                   f'cdnmidimgurl="fake_cdn_{self._new_id()}" length="1024" /></msg>')
+            return self.make_message(chatroom, self.wxid, 3, f"{sender}:\n{xml}")
+        if kind == "voice":
+            xml = (f'<msg><voicemsg endflag="1" length="2048" voicelength="3000" '
+                   f'voiceurl="fake_voice_{self._new_id()}" /></msg>')
+            return self.make_message(chatroom, self.wxid, 34, f"{sender}:\n{xml}")
+
+        newcomer = f"wxid_newcomer{self._new_id()}"
+        self.chatroom_members[chatroom].append({"UserName": newcomer, "NickName": "新人", "DisplayName": ""})
+        xml = ('<sysmsg type="sysmsgtemplate"><sysmsgtemplate><content_template type="tmpl_type_profile">'
+               '<template><![CDATA["$username$"邀请"$names$"加入了群聊]]></template><link_list>'
+               f'<link name="username" type="link_profile"><memberlist><member><username>{sender}</username>'
+               '<nickname>邀请人</nickname></member></memberlist></link>'
+               f'<link name="names" type="link_profile"><memberlist><member><username>{newcomer}</username>'
+               '<nickname>新人</nickname></member></memberlist></link>'
+               '</link_list></content_template></sysmsgtemplate></sysmsg>')
+        return self.make_message(chatroom, self.wxid, 10002, f"{chatroom}:\n{xml}")
+
+    async def _generate_messages(self):
+        """按 inbound_rate 持续生成消息，按时间补齐，不会因为事件循环繁忙而变慢"""
+        start = time.monotonic()
+        generated = 0
+        while True:
+            due = int((time.monotonic() - start) * self.inbound_rate)
+            for _ in range(due - generated):
+                self.push(self.random_message())
+            generated = max(generated, due)
+            await asyncio.sleep(min(0.05, 1 / self.inbound_rate))
+
+
+def parse_error(value: str) -> Tuple[str, int, float]:
+    """解析 --error 参数: 接口:错误码[:概率]，例如 SendTextMsg:-12:0.05、*:-7"""
+    parts = value.split(":")
+    if len(parts) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"错误格式应为 接口:错误码[:概率]: {value}")
+    path = parts[0] if parts[0] == "*" else "/" + parts[0].lstrip("/")
+    return path, int(parts[1]), float(parts[2]) if len(parts) == 3 else 1.0
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="假的 WechatAPI 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--wxid", default="wxid_fakebot")
+    parser.add_argument("--latency", type=float, default=0, help="基础延迟(毫秒)")
+    parser.add_argument("--jitter", type=float, default=0, help="延迟浮动(毫秒)")
+    parser.add_argument("--upload-kbps", type=float, default=0, help="上传速度(KB/s)，真实服务约300")
+    parser.add_argument("--error", action="append", default=[], type=parse_error,
+                        help="注入错误，格式 接口:错误码[:概率]，接口为*时对所有接口生效，可以重复")
+    parser.add_argument("--friends", type=int, default=200)
+    parser.add_argument("--chatrooms", type=int, default=10)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--inbound-rate", type=float, default=0, help="每秒生成的收到消息数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    errors = {}
+    for path, code, rate in args.error:
+        errors.setdefault(path, []).append((code, rate))
+
+    server = FakeWechatAPI(wxid=args.wxid, latency=args.latency / 1000, jitter=args.jitter / 1000,
+                           upload_speed=args.upload_kbps * 1024, errors=errors, friends=args.friends,
+                           chatrooms=args.chatrooms, members=args.members, inbound_rate=args.inbound_rate,
+                           seed=args.seed)
+    port = await server.start(args.host, args.port)
+    print(f"假 WechatAPI 已启动: http://{args.host}:{port}  机器人wxid: {server.wxid}  Ctrl+C 退出")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
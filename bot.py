@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import json
 import os
 import sys
@@ -15,15 +16,28 @@ from WechatAPI.Server.WechatAPIServer import wechat_api_server
 from database.XYBotDB import XYBotDB
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from utils.bot_stats import BotStats
 from utils.decorators import scheduler
+from utils.event_manager import EventManager
+from utils.message_pipeline import MessagePipeline
 from utils.plugin_manager import PluginManager
+from utils.sync_capture import SyncRecorder
+from utils.sync_loop import SyncLoop
 from utils.xybot import XYBot
 
 
+def _log_resume_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("续发群发任务失败: {}", task.exception())
+
+
 async def run_bot():
     """
     机器人主要运行逻辑
     """
+    pipeline = None
+    bot = None
+    resume_task = None
 
     try:
         # 设置工作目录
@@ -50,8 +64,26 @@ async def run_bot():
                            redis_db=api_config.get("redis-db", 0))
 
         # 实例化WechatAPI客户端
-        bot = WechatAPI.WechatAPIClient("127.0.0.1", api_config.get("port", 9000))
+        bot = WechatAPI.WechatAPIClient("127.0.0.1", api_config.get("port", 9000),
+                                        pool_size=api_config.get("http-pool-size", 100),
+                                        timeout=api_config.get("http-timeout", 30),
+                                        keepalive=api_config.get("http-keepalive", 60))
         bot.ignore_protect = main_config.get("XYBot", {}).get("ignore-protection", False)
+        bot.send_scheduler.configure(rate=main_config.get("XYBot", {}).get("send-rate", 1),
+                                     burst=main_config.get("XYBot", {}).get("send-burst", 2),
+                                     global_rate=main_config.get("XYBot", {}).get("send-global-rate", 5),
+                                     concurrency=main_config.get("XYBot", {}).get("send-concurrency", 5))
+        bot.media_cache.ttl = main_config.get("XYBot", {}).get("media-cache-ttl", 86400)
+        bot.broadcast_state_dir = main_config.get("XYBot", {}).get("broadcast-state-dir", "database/broadcast")
+        bot.contacts.ttl = main_config.get("XYBot", {}).get("contact-cache-ttl", 3600)
+        bot.contacts.max_entries = main_config.get("XYBot", {}).get("contact-cache-size", 5000)
+        bot.contacts.negative_ttl = main_config.get("XYBot", {}).get("contact-cache-miss-ttl", 60)
+        bot.chatroom_members.refresh_interval = main_config.get("XYBot", {}).get("chatroom-member-refresh", 3600)
+        bot.chatroom_members.store = XYBotDB()
+        WechatAPI.transcoder.max_workers = main_config.get("XYBot", {}).get("transcode-workers", 2)
+        if main_config.get("XYBot", {}).get("sync-capture"):
+            bot.sync_recorder = SyncRecorder(main_config["XYBot"]["sync-capture"])
+            logger.info("同步到的消息将保存到 {}", bot.sync_recorder.path)
 
         # 等待WechatAPI服务启动
         # time_out = 10
@@ -193,10 +225,31 @@ async def run_bot():
         #     if "在运行" not in str(e):
         #         logger.warning("自动心跳已在运行")
 
+        # 指令的回复和管理员的回复排在普通消息和群发前面发送
+        admins = set(main_config.get("XYBot", {}).get("admins", []))
+
+        def reply_priority(is_command: bool, message: dict):
+            if is_command or message.get("SenderWxid") in admins:
+                return WechatAPI.send_priority(WechatAPI.SendPriority.HIGH)
+            return contextlib.nullcontext()
+
+        EventManager.set_call_context(reply_priority)
+
         # 初始化机器人
         xybot = XYBot(bot)
         xybot.update_profile(bot.wxid, bot.nickname, bot.alias, bot.phone)
 
+        # 初始化消息处理流水线
+        xybot_config = main_config.get("XYBot", {})
+        pipeline = MessagePipeline(xybot.process_message,
+                                   workers=xybot_config.get("pipeline-workers", 8),
+                                   max_size=xybot_config.get("pipeline-queue-size", 1000),
+                                   self_wxid=bot.wxid)
+        xybot.pipeline = pipeline
+
+        # 统计数据定时写回数据库
+        xybot.stats.start(xybot_config.get("stats-flush-interval", 30))
+
         # 启动调度器
         if scheduler.state == 0:
             scheduler.start()
@@ -204,6 +257,10 @@ async def run_bot():
             scheduler.remove_all_jobs()
         logger.success("定时任务已启动")
 
+        # 继续发送上次没发完的群发任务，不阻塞接收消息
+        resume_task = asyncio.create_task(bot.resume_broadcasts())
+        resume_task.add_done_callback(_log_resume_error)
+
         # ========== 开始接受消息 ========== #
 
         # 开始接受消息说明机器人开始正常运行
@@ -228,22 +285,37 @@ async def run_bot():
         #     await asyncio.sleep(1)
         # logger.success("处理堆积消息完毕")
 
+        pipeline.start()
         logger.success("开始处理消息")
-        while True:
-            # try:
-            #     data = await bot.sync_message()
-            # except Exception as e:
-            #     logger.warning("获取新消息失败 {}", e)
-            #     await asyncio.sleep(5)
-            #     continue
-
-            # data = data.get("AddMsgs")
-            # if data:
-            #     for message in data:
-            #         asyncio.create_task(xybot.process_message(message))
-            await asyncio.sleep(0.5)
+        if xybot_config.get("sync-enabled", False):
+            sync_loop = SyncLoop(bot, pipeline.submit,
+                                 min_interval=xybot_config.get("sync-interval-min", 0.05),
+                                 max_interval=xybot_config.get("sync-interval-max", 0.5),
+                                 max_error_interval=xybot_config.get("sync-error-interval-max", 60),
+                                 push_url=xybot_config.get("sync-push-url", ""))
+            await sync_loop.run()
+        else:
+            # 默认不在这里同步消息，和原来一样一直等到机器人关闭
+            await asyncio.Event().wait()
 
     except asyncio.CancelledError:
+        if resume_task and not resume_task.done():
+            # 没发完的进度已经保存，下次启动继续
+            resume_task.cancel()
+            try:
+                await resume_task
+            except asyncio.CancelledError:
+                pass
+        if pipeline:
+            await pipeline.stop(drain=False)
+        await BotStats().stop()
+        await MessageDB().flush()
+        if bot:
+            if bot.sync_recorder:
+                bot.sync_recorder.close()
+            await bot.send_scheduler.close()
+            await bot.close()
+        WechatAPI.transcoder.shutdown()
         await wechat_api_server.stop()
         logger.info("机器人关闭")
     except Exception as e:
@@ -1,4 +1,6 @@
+import asyncio
 import datetime
+import threading
 import tomllib
 from concurrent.futures import ThreadPoolExecutor
 from typing import Union
@@ -48,11 +50,23 @@ class XYBotDB(metaclass=Singleton):
         # 创建表
         Base.metadata.create_all(self.engine)
 
-        # 创建线程池执行器
-        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database")
+        # 创建线程池执行器，所有数据库操作都在这一个线程里排队执行
+        self._queue_thread = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="database",
+                                           initializer=self._mark_queue_thread)
+
+    def _mark_queue_thread(self):
+        self._queue_thread.active = True
+
+    def _in_queue_thread(self) -> bool:
+        return getattr(self._queue_thread, "active", False)
 
     def _execute_in_queue(self, method, *args, **kwargs):
-        """在队列中执行数据库操作"""
+        """在队列中执行数据库操作（同步，会阻塞调用线程）"""
+        if self._in_queue_thread():
+            # 已经在队列线程里（例如子类在队列中调用了其他方法），直接执行，避免自己等自己
+            return method(*args, **kwargs)
+
         future = self.executor.submit(method, *args, **kwargs)
         try:
             return future.result(timeout=20)  # 20秒超时
@@ -60,12 +74,25 @@ class XYBotDB(metaclass=Singleton):
             logger.error(f"数据库操作失败: {method.__name__} - {str(e)}")
             raise
 
+    async def _run_in_queue(self, method, *args, **kwargs):
+        """在队列中执行数据库操作，等待结果时不阻塞事件循环"""
+        future = self.executor.submit(method, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=20)  # 20秒超时
+        except Exception as e:
+            logger.error(f"数据库操作失败: {method.__name__} - {str(e)}")
+            raise
+
     # USER
 
     def add_points(self, wxid: str, num: int) -> bool:
         """Thread-safe point addition"""
         return self._execute_in_queue(self._add_points, wxid, num)
 
+    async def async_add_points(self, wxid: str, num: int) -> bool:
+        """add_points 的异步版本"""
+        return await self._run_in_queue(self._add_points, wxid, num)
+
     def _add_points(self, wxid: str, num: int) -> bool:
         """Thread-safe point addition"""
         session = self.DBSession()
@@ -94,6 +121,10 @@ class XYBotDB(metaclass=Singleton):
         """Thread-safe point setting"""
         return self._execute_in_queue(self._set_points, wxid, num)
 
+    async def async_set_points(self, wxid: str, num: int) -> bool:
+        """set_points 的异步版本"""
+        return await self._run_in_queue(self._set_points, wxid, num)
+
     def _set_points(self, wxid: str, num: int) -> bool:
         """Thread-safe point setting"""
         session = self.DBSession()
@@ -120,6 +151,10 @@ class XYBotDB(metaclass=Singleton):
         """Get user points"""
         return self._execute_in_queue(self._get_points, wxid)
 
+    async def async_get_points(self, wxid: str) -> int:
+        """get_points 的异步版本"""
+        return await self._run_in_queue(self._get_points, wxid)
+
     def _get_points(self, wxid: str) -> int:
         """Get user points"""
         session = self.DBSession()
@@ -133,6 +168,10 @@ class XYBotDB(metaclass=Singleton):
         """获取用户签到状态"""
         return self._execute_in_queue(self._get_signin_stat, wxid)
 
+    async def async_get_signin_stat(self, wxid: str) -> datetime.datetime:
+        """get_signin_stat 的异步版本"""
+        return await self._run_in_queue(self._get_signin_stat, wxid)
+
     def _get_signin_stat(self, wxid: str) -> datetime.datetime:
         session = self.DBSession()
         try:
@@ -145,6 +184,10 @@ class XYBotDB(metaclass=Singleton):
         """Thread-safe set user's signin time"""
         return self._execute_in_queue(self._set_signin_stat, wxid, signin_time)
 
+    async def async_set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
+        """set_signin_stat 的异步版本"""
+        return await self._run_in_queue(self._set_signin_stat, wxid, signin_time)
+
     def _set_signin_stat(self, wxid: str, signin_time: datetime.datetime) -> bool:
         session = self.DBSession()
         try:
@@ -174,6 +217,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def reset_all_signin_stat(self) -> bool:
+        """Reset all users' signin status"""
+        return self._execute_in_queue(self._reset_all_signin_stat)
+
+    async def async_reset_all_signin_stat(self) -> bool:
+        """reset_all_signin_stat 的异步版本"""
+        return await self._run_in_queue(self._reset_all_signin_stat)
+
+    def _reset_all_signin_stat(self) -> bool:
         """Reset all users' signin status"""
         session = self.DBSession()
         try:
@@ -188,6 +239,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def get_leaderboard(self, count: int) -> list:
+        """Get points leaderboard"""
+        return self._execute_in_queue(self._get_leaderboard, count)
+
+    async def async_get_leaderboard(self, count: int) -> list:
+        """get_leaderboard 的异步版本"""
+        return await self._run_in_queue(self._get_leaderboard, count)
+
+    def _get_leaderboard(self, count: int) -> list:
         """Get points leaderboard"""
         session = self.DBSession()
         try:
@@ -197,6 +256,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def set_whitelist(self, wxid: str, stat: bool) -> bool:
+        """Set user's whitelist status"""
+        return self._execute_in_queue(self._set_whitelist, wxid, stat)
+
+    async def async_set_whitelist(self, wxid: str, stat: bool) -> bool:
+        """set_whitelist 的异步版本"""
+        return await self._run_in_queue(self._set_whitelist, wxid, stat)
+
+    def _set_whitelist(self, wxid: str, stat: bool) -> bool:
         """Set user's whitelist status"""
         session = self.DBSession()
         try:
@@ -216,6 +283,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def get_whitelist(self, wxid: str) -> bool:
+        """Get user's whitelist status"""
+        return self._execute_in_queue(self._get_whitelist, wxid)
+
+    async def async_get_whitelist(self, wxid: str) -> bool:
+        """get_whitelist 的异步版本"""
+        return await self._run_in_queue(self._get_whitelist, wxid)
+
+    def _get_whitelist(self, wxid: str) -> bool:
         """Get user's whitelist status"""
         session = self.DBSession()
         try:
@@ -225,6 +300,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def get_whitelist_list(self) -> list:
+        """Get list of all whitelisted users"""
+        return self._execute_in_queue(self._get_whitelist_list)
+
+    async def async_get_whitelist_list(self) -> list:
+        """get_whitelist_list 的异步版本"""
+        return await self._run_in_queue(self._get_whitelist_list)
+
+    def _get_whitelist_list(self) -> list:
         """Get list of all whitelisted users"""
         session = self.DBSession()
         try:
@@ -237,6 +320,10 @@ class XYBotDB(metaclass=Singleton):
         """Thread-safe points trading between users"""
         return self._execute_in_queue(self._safe_trade_points, trader_wxid, target_wxid, num)
 
+    async def async_safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
+        """safe_trade_points 的异步版本"""
+        return await self._run_in_queue(self._safe_trade_points, trader_wxid, target_wxid, num)
+
     def _safe_trade_points(self, trader_wxid: str, target_wxid: str, num: int) -> bool:
         """Thread-safe points trading between users"""
         session = self.DBSession()
@@ -272,6 +359,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def get_user_list(self) -> list:
+        """Get list of all users"""
+        return self._execute_in_queue(self._get_user_list)
+
+    async def async_get_user_list(self) -> list:
+        """get_user_list 的异步版本"""
+        return await self._run_in_queue(self._get_user_list)
+
+    def _get_user_list(self) -> list:
         """Get list of all users"""
         session = self.DBSession()
         try:
@@ -281,6 +376,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
+        """Get LLM thread id for user or chatroom"""
+        return self._execute_in_queue(self._get_llm_thread_id, wxid, namespace)
+
+    async def async_get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
+        """get_llm_thread_id 的异步版本"""
+        return await self._run_in_queue(self._get_llm_thread_id, wxid, namespace)
+
+    def _get_llm_thread_id(self, wxid: str, namespace: str = None) -> Union[dict, str]:
         """Get LLM thread id for user or chatroom"""
         session = self.DBSession()
         try:
@@ -302,6 +405,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def save_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
+        """Save LLM thread id for user or chatroom"""
+        return self._execute_in_queue(self._save_llm_thread_id, wxid, data, namespace)
+
+    async def async_save_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
+        """save_llm_thread_id 的异步版本"""
+        return await self._run_in_queue(self._save_llm_thread_id, wxid, data, namespace)
+
+    def _save_llm_thread_id(self, wxid: str, data: str, namespace: str) -> bool:
         """Save LLM thread id for user or chatroom"""
         session = self.DBSession()
         try:
@@ -341,6 +452,14 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def delete_all_llm_thread_id(self):
+        """Clear llm thread id for everyone"""
+        return self._execute_in_queue(self._delete_all_llm_thread_id)
+
+    async def async_delete_all_llm_thread_id(self):
+        """delete_all_llm_thread_id 的异步版本"""
+        return await self._run_in_queue(self._delete_all_llm_thread_id)
+
+    def _delete_all_llm_thread_id(self):
         """Clear llm thread id for everyone"""
         session = self.DBSession()
         try:
@@ -359,6 +478,10 @@ class XYBotDB(metaclass=Singleton):
         """Thread-safe get user's signin streak"""
         return self._execute_in_queue(self._get_signin_streak, wxid)
 
+    async def async_get_signin_streak(self, wxid: str) -> int:
+        """get_signin_streak 的异步版本"""
+        return await self._run_in_queue(self._get_signin_streak, wxid)
+
     def _get_signin_streak(self, wxid: str) -> int:
         session = self.DBSession()
         try:
@@ -371,6 +494,10 @@ class XYBotDB(metaclass=Singleton):
         """Thread-safe set user's signin streak"""
         return self._execute_in_queue(self._set_signin_streak, wxid, streak)
 
+    async def async_set_signin_streak(self, wxid: str, streak: int) -> bool:
+        """set_signin_streak 的异步版本"""
+        return await self._run_in_queue(self._set_signin_streak, wxid, streak)
+
     def _set_signin_streak(self, wxid: str, streak: int) -> bool:
         session = self.DBSession()
         try:
@@ -395,6 +522,14 @@ class XYBotDB(metaclass=Singleton):
     # CHATROOM
 
     def get_chatroom_list(self) -> list:
+        """Get list of all chatrooms"""
+        return self._execute_in_queue(self._get_chatroom_list)
+
+    async def async_get_chatroom_list(self) -> list:
+        """get_chatroom_list 的异步版本"""
+        return await self._run_in_queue(self._get_chatroom_list)
+
+    def _get_chatroom_list(self) -> list:
         """Get list of all chatrooms"""
         session = self.DBSession()
         try:
@@ -404,15 +539,34 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def get_chatroom_members(self, chatroom_id: str) -> set:
+        """Get members of a chatroom"""
+        return self._execute_in_queue(self._get_chatroom_members, chatroom_id)
+
+    async def async_get_chatroom_members(self, chatroom_id: str) -> set:
+        """get_chatroom_members 的异步版本"""
+        return await self._run_in_queue(self._get_chatroom_members, chatroom_id)
+
+    def _get_chatroom_members(self, chatroom_id: str) -> set:
         """Get members of a chatroom"""
         session = self.DBSession()
         try:
             chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            return set(chatroom.members) if chatroom else set()
+            if not chatroom:
+                return set()
+            # 成员列表缓存保存的是完整的成员信息，这里只取wxid
+            return {member.get("UserName") if isinstance(member, dict) else member for member in chatroom.members}
         finally:
             session.close()
 
     def set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
+        """Set members of a chatroom"""
+        return self._execute_in_queue(self._set_chatroom_members, chatroom_id, members)
+
+    async def async_set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
+        """set_chatroom_members 的异步版本"""
+        return await self._run_in_queue(self._set_chatroom_members, chatroom_id, members)
+
+    def _set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
         """Set members of a chatroom"""
         session = self.DBSession()
         try:
@@ -421,7 +575,7 @@ class XYBotDB(metaclass=Singleton):
                 chatroom = Chatroom(chatroom_id=chatroom_id)
                 session.add(chatroom)
             chatroom.members = list(members)  # Convert set to list for JSON storage
-            logger.info(f"Database: Set chatroom {chatroom_id} members successfully")
+            logger.debug(f"Database: Set chatroom {chatroom_id} members successfully")
             session.commit()
             return True
         except Exception as e:
@@ -431,7 +585,40 @@ class XYBotDB(metaclass=Singleton):
         finally:
             session.close()
 
+    def get_chatroom_member_list(self, chatroom_id: str) -> list[dict]:
+        """获取保存的群成员信息列表，只保存了wxid的成员为 {"UserName": wxid}"""
+        return self._execute_in_queue(self._get_chatroom_member_list, chatroom_id)
+
+    async def async_get_chatroom_member_list(self, chatroom_id: str) -> list[dict]:
+        """get_chatroom_member_list 的异步版本"""
+        return await self._run_in_queue(self._get_chatroom_member_list, chatroom_id)
+
+    def _get_chatroom_member_list(self, chatroom_id: str) -> list[dict]:
+        session = self.DBSession()
+        try:
+            chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
+            if not chatroom:
+                return []
+            return [member if isinstance(member, dict) else {"UserName": member} for member in chatroom.members]
+        finally:
+            session.close()
+
+    def set_chatroom_member_list(self, chatroom_id: str, members: list[dict]) -> bool:
+        """保存群成员信息列表，成员格式和 get_chatroom_member_list 接口的返回值一致"""
+        return self._execute_in_queue(self._set_chatroom_members, chatroom_id, members)
+
+    async def async_set_chatroom_member_list(self, chatroom_id: str, members: list[dict]) -> bool:
+        """set_chatroom_member_list 的异步版本"""
+        return await self._run_in_queue(self._set_chatroom_members, chatroom_id, members)
+
     def get_users_count(self):
+        return self._execute_in_queue(self._get_users_count)
+
+    async def async_get_users_count(self):
+        """get_users_count 的异步版本"""
+        return await self._run_in_queue(self._get_users_count)
+
+    def _get_users_count(self):
         session = self.DBSession()
         try:
             return session.query(User).count()
@@ -1,25 +1,171 @@
 import asyncio
 import logging
+import sys
+import threading
 import tomllib
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Union, List
+from typing import Any, Dict, Iterable, Optional, Tuple, Union, List
+from urllib.parse import quote
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Text, DateTime, delete, select
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
-from sqlalchemy.orm import declarative_base, sessionmaker
 
+from database.keyval_backends import Entry as _Entry, KeyvalBackend, RedisKeyvalBackend, SQLiteKeyvalBackend
+from database.keyval_backends import KeyValue  # noqa: F401 兼容从这里导入模型的代码
 from utils.singleton import Singleton
 
-DeclarativeBase = declarative_base()
 
+class KeyvalCache:
+    """KeyvalDB 前面的 LRU 缓存
 
-class KeyValue(DeclarativeBase):
-    __tablename__ = 'key_value_store'
+    按条目数和占用内存两个上限淘汰最久没用的条目。不存在的键也会缓存（值为 None），避免反复查询数据库。
+    过期时间和值一起缓存，读取时由 KeyvalDB 判断是否过期。机器人线程和 WebUI 线程共用同一个实例，所以加锁。
 
-    key = Column(String(255), primary_key=True, unique=True, comment='键名')
-    value = Column(Text, nullable=False, comment='存储值')
-    expire_time = Column(DateTime, index=True, comment='过期时间')
+    Args:
+        max_entries: 最多缓存的条目数，为0时不缓存
+        max_bytes: 最多占用的内存（估算值）
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[_Entry, int]]" = OrderedDict()
+        self._bytes = 0
+        # 每次写入加一，读数据库期间有写入时不把读到的旧值放进缓存
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: str, value: Optional[str], expire_time: Optional[datetime], version: int = None):
+        """放入缓存，传入 version 时只有这期间没有写入才放入"""
+        if self.max_entries <= 0:
+            return
+        size = sys.getsizeof(key) + (sys.getsizeof(value) if value is not None else 0)
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = ((value, expire_time), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def write(self, key: str, value: Optional[str], expire_time: Optional[datetime]):
+        """写入数据库之后调用，更新缓存"""
+        with self._lock:
+            self.version += 1
+        self.put(key, value, expire_time)
+
+    def discard(self, key: str):
+        with self._lock:
+            self.version += 1
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0, "evictions": self.evictions}
+
+
+def _expire_at(ex: Optional[Union[int, timedelta]]) -> Optional[datetime]:
+    """把过期时间（秒或timedelta）换算成到期的时间点"""
+    if not ex:
+        return None
+    return datetime.now() + (ex if isinstance(ex, timedelta) else timedelta(seconds=ex))
+
+
+class KeyvalPipeline:
+    """把多个写操作放在同一个事务里执行，类似 Redis 的 pipeline
+
+    用法::
+
+        async with KeyvalDB().pipeline() as pipe:
+            pipe.incr("a")
+            pipe.set("b", "1", ex=60)
+        print(pipe.results)   # [1, True]
+
+    也可以不用 async with，手动调用 ``await pipe.execute()`` 获取结果。
+    操作按添加顺序执行，任何一个失败时整个事务回滚并抛出异常。
+    """
+
+    def __init__(self, db: "KeyvalDB"):
+        self.db = db
+        self.results: list = []
+        self._ops: List[tuple] = []
+
+    def set(self, key: str, value: Union[str, dict, list], ex: Optional[Union[int, timedelta]] = None):
+        self._ops.append(("set", key, str(value), _expire_at(ex)))
+        return self
+
+    def mset(self, mapping: Dict[str, Union[str, dict, list]]):
+        for key, value in mapping.items():
+            self.set(key, value)
+        return self
+
+    def delete(self, key: str):
+        self._ops.append(("delete", key))
+        return self
+
+    def incrby(self, key: str, amount: int):
+        self._ops.append(("incrby", key, int(amount)))
+        return self
+
+    def incr(self, key: str):
+        return self.incrby(key, 1)
+
+    def decrby(self, key: str, amount: int):
+        return self.incrby(key, -amount)
+
+    def decr(self, key: str):
+        return self.incrby(key, -1)
+
+    def expire(self, key: str, ex: Union[int, timedelta]):
+        self._ops.append(("expire", key, _expire_at(ex)))
+        return self
+
+    async def execute(self) -> list:
+        ops, self._ops = self._ops, []
+        self.results = await self.db._execute(ops) if ops else []
+        return self.results
+
+    def __len__(self):
+        return len(self._ops)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.execute()
 
 
 class KeyvalDB(metaclass=Singleton):
@@ -28,31 +174,42 @@ class KeyvalDB(metaclass=Singleton):
     def __new__(cls):
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
-        db_url = main_config["XYBot"]["keyvalDB-url"]
+        xybot_config = main_config["XYBot"]
+        cache_size = xybot_config.get("keyvalDB-cache-size", 10000)
+        cache_memory = xybot_config.get("keyvalDB-cache-memory", 16)
 
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance.engine = create_async_engine(
-                db_url,
-                echo=False,
-                future=True
-            )
-            cls._async_session_factory = async_scoped_session(
-                sessionmaker(
-                    cls._instance.engine,
-                    class_=AsyncSession,
-                    expire_on_commit=False
-                ),
-                scopefunc=asyncio.current_task
-            )
+            cls._instance.backend = cls._create_backend(main_config)
+            # 读缓存，写入时同步更新；数据可能被其他进程修改时不缓存
+            if cls._instance.backend.shared:
+                cache_size = 0
+            cls._instance.cache = KeyvalCache(max_entries=max(cache_size, 0),
+                                              max_bytes=max(cache_memory, 0) * 1024 * 1024)
         return cls._instance
 
+    @staticmethod
+    def _create_backend(main_config: dict) -> KeyvalBackend:
+        """按配置的 keyvalDB-backend 创建存储后端"""
+        xybot_config = main_config["XYBot"]
+        backend = xybot_config.get("keyvalDB-backend", "sqlite")
+        if backend == "sqlite":
+            return SQLiteKeyvalBackend(xybot_config["keyvalDB-url"])
+        if backend == "redis":
+            url = xybot_config.get("keyvalDB-redis-url", "")
+            if not url:
+                # 默认和 WechatAPI 服务用同一个 Redis
+                api_config = main_config.get("WechatAPIServer", {})
+                password = api_config.get("redis-password", "")
+                url = (f"redis://{':' + quote(password, safe='') + '@' if password else ''}"
+                       f"{api_config.get('redis-host', '127.0.0.1')}:{api_config.get('redis-port', 6379)}"
+                       f"/{api_config.get('redis-db', 0)}")
+            return RedisKeyvalBackend(url, prefix=xybot_config.get("keyvalDB-redis-prefix", "xybot:keyval:"))
+        raise ValueError(f"不支持的键值数据库后端: {backend}，可选 sqlite、redis")
+
     async def initialize(self):
         """异步初始化数据库"""
-        async with self.engine.begin() as conn:
-            await conn.run_sync(DeclarativeBase.metadata.create_all)
-        # 启动后台清理任务
-        asyncio.create_task(self._cleanup_expired())
+        await self.backend.initialize()
 
     @validate_arguments
     async def set(
@@ -62,115 +219,144 @@ class KeyvalDB(metaclass=Singleton):
             ex: Optional[Union[int, timedelta]] = None
     ) -> bool:
         """设置键值对，支持过期时间（秒或timedelta）"""
-        async with self._async_session_factory() as session:
-            try:
-                expire_time = None
-                if ex:
-                    # 统一处理时间类型转换
-                    if isinstance(ex, int):
-                        expire_time = datetime.now() + timedelta(seconds=ex)
-                    else:
-                        expire_time = datetime.now() + ex
-
-                kv = KeyValue(
-                    key=key,
-                    value=str(value),
-                    expire_time=expire_time
-                )
-                await session.merge(kv)
-                await session.commit()
-                return True
-            except Exception as e:
-                logging.error(f"设置键值失败: {str(e)}")
-                await session.rollback()
-                return False
+        try:
+            await self._execute([("set", key, str(value), _expire_at(ex))])
+            return True
+        except Exception as e:
+            logging.error(f"设置键值失败: {str(e)}")
+            return False
+
+    async def mset(self, mapping: Dict[str, Union[str, dict, list]]) -> bool:
+        """在一个事务里设置多个键值对，已有的过期时间会被清除"""
+        try:
+            await self.pipeline().mset(mapping).execute()
+            return True
+        except Exception as e:
+            logging.error(f"批量设置键值失败: {str(e)}")
+            return False
+
+    async def incrby(self, key: str, amount: int) -> int:
+        """把键的值加上 amount 并返回新值，键不存在或已过期时从0开始，值不是整数时抛出 ValueError"""
+        return (await self._execute([("incrby", key, int(amount))]))[0]
+
+    async def incr(self, key: str) -> int:
+        return await self.incrby(key, 1)
+
+    async def decrby(self, key: str, amount: int) -> int:
+        return await self.incrby(key, -amount)
+
+    async def decr(self, key: str) -> int:
+        return await self.incrby(key, -1)
+
+    def pipeline(self) -> KeyvalPipeline:
+        """创建一个 pipeline，多个写操作在同一个事务里执行"""
+        return KeyvalPipeline(self)
+
+    async def _execute(self, ops: List[tuple]) -> list:
+        """在一个事务里按顺序执行写操作，提交后更新缓存"""
+        try:
+            replies = await self.backend.execute(ops)
+        except Exception:
+            for op, key, *_ in ops:
+                self.cache.discard(key)
+            raise
+
+        results = []
+        for (op, key, *_), (result, entry) in zip(ops, replies):
+            if entry is None:
+                self.cache.discard(key)
+            else:
+                self.cache.write(key, *entry)
+            results.append(result)
+        return results
+
+    async def _lookup(self, key: str) -> _Entry:
+        """读取 (值, 过期时间)，先查缓存，没有再查数据库并放入缓存；不检查是否过期"""
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+
+        version = self.cache.version
+        entry = (await self.backend.lookup([key]))[key]
+        self.cache.put(key, *entry, version=version)
+        return entry
+
+    async def _drop_expired(self, key: str):
+        await self.backend.drop_expired(key)
+        self.cache.discard(key)
 
     async def get(self, key: str) -> Optional[str]:
         """获取键值，自动处理过期数据"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
-                return None
+        value, expire_time = await self._lookup(key)
+        if value is None:
+            return None
 
-            if result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
-                await session.commit()
-                return None
+        if expire_time and expire_time < datetime.now():
+            await self._drop_expired(key)
+            return None
+
+        return value
+
+    async def mget(self, keys: Iterable[str]) -> List[Optional[str]]:
+        """获取多个键的值，返回和 keys 一一对应的列表，不存在或已过期的为 None，缓存中没有的键一次查询"""
+        keys = list(keys)
+        entries: Dict[str, _Entry] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            entry = self.cache.get(key)
+            if entry is None:
+                missing.append(key)
+            else:
+                entries[key] = entry
 
-            return result.value
+        if missing:
+            version = self.cache.version
+            for key, entry in (await self.backend.lookup(missing)).items():
+                entries[key] = entry
+                self.cache.put(key, *entry, version=version)
+
+        now = datetime.now()
+        return [value if value is not None and not (expire_time and expire_time < now) else None
+                for value, expire_time in (entries[key] for key in keys)]
 
     async def delete(self, key: str) -> bool:
         """删除键值"""
-        async with self._async_session_factory() as session:
-            result = await session.execute(delete(KeyValue).where(KeyValue.key == key))
-            await session.commit()
-            return result.rowcount > 0
+        return (await self._execute([("delete", key)]))[0]
 
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if result and result.expire_time and result.expire_time < datetime.now():
-                await session.delete(result)
-                await session.commit()
-                return False
-            return result is not None
+        value, expire_time = await self._lookup(key)
+        if value is not None and expire_time and expire_time < datetime.now():
+            await self._drop_expired(key)
+            return False
+        return value is not None
 
     async def ttl(self, key: str) -> int:
         """获取剩余生存时间（秒）"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result or not result.expire_time:
-                return -1
+        value, expire_time = await self._lookup(key)
+        if value is None or not expire_time:
+            return -1
 
-            remaining = (result.expire_time - datetime.now()).total_seconds()
-            # 明确返回类型处理
-            return int(remaining) if remaining > 0 else -2
+        remaining = (expire_time - datetime.now()).total_seconds()
+        # 明确返回类型处理
+        return int(remaining) if remaining > 0 else -2
 
     async def expire(self, key: str, ex: Union[int, timedelta]) -> bool:
-        """设置过期时间"""
-        async with self._async_session_factory() as session:
-            result = await session.get(KeyValue, key)
-            if not result:
-                return False
-
-            expire_time = datetime.now() + (ex if isinstance(ex, timedelta) else timedelta(seconds=ex))
-            result.expire_time = expire_time
-            await session.commit()
-            return True
+        """设置过期时间，键不存在或已过期时返回 False"""
+        return (await self._execute([("expire", key, _expire_at(ex))]))[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """获取读缓存的统计数据：命中次数、未命中次数（即查询数据库的次数）等，使用 Redis 时不缓存"""
+        return self.cache.stats()
 
     async def keys(self, pattern: str = "*") -> List[str]:
         """查找匹配模式的键"""
-        async with self._async_session_factory() as session:
-            # 显式指定查询列类型
-            query = select(KeyValue.key).where(KeyValue.key.like(pattern.replace("*", "%")))
-            result = await session.execute(query)
-            return [str(row[0]) for row in result.all()]  # 确保返回字符串类型
-
-    async def _cleanup_expired(self, interval: int = 3600):
-        """后台定时清理过期数据"""
-        while True:
-            async with self._async_session_factory() as session:
-                await session.execute(
-                    delete(KeyValue).where(KeyValue.expire_time < datetime.now())
-                )
-                await session.commit()
-            await asyncio.sleep(interval)
+        return await self.backend.keys(pattern)
 
     async def close(self):
         """关闭数据库连接"""
         try:
-            # 取消清理任务如果正在运行
-            for task in asyncio.all_tasks():
-                if task != asyncio.current_task() and '_cleanup_expired' in str(task):
-                    task.cancel()
-                    try:
-                        await task
-                    except asyncio.CancelledError:
-                        pass
-
-            # 关闭连接
-            await self.engine.dispose()
+            await self.backend.close()
             return True
         except asyncio.CancelledError:
             logging.warning("键值数据库关闭过程被取消，这可能是正常的关闭行为")
@@ -0,0 +1,286 @@
+import asyncio
+import weakref
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, and_, case, cast, delete, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+DeclarativeBase = declarative_base()
+
+# 一个键的内容: (值，不存在时为 None, 过期时间)
+Entry = Tuple[Optional[str], Optional[datetime]]
+
+
+class KeyValue(DeclarativeBase):
+    __tablename__ = 'key_value_store'
+
+    key = Column(String(255), primary_key=True, unique=True, comment='键名')
+    value = Column(Text, nullable=False, comment='存储值')
+    expire_time = Column(DateTime, index=True, comment='过期时间')
+
+
+class KeyvalBackend:
+    """KeyvalDB 的存储后端
+
+    KeyvalDB 负责过期判断、读缓存和对外的接口，后端只需要实现下面几个方法。
+    写操作是 (操作名, 键, 参数...) 的元组，操作名为 set(值, 过期时间)、delete、incrby(增量)、expire(过期时间)，
+    过期时间为到期的时间点，None 表示不过期。
+    """
+
+    # 数据是否可能被其他进程修改，为 True 时 KeyvalDB 不使用本地读缓存
+    shared = False
+
+    async def initialize(self):
+        pass
+
+    async def lookup(self, keys: List[str]) -> Dict[str, Entry]:
+        """读取多个键，返回每个键的 (值, 过期时间)，不存在的为 (None, None)，已过期的也原样返回"""
+        raise NotImplementedError
+
+    async def execute(self, ops: List[tuple]) -> List[Tuple[Any, Optional[Entry]]]:
+        """在一个事务里按顺序执行写操作，返回每个操作的 (结果, 写入后的内容)，内容不确定时为 None"""
+        raise NotImplementedError
+
+    async def drop_expired(self, key: str):
+        """删除已过期的键"""
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class SQLiteKeyvalBackend(KeyvalBackend):
+    """保存在 SQLite（或其他 SQLAlchemy 支持的数据库）里，过期的数据由后台任务每小时清理一次"""
+
+    def __init__(self, db_url: str):
+        self.engine = create_async_engine(
+            db_url,
+            echo=False,
+            future=True
+        )
+        self._async_session_factory = async_scoped_session(
+            sessionmaker(
+                self.engine,
+                class_=AsyncSession,
+                expire_on_commit=False
+            ),
+            scopefunc=asyncio.current_task
+        )
+
+    async def initialize(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(DeclarativeBase.metadata.create_all)
+        # 启动后台清理任务
+        asyncio.create_task(self._cleanup_expired(), name="keyval-cleanup")
+
+    async def lookup(self, keys: List[str]) -> Dict[str, Entry]:
+        entries = {}
+        async with self._async_session_factory() as session:
+            # SQLite 单条语句的参数个数有上限，分批查询
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = await session.execute(
+                    select(KeyValue.key, KeyValue.value, KeyValue.expire_time).where(KeyValue.key.in_(chunk)))
+                found = {row.key: (row.value, row.expire_time) for row in rows}
+                for key in chunk:
+                    entries[key] = found.get(key, (None, None))
+        return entries
+
+    async def execute(self, ops: List[tuple]) -> List[Tuple[Any, Optional[Entry]]]:
+        """每个操作是一条 UPSERT/UPDATE/DELETE 语句，全部成功才提交"""
+        results = []
+        async with self._async_session_factory() as session:
+            try:
+                now = datetime.now()
+                for op, key, *args in ops:
+                    results.append(await self._apply(session, now, op, key, *args))
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        return results
+
+    @staticmethod
+    async def _apply(session: AsyncSession, now: datetime, op: str, key: str, *args) -> Tuple[Any, Optional[Entry]]:
+        expired = and_(KeyValue.expire_time.is_not(None), KeyValue.expire_time < now)
+
+        if op == "set":
+            value, expire_time = args
+            stmt = sqlite_insert(KeyValue).values(key=key, value=value, expire_time=expire_time)
+            stmt = stmt.on_conflict_do_update(index_elements=[KeyValue.key],
+                                              set_={"value": value, "expire_time": expire_time})
+            await session.execute(stmt)
+            return True, (value, expire_time)
+
+        if op == "delete":
+            result = await session.execute(delete(KeyValue).where(KeyValue.key == key))
+            return result.rowcount > 0, (None, None)
+
+        if op == "incrby":
+            amount, = args
+            current = case((expired, 0), else_=cast(KeyValue.value, Integer))
+            stmt = sqlite_insert(KeyValue).values(key=key, value=str(amount), expire_time=None)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[KeyValue.key],
+                set_={"value": cast(current + amount, Text),
+                      "expire_time": case((expired, None), else_=KeyValue.expire_time)},
+                # 原来的值不是整数时不更新，和 Redis 一样报错
+                where=or_(expired, cast(cast(KeyValue.value, Integer), Text) == KeyValue.value),
+            ).returning(KeyValue.value, KeyValue.expire_time)
+            row = (await session.execute(stmt)).first()
+            if row is None:
+                raise ValueError(f"键 {key} 的值不是整数")
+            return int(row.value), (str(int(row.value)), row.expire_time)
+
+        if op == "expire":
+            expire_time, = args
+            stmt = (update(KeyValue)
+                    .where(KeyValue.key == key, ~expired)
+                    .values(expire_time=expire_time)
+                    .returning(KeyValue.value))
+            row = (await session.execute(stmt)).first()
+            if row is None:
+                return False, None
+            return True, (row.value, expire_time)
+
+        raise ValueError(f"未知的操作: {op}")
+
+    async def drop_expired(self, key: str):
+        async with self._async_session_factory() as session:
+            await session.execute(delete(KeyValue).where(KeyValue.key == key, KeyValue.expire_time < datetime.now()))
+            await session.commit()
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        async with self._async_session_factory() as session:
+            # 显式指定查询列类型
+            query = select(KeyValue.key).where(KeyValue.key.like(pattern.replace("*", "%")))
+            result = await session.execute(query)
+            return [str(row[0]) for row in result.all()]  # 确保返回字符串类型
+
+    async def _cleanup_expired(self, interval: int = 3600):
+        """后台定时清理过期数据"""
+        while True:
+            async with self._async_session_factory() as session:
+                await session.execute(
+                    delete(KeyValue).where(KeyValue.expire_time < datetime.now())
+                )
+                await session.commit()
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        # 取消清理任务如果正在运行
+        for task in asyncio.all_tasks():
+            if task != asyncio.current_task() and task.get_name() == "keyval-cleanup":
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        # 关闭连接
+        await self.engine.dispose()
+
+
+class RedisKeyvalBackend(KeyvalBackend):
+    """保存在 Redis 里，使用 Redis 自带的过期时间，多个机器人进程可以共用
+
+    键名会加上 prefix，避免和 WechatAPI 服务使用的键冲突。Redis 的事务出错时不会回滚，
+    pipeline 中某个 incr 遇到非整数值时，同一个事务里的其他操作仍然会生效。
+
+    Args:
+        url: Redis 地址，例如 redis://:密码@127.0.0.1:6379/0
+        prefix: 键名前缀
+    """
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "xybot:keyval:"):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("使用 Redis 作为键值数据库需要安装 redis: pip install redis") from e
+
+        self._aioredis = aioredis
+        self.url = url
+        self.prefix = prefix
+        # 机器人和 WebUI 在不同线程的事件循环里使用数据库，连接不能跨事件循环，每个事件循环一个客户端
+        self._clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            client = self._aioredis.from_url(self.url, decode_responses=True)
+            self._clients[loop] = client
+        return client
+
+    async def initialize(self):
+        await self.client.ping()
+
+    async def lookup(self, keys: List[str]) -> Dict[str, Entry]:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(self.prefix + key)
+            pipe.pttl(self.prefix + key)
+        replies = await pipe.execute()
+
+        now = datetime.now()
+        entries = {}
+        for i, key in enumerate(keys):
+            value, pttl = replies[2 * i], replies[2 * i + 1]
+            expire_time = now + timedelta(milliseconds=pttl) if value is not None and pttl > 0 else None
+            entries[key] = (value, expire_time)
+        return entries
+
+    async def execute(self, ops: List[tuple]) -> List[Tuple[Any, Optional[Entry]]]:
+        now = datetime.now()
+        pipe = self.client.pipeline(transaction=True)
+        for op, key, *args in ops:
+            key = self.prefix + key
+            if op == "set":
+                value, expire_time = args
+                if expire_time is None:
+                    pipe.set(key, value)
+                else:
+                    pipe.set(key, value, px=self._milliseconds(expire_time, now))
+            elif op == "delete":
+                pipe.delete(key)
+            elif op == "incrby":
+                pipe.incrby(key, args[0])
+            elif op == "expire":
+                pipe.pexpire(key, self._milliseconds(args[0], now))
+            else:
+                raise ValueError(f"未知的操作: {op}")
+
+        replies = await pipe.execute(raise_on_error=False)
+        results = []
+        for (op, key, *_), reply in zip(ops, replies):
+            if isinstance(reply, Exception):
+                if op == "incrby":
+                    raise ValueError(f"键 {key} 的值不是整数") from reply
+                raise reply
+            if op == "delete":
+                reply = reply > 0
+            elif op in ("set", "expire"):
+                reply = bool(reply)
+            results.append((reply, None))
+        return results
+
+    @staticmethod
+    def _milliseconds(expire_time: datetime, now: datetime) -> int:
+        return max(int((expire_time - now).total_seconds() * 1000), 1)
+
+    async def keys(self, pattern: str = "*") -> List[str]:
+        return [key[len(self.prefix):] async for key in self.client.scan_iter(match=self.prefix + pattern)]
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.aclose()
@@ -1,12 +1,14 @@
 import asyncio
 import logging
+import time
 import tomllib
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 
 from pydantic import validate_arguments
-from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, delete
-from sqlalchemy import select
+from sqlalchemy import Column, String, Integer, DateTime, Text, Boolean, Index, and_, delete, insert, literal_column, or_
+from sqlalchemy import inspect, select, text, tuple_
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scoped_session
 from sqlalchemy.orm import declarative_base, sessionmaker
 
@@ -18,17 +20,50 @@ DeclarativeBase = declarative_base()
 
 class Message(DeclarativeBase):
     __tablename__ = 'messages'
+    # 查询都是按某个条件过滤再按时间倒序取一页，复合索引可以直接按顺序读出，不需要排序
+    __table_args__ = (
+        Index('ix_messages_from_wxid_timestamp', 'from_wxid', 'timestamp'),
+        Index('ix_messages_sender_wxid_timestamp', 'sender_wxid', 'timestamp'),
+        Index('ix_messages_msg_type_timestamp', 'msg_type', 'timestamp'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     msg_id = Column(Integer, index=True, comment='消息唯一ID（整型）')
-    sender_wxid = Column(String(40), index=True, comment='消息发送人wxid')
-    from_wxid = Column(String(40), index=True, comment='消息来源wxid')
+    sender_wxid = Column(String(40), comment='消息发送人wxid')
+    from_wxid = Column(String(40), comment='消息来源wxid')
     msg_type = Column(Integer, comment='消息类型（整型编码）')
     content = Column(Text, comment='消息内容')
     timestamp = Column(DateTime, default=datetime.now, index=True, comment='消息时间戳')
     is_group = Column(Boolean, default=False, comment='是否群消息')
 
 
+# 消息内容的全文索引：FTS5 外部内容表，只保存索引不重复保存内容，由触发器在插入、删除、修改时增量维护。
+# 中文没有空格分词，使用 trigram 分词器（SQLite 3.34+），任意3个字及以上的片段都能匹配
+_FTS_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "content, content='messages', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS messages_fts_ai",
+    "DROP TRIGGER IF EXISTS messages_fts_ad",
+    "DROP TRIGGER IF EXISTS messages_fts_au",
+    "DROP TABLE IF EXISTS messages_fts",
+]
+# trigram 分词最短能匹配的长度
+_FTS_MIN_TERM = 3
+# 数据库暂时不可用时，写缓冲最多保留的消息数，超过时丢弃最旧的
+_MAX_PENDING = 10000
+# 被复合索引代替的旧单列索引
+_OBSOLETE_INDEXES = ["ix_messages_from_wxid", "ix_messages_sender_wxid"]
+
+
 class MessageDB(metaclass=Singleton):
     _instance = None
 
@@ -36,6 +71,9 @@ class MessageDB(metaclass=Singleton):
         with open("main_config.toml", "rb") as f:
             main_config = tomllib.load(f)
         db_url = main_config["XYBot"]["msgDB-url"]
+        batch_size = main_config["XYBot"].get("msgDB-batch-size", 100)
+        flush_interval = main_config["XYBot"].get("msgDB-flush-interval", 500)
+        fts = main_config["XYBot"].get("msgDB-fts", True)
 
         if cls._instance is None:
             cls._instance = super().__new__(cls)
@@ -52,12 +90,71 @@ class MessageDB(metaclass=Singleton):
                 ),
                 scopefunc=asyncio.current_task
             )
+
+            # 写缓冲：攒够 batch_size 条或者过了 flush_interval 毫秒，一次事务写入
+            cls._instance._batch_size = max(batch_size, 1)
+            cls._instance._flush_interval = max(flush_interval, 0) / 1000
+            cls._instance._buffer = []
+            cls._instance._flush_lock = asyncio.Lock()
+            cls._instance._flush_timer = None
+            cls._instance._stats = {
+                "batches": 0,
+                "rows": 0,
+                "failed_rows": 0,
+                "requeued_rows": 0,
+                "last_batch_size": 0,
+                "max_batch_size": 0,
+                "last_flush_ms": 0.0,
+                "max_flush_ms": 0.0,
+                "total_flush_ms": 0.0,
+            }
+            # 是否使用全文索引，initialize 时确认数据库支持后才会生效
+            cls._instance._fts_wanted = fts
+            cls._instance._fts = False
         return cls._instance
 
     async def initialize(self):
         """异步初始化数据库"""
         async with self.engine.begin() as conn:
             await conn.run_sync(DeclarativeBase.metadata.create_all)
+            # create_all 不会给已经存在的表加索引，旧数据库在这里补上
+            await conn.run_sync(self._upgrade_indexes)
+        await self._setup_fts()
+
+    @staticmethod
+    def _upgrade_indexes(conn):
+        for index in Message.__table__.indexes:
+            index.create(conn, checkfirst=True)
+        existing = {index["name"] for index in inspect(conn).get_indexes(Message.__tablename__)}
+        for name in _OBSOLETE_INDEXES:
+            if name in existing:
+                conn.execute(text(f"DROP INDEX {name}"))
+                logging.info(f"已删除消息数据库中多余的索引 {name}")
+
+    async def _setup_fts(self):
+        """创建或删除全文索引；第一次创建时为已有的消息建立索引"""
+        if self.engine.dialect.name != "sqlite":
+            if self._fts_wanted:
+                logging.info("消息数据库不是 SQLite，消息搜索使用 LIKE 查询")
+            return
+
+        try:
+            async with self.engine.begin() as conn:
+                if not self._fts_wanted:
+                    for statement in _FTS_DROP:
+                        await conn.execute(text(statement))
+                    return
+
+                exists = (await conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"))).first()
+                for statement in _FTS_CREATE:
+                    await conn.execute(text(statement))
+                if not exists:
+                    await conn.execute(text("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')"))
+                    logging.info("已为现有消息建立全文索引")
+            self._fts = self._fts_wanted
+        except Exception as e:
+            logging.warning(f"创建消息全文索引失败，消息搜索使用 LIKE 查询: {str(e)}")
 
     @validate_arguments(config=dict(arbitrary_types_allowed=True))
     async def save_message(self,
@@ -66,26 +163,122 @@ class MessageDB(metaclass=Singleton):
                            from_wxid: str,
                            msg_type: int,
                            content: str,
-                           is_group: bool = False) -> bool:
-        """异步保存消息到数据库"""
-        async with self._async_session_factory() as session:
-            try:
-                message = Message(
-                    msg_id=msg_id,
-                    sender_wxid=sender_wxid,
-                    from_wxid=from_wxid,
-                    msg_type=msg_type,
-                    content=content,
-                    is_group=is_group,
-                    timestamp=datetime.now()
-                )
-                session.add(message)
-                await session.commit()
-                return True
-            except Exception as e:
-                logging.error(f"保存消息失败: {str(e)}")
-                await session.rollback()
-                return False
+                           is_group: bool = False,
+                           flush: bool = False) -> bool:
+        """异步保存消息到数据库
+
+        消息先放进写缓冲，攒够一批或者到时间后统一写入。需要马上能查到这条消息时，设置 flush=True。
+        """
+        self._buffer.append({
+            "msg_id": msg_id,
+            "sender_wxid": sender_wxid,
+            "from_wxid": from_wxid,
+            "msg_type": msg_type,
+            "content": content,
+            "is_group": is_group,
+            "timestamp": datetime.now()
+        })
+
+        if flush or len(self._buffer) >= self._batch_size:
+            return await self.flush() >= 0
+        self._schedule_flush()
+        return True
+
+    def _schedule_flush(self):
+        """flush_interval 后写入，已经安排过时不重复安排"""
+        if self._flush_timer is None:
+            self._flush_timer = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        try:
+            await asyncio.sleep(self._flush_interval)
+        finally:
+            self._flush_timer = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """把写缓冲中的消息写入数据库，返回写入条数，有消息没写入时返回-1
+
+        整批写入失败时改为逐条写入，只丢弃有问题的那条消息；数据库暂时不可用（例如被锁）或者写入时被取消，
+        没写入的消息放回写缓冲，flush_interval 后重试。
+        """
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            rows, self._buffer = self._buffer, []
+
+            start = time.perf_counter()
+            async with self._async_session_factory() as session:
+                try:
+                    await session.execute(insert(Message), rows)
+                    await session.commit()
+                    failed = False
+                except asyncio.CancelledError:
+                    # 关闭时被取消，这批消息放回写缓冲，不能丢
+                    self._requeue(rows)
+                    raise
+                except Exception as e:
+                    logging.warning(f"批量保存消息失败，改为逐条保存: {str(e)}")
+                    await session.rollback()
+                    failed = True
+            if failed:
+                written = await self._insert_each(rows)
+                return written if written == len(rows) else -1
+
+            elapsed = (time.perf_counter() - start) * 1000
+            stats = self._stats
+            stats["batches"] += 1
+            stats["rows"] += len(rows)
+            stats["last_batch_size"] = len(rows)
+            stats["max_batch_size"] = max(stats["max_batch_size"], len(rows))
+            stats["last_flush_ms"] = elapsed
+            stats["max_flush_ms"] = max(stats["max_flush_ms"], elapsed)
+            stats["total_flush_ms"] += elapsed
+            return len(rows)
+
+    async def _insert_each(self, rows: List[Dict[str, Any]]) -> int:
+        """逐条写入，返回写入条数"""
+        written = 0
+        for i, row in enumerate(rows):
+            async with self._async_session_factory() as session:
+                try:
+                    await session.execute(insert(Message), [row])
+                    await session.commit()
+                    written += 1
+                except asyncio.CancelledError:
+                    self._requeue(rows[i:])
+                    raise
+                except OperationalError as e:
+                    # 数据库暂时不可用，剩下的消息放回写缓冲
+                    await session.rollback()
+                    self._requeue(rows[i:])
+                    logging.error(f"保存消息失败，{len(rows) - i} 条消息稍后重试: {str(e)}")
+                    break
+                except Exception as e:
+                    await session.rollback()
+                    self._stats["failed_rows"] += 1
+                    logging.error(f"保存消息失败，已丢弃: {str(e)} 消息ID: {row.get('msg_id')}")
+        self._stats["rows"] += written
+        return written
+
+    def _requeue(self, rows: List[Dict[str, Any]]):
+        self._buffer[:0] = rows
+        self._stats["requeued_rows"] += len(rows)
+        overflow = len(self._buffer) - _MAX_PENDING
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self._stats["failed_rows"] += overflow
+            logging.error(f"写缓冲已满，丢弃了最早的 {overflow} 条消息")
+        self._schedule_flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取写缓冲的统计数据：批次大小、写入耗时等"""
+        stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["pending"] = len(self._buffer)
+        stats["avg_batch_size"] = stats["rows"] / batches if batches else 0
+        stats["avg_flush_ms"] = stats.pop("total_flush_ms") / batches if batches else 0.0
+        return stats
 
     async def get_messages(self,
                            start_time: Optional[datetime] = None,
@@ -98,20 +291,8 @@ class MessageDB(metaclass=Singleton):
         """异步查询消息记录"""
         async with self._async_session_factory() as session:
             try:
-                query = select(Message).order_by(Message.timestamp.desc()).limit(limit)
-
-                if start_time:
-                    query = query.where(Message.timestamp >= start_time)
-                if end_time:
-                    query = query.where(Message.timestamp <= end_time)
-                if sender_wxid:
-                    query = query.where(Message.sender_wxid == sender_wxid)
-                if from_wxid:
-                    query = query.where(Message.from_wxid == from_wxid)
-                if msg_type is not None:
-                    query = query.where(Message.msg_type == msg_type)
-                if is_group is not None:
-                    query = query.where(Message.is_group == is_group)
+                query = select(Message).order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit)
+                query = self._filter(query, start_time, end_time, sender_wxid, from_wxid, msg_type, is_group)
 
                 result = await session.execute(query)
                 return result.scalars().all()
@@ -119,9 +300,172 @@ class MessageDB(metaclass=Singleton):
                 logging.error(f"查询消息失败: {str(e)}")
                 return []
 
+    async def iter_messages(self,
+                            start_time: Optional[datetime] = None,
+                            end_time: Optional[datetime] = None,
+                            sender_wxid: Optional[str] = None,
+                            from_wxid: Optional[str] = None,
+                            msg_type: Optional[int] = None,
+                            is_group: Optional[bool] = None,
+                            page_size: int = 500,
+                            oldest_first: bool = False) -> AsyncIterator[Message]:
+        """逐条遍历符合条件的消息，默认从新到旧
+
+        每次从数据库读取 page_size 条，下一页从上一页最后一条的 (时间, id) 之后继续读，
+        不使用 OFFSET，翻到多深都只读需要的行；内存中最多只有一页消息。
+        读取每页时才打开会话，遍历期间不会一直占用数据库连接；遍历中新写入的消息可能读到也可能读不到。
+
+        用法::
+
+            async for message in MessageDB().iter_messages(from_wxid=chatroom):
+                ...
+        """
+        page_size = max(page_size, 1)
+        order = (Message.timestamp.asc(), Message.id.asc()) if oldest_first else \
+            (Message.timestamp.desc(), Message.id.desc())
+        query = select(Message).order_by(*order).limit(page_size)
+        query = self._filter(query, start_time, end_time, sender_wxid, from_wxid, msg_type, is_group)
+
+        last = None
+        while True:
+            page_query = query
+            if last is not None:
+                position = tuple_(Message.timestamp, Message.id)
+                page_query = query.where(position > last if oldest_first else position < last)
+
+            async with self._async_session_factory() as session:
+                page = (await session.execute(page_query)).scalars().all()
+
+            for message in page:
+                yield message
+            if len(page) < page_size:
+                return
+            last = (page[-1].timestamp, page[-1].id)
+
+    @staticmethod
+    def _filter(query, start_time: Optional[datetime], end_time: Optional[datetime], sender_wxid: Optional[str],
+                from_wxid: Optional[str], msg_type: Optional[int], is_group: Optional[bool]):
+        if start_time:
+            query = query.where(Message.timestamp >= start_time)
+        if end_time:
+            query = query.where(Message.timestamp <= end_time)
+        if sender_wxid:
+            query = query.where(Message.sender_wxid == sender_wxid)
+        if from_wxid:
+            query = query.where(Message.from_wxid == from_wxid)
+        if msg_type is not None:
+            query = query.where(Message.msg_type == msg_type)
+        if is_group is not None:
+            query = query.where(Message.is_group == is_group)
+        return query
+
+    async def search_messages(self,
+                              query: str,
+                              from_wxid: Optional[str] = None,
+                              sender_wxid: Optional[str] = None,
+                              start_time: Optional[datetime] = None,
+                              end_time: Optional[datetime] = None,
+                              limit: int = 20,
+                              cursor: Optional[str] = None,
+                              order: str = "rank") -> Tuple[List[Message], Optional[str]]:
+        """按内容搜索消息
+
+        query 按空格分成多个词，消息需要包含所有的词（不区分英文大小写）。3个字及以上的词使用全文索引，
+        更短的词在索引匹配到的结果里用 LIKE 过滤；全部是短词或没有全文索引时直接用 LIKE 查询，按时间排序。
+        还在写缓冲里的消息搜不到。
+
+        Args:
+            query: 搜索内容
+            from_wxid: 只搜索这个会话（群或私聊）
+            sender_wxid: 只搜索这个人发的消息
+            start_time: 开始时间
+            end_time: 结束时间
+            limit: 每页条数
+            cursor: 上一页返回的 cursor，为 None 时从第一页开始
+            order: "rank" 按相关度（bm25）排序，"time" 按时间从新到旧排序
+
+        Returns:
+            Tuple[List[Message], Optional[str]]: (消息列表, 下一页的 cursor，没有更多时为 None)
+        """
+        if order not in ("rank", "time"):
+            raise ValueError(f"不支持的排序方式: {order}")
+        after_score, after_id = self._parse_cursor(cursor)
+
+        terms = list(dict.fromkeys(query.split()))
+        if not terms:
+            return [], None
+        fts_terms = [term for term in terms if len(term) >= _FTS_MIN_TERM] if self._fts else []
+        like_terms = [term for term in terms if term not in fts_terms]
+
+        ranked = bool(fts_terms) and order == "rank"
+        if fts_terms:
+            # 每个词加上引号作为短语匹配，避免用户输入被当成 FTS5 的查询语法
+            match = " ".join('"' + term.replace('"', '""') + '"' for term in fts_terms)
+            hits = (select(literal_column("rowid").label("id"), literal_column("bm25(messages_fts)").label("score"))
+                    .select_from(text("messages_fts"))
+                    .where(text("messages_fts MATCH :match").bindparams(match=match))
+                    .subquery())
+            score = hits.c.score
+            statement = select(Message, score).join(hits, Message.id == hits.c.id)
+        else:
+            score = literal_column("0.0")
+            statement = select(Message, score)
+
+        for term in like_terms:
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            statement = statement.where(Message.content.like(f"%{escaped}%", escape="\\"))
+        if from_wxid:
+            statement = statement.where(Message.from_wxid == from_wxid)
+        if sender_wxid:
+            statement = statement.where(Message.sender_wxid == sender_wxid)
+        if start_time:
+            statement = statement.where(Message.timestamp >= start_time)
+        if end_time:
+            statement = statement.where(Message.timestamp <= end_time)
+
+        # 按 (分数, id) 翻页，bm25 越小越相关；id 和时间同序
+        if ranked:
+            if after_id is not None:
+                statement = statement.where(or_(score > after_score, and_(score == after_score, Message.id < after_id)))
+            statement = statement.order_by(score, Message.id.desc())
+        else:
+            if after_id is not None:
+                statement = statement.where(Message.id < after_id)
+            statement = statement.order_by(Message.id.desc())
+
+        async with self._async_session_factory() as session:
+            try:
+                rows = (await session.execute(statement.limit(limit + 1))).all()
+            except Exception as e:
+                logging.error(f"搜索消息失败: {str(e)}")
+                return [], None
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_message, last_score = rows[-1]
+            next_cursor = f"{last_score if ranked else 0}:{last_message.id}"
+        return [message for message, _ in rows], next_cursor
+
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str]) -> Tuple[float, Optional[int]]:
+        if not cursor:
+            return 0.0, None
+        try:
+            score, message_id = cursor.split(":")
+            return float(score), int(message_id)
+        except ValueError:
+            raise ValueError(f"无效的 cursor: {cursor}") from None
+
     async def close(self):
         """关闭数据库连接"""
         try:
+            # 先写入缓冲中的消息
+            if self._flush_timer:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            await self.flush()
+
             # 取消清理任务如果正在运行
             for task in asyncio.all_tasks():
                 if task != asyncio.current_task() and 'cleanup_messages' in str(task):
@@ -98,7 +98,7 @@ class Dify(PluginBase):
             return False
 
         if await self._check_point(bot, message):
-            upload_file_id = await self.upload_file(message["FromWxid"], message["Content"])
+            upload_file_id = await self.upload_file(message["FromWxid"], await message["Content"])
 
             files = [
                 {
@@ -125,7 +125,7 @@ class Dify(PluginBase):
             return False
 
         if await self._check_point(bot, message):
-            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(message["Content"]))
+            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(await message["Content"]))
 
             files = [
                 {
@@ -152,7 +152,7 @@ class Dify(PluginBase):
             return False
 
         if await self._check_point(bot, message):
-            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(message["Video"]))
+            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(await message["Video"]))
 
             files = [
                 {
@@ -206,8 +206,7 @@ class Dify(PluginBase):
 
         if files is None:
             files = []
-        conversation_id = self.db.get_llm_thread_id(message["FromWxid"],
-                                                    namespace="dify")
+        conversation_id = await self.db.async_get_llm_thread_id(message["FromWxid"], namespace="dify")
         headers = {"Authorization": f"Bearer {self.api_key}",
                    "Content-Type": "application/json"}
 
@@ -286,10 +285,10 @@ class Dify(PluginBase):
 
                     new_con_id = resp_json.get("conversation_id", "")
                     if new_con_id and new_con_id != conversation_id:
-                        self.db.save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
+                        await self.db.async_save_llm_thread_id(message["FromWxid"], new_con_id, "dify")
 
                 elif resp.status == 404:
-                    self.db.save_llm_thread_id(message["FromWxid"], "", "dify")
+                    await self.db.async_save_llm_thread_id(message["FromWxid"], "", "dify")
                     return await self.dify(bot, message, query)
 
                 elif resp.status == 400:
@@ -404,15 +403,15 @@ class Dify(PluginBase):
 
         if wxid in self.admins and self.admin_ignore:
             return True
-        elif self.db.get_whitelist(wxid) and self.whitelist_ignore:
+        elif await self.db.async_get_whitelist(wxid) and self.whitelist_ignore:
             return True
         else:
-            if self.db.get_points(wxid) < self.price:
+            if await self.db.async_get_points(wxid) < self.price:
                 await bot.send_at_message(message["FromWxid"],
                                           f"\n-----XYBot-----\n"
                                           f"😭你的积分不够啦！需要 {self.price} 积分",
                                           [wxid])
                 return False
 
-            self.db.add_points(wxid, -self.price)
+            await self.db.async_add_points(wxid, -self.price)
             return True
@@ -33,7 +33,7 @@ class GetContact(PluginBase):
 
         self.admins = main_config["admins"]
 
-    @on_text_message
+    @on_text_message(command=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -68,26 +68,23 @@ class GetContact(PluginBase):
         get_list_time = datetime.now()
         logger.info("获取通讯录信息列表耗时：{}", get_list_time - start_time)
 
-        # 使用协程池处理联系人信息获取
+        # 使用协程池处理联系人信息获取，这里要完整的资料，用 GetContact 而不是联系人缓存的 GetContractDetail
         info_list = []
 
-        async def fetch_contacts(id_chunk):
-            contact_info = await bot.get_contact(id_chunk)
-            return contact_info
-
         chunks = [id_list[i:i + 20] for i in range(0, len(id_list), 20)]
 
         sem = asyncio.Semaphore(20)
 
         async def worker(chunk):
             async with sem:
-                return await fetch_contacts(chunk[:-1])  # 去掉最后一个ID，保持与原代码一致
+                return await bot.get_contact(chunk)
 
-        tasks = [worker(chunk) for chunk in chunks]
-        results = await asyncio.gather(*tasks)
+        results = await asyncio.gather(*[worker(chunk) for chunk in chunks])
 
-        # 合并结果
+        # 合并结果，只查到一个联系人时 get_contact 返回的是 dict
         for result in results:
+            if isinstance(result, dict):
+                result = [result]
             info_list.extend(result)
 
         done_time = datetime.now()
@@ -39,7 +39,8 @@ class Gomoku(PluginBase):
         self.gomoku_games = {}  # 存储所有进行中的游戏
         self.gomoku_players = {}  # 存储玩家与游戏的对应关系
 
-    @on_text_message
+    @on_text_message(command=lambda self: (self.command + self.create_game_commands +
+                                           self.accept_game_commands + self.play_game_commands))
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
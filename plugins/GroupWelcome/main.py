@@ -1,11 +1,11 @@
 import tomllib
-import xml.etree.ElementTree as ET
 from datetime import datetime
 
 from loguru import logger
 
 from WechatAPI import WechatAPIClient
 from utils.decorators import on_system_message
+from utils.message_xml import parse_member_change, parse_xml
 from utils.plugin_base import PluginBase
 
 
@@ -35,83 +35,27 @@ class GroupWelcome(PluginBase):
             return
 
         xml_content = str(message["Content"]).strip().replace("\n", "").replace("\t", "")
-        root = ET.fromstring(xml_content)
+        root = parse_xml(xml_content)
 
-        if root.tag != "sysmsg":
+        # 和机器人更新群成员缓存用的是同一个解析函数
+        action, new_members = parse_member_change(root)
+        if action == "unknown":
+            logger.warning(f"未知的入群方式: {root.findtext('sysmsgtemplate/content_template/template')}")
             return
+        if action != "join" or not new_members:
+            return
+
+        for member in new_members:
+            wxid = member["wxid"]
+            nickname = member["nickname"]
+
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+            profile = await bot.get_contact(wxid)
 
-        # 检查是否是进群消息
-        if root.attrib.get("type") == "sysmsgtemplate":
-            sys_msg_template = root.find("sysmsgtemplate")
-            if sys_msg_template is None:
-                return
-
-            template = sys_msg_template.find("content_template")
-            if template is None:
-                return
-
-            template_type = template.attrib.get("type")
-            if template_type not in ["tmpl_type_profile", "tmpl_type_profilewithrevoke"]:
-                return
-
-            template_text = template.find("template").text
-
-            if '"$names$"加入了群聊' in template_text:  # 直接加入群聊
-                new_members = self._parse_member_info(root, "names")
-            elif '"$username$"邀请"$names$"加入了群聊' in template_text:  # 通过邀请加入群聊
-                new_members = self._parse_member_info(root, "names")
-            elif '你邀请"$names$"加入了群聊' in template_text:  # 自己邀请成员加入群聊
-                new_members = self._parse_member_info(root, "names")
-            elif '"$adder$"通过扫描"$from$"分享的二维码加入群聊' in template_text:  # 通过二维码加入群聊
-                new_members = self._parse_member_info(root, "adder")
-            elif '"$adder$"通过"$from$"的邀请二维码加入群聊' in template_text:
-                new_members = self._parse_member_info(root, "adder")
-            else:
-                logger.warning(f"未知的入群方式: {template_text}")
-                return
-
-            if not new_members:
-                return
-
-            for member in new_members:
-                wxid = member["wxid"]
-                nickname = member["nickname"]
-
-                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                profile = await bot.get_contact(wxid)
-
-                await bot.send_link_message(message["FromWxid"],
-                                            title=f"👏欢迎 {nickname} 加入群聊！🎉",
-                                            description=f"⌚时间：{now}\n{self.welcome_message}",
-                                            url=self.url,
-                                            thumb_url=profile.get("BigHeadImgUrl", "")
-                                            )
-
-    @staticmethod
-    def _parse_member_info(root: ET.Element, link_name: str = "names") -> list[dict]:
-        """解析新成员信息"""
-        new_members = []
-        try:
-            # 查找指定链接中的成员列表
-            names_link = root.find(f".//link[@name='{link_name}']")
-            if names_link is None:
-                return new_members
-
-            memberlist = names_link.find("memberlist")
-
-            if memberlist is None:
-                return new_members
-
-            for member in memberlist.findall("member"):
-                username = member.find("username").text
-                nickname = member.find("nickname").text
-                new_members.append({
-                    "wxid": username,
-                    "nickname": nickname
-                })
-
-        except Exception as e:
-            logger.warning(f"解析新成员信息失败: {e}")
-
-        return new_members
+            await bot.send_link_message(message["FromWxid"],
+                                        title=f"👏欢迎 {nickname} 加入群聊！🎉",
+                                        description=f"⌚时间：{now}\n{self.welcome_message}",
+                                        url=self.url,
+                                        thumb_url=profile.get("BigHeadImgUrl", "")
+                                        )
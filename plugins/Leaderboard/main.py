@@ -1,4 +1,3 @@
-import asyncio
 import tomllib
 from random import choice
 
@@ -27,7 +26,7 @@ class Leaderboard(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(command=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -39,14 +38,14 @@ class Leaderboard(PluginBase):
             return
 
         if "群" in command[0]:
-            chatroom_members = await bot.get_chatroom_member_list(message["FromWxid"])
+            chatroom_members = await bot.chatroom_members.get(message["FromWxid"])
             data = []
             for member in chatroom_members:
                 wxid = member["UserName"]
-                points = self.db.get_points(wxid)
+                points = await self.db.async_get_points(wxid)
                 if points == 0:
                     continue
-                data.append((member["NickName"], points))
+                data.append((member.get("NickName") or wxid, points))
 
             data.sort(key=lambda x: x[1], reverse=True)
             data = data[:self.max_count]
@@ -61,30 +60,11 @@ class Leaderboard(PluginBase):
                 out_message += f"\n{emoji}{'' if emoji else str(rank) + '.'} {nickname}   {points}分  {random_emoji}"
 
         else:
-            data = self.db.get_leaderboard(self.max_count)
+            data = await self.db.async_get_leaderboard(self.max_count)
 
             wxids = [i[0] for i in data]
-            nicknames = []
-
-            async def get_nicknames_chunk(chunk_wxids):
-                return await bot.get_nickname(chunk_wxids)
-
-            # 将wxids分成每组20个
-            chunks = [wxids[i:i + 20] for i in range(0, len(wxids), 20)]
-            # 使用信号量限制并发数为2
-            sem = asyncio.Semaphore(2)
-
-            async def worker(chunk):
-                async with sem:
-                    return await get_nicknames_chunk(chunk)
-
-            # 并发执行所有请求
-            tasks = [worker(chunk) for chunk in chunks]
-            results = await asyncio.gather(*tasks)
-
-            # 将所有结果合并到nicknames列表中
-            for result in results:
-                nicknames.extend(result)
+            # 联系人缓存会自动分批查询
+            nicknames = await bot.get_nickname(wxids)
 
             out_message = "-----XYBot积分排行榜-----"
             rank_emojis = ["👑", "🥈", "🥉"]
@@ -33,7 +33,7 @@ class ManagePlugin(PluginBase):
 
         self.plugin_manager = PluginManager()
 
-    @on_text_message
+    @on_text_message(command=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         content = str(message["Content"]).strip()
         command = content.split(" ")
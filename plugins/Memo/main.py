@@ -150,7 +150,7 @@ class Memo(PluginBase):
             return
         logger.info(f"收到图片消息: {message}")
         message_id = message.get("NewMsgId", "")
-        image_data = message.get("Content", "")
+        image_data = await message["Content"]
 
         file_path = await self.media_manager.save_image(message_id, image_data=image_data)
 
@@ -164,7 +164,7 @@ class Memo(PluginBase):
         if not self.enable:
             return
         message_id = message.get("NewMsgId", "")
-        voice_data = message.get("Content", "")
+        voice_data = await message["Content"]
 
         file_path = await self.media_manager.save_voice(message_id, voice_data=voice_data)
 
@@ -81,7 +81,7 @@ class MemoDB(XYBotDB):
             logger.error(f"添加备忘录失败，message_id: {message_id}, 备份消息失败")
             return False
 
-        return self._execute_in_queue(self._add_memo, message_id, wxid, chatroom_id, quote_user_id, quote_user_name, create_time, tag, quote_msg_type)
+        return await self._run_in_queue(self._add_memo, message_id, wxid, chatroom_id, quote_user_id, quote_user_name, create_time, tag, quote_msg_type)
 
 
     def _add_memo(self, message_id: str, wxid: str, chatroom_id: str, quote_user_id: str, quote_user_name: str, create_time: datetime.datetime, tag: str, quote_msg_type: int) -> bool:
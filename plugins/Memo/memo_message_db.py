@@ -10,6 +10,9 @@ class MemoMessageDB(MessageDB):
 
     async def fetch_messages(self, message_ids: List[int] = None, limit: int = 100) -> List[Message]:
         """异步查询消息记录"""
+        # 刚收到的消息可能还在 MessageDB 的写缓冲里，先写入再查
+        await MessageDB().flush()
+
         async with self._async_session_factory() as session:
             try:
 
@@ -29,7 +29,7 @@ class Menu(PluginBase):
 
         self.version = main_config["version"]
 
-    @on_text_message
+    @on_text_message(command=lambda self: self.command + ["管理员菜单"])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -1,5 +1,5 @@
-import asyncio
 import tomllib
+from datetime import datetime
 from random import choice
 
 import aiohttp
@@ -12,10 +12,11 @@ from utils.plugin_base import PluginBase
 class News(PluginBase):
     description = "新闻插件"
     author = "HenryXiaoYang"
-    version = "1.1.0"
+    version = "1.2.0"
 
     # Change Log
     # 1.1.0 2025/2/22 默认关闭定时新闻
+    # 1.2.0 定时新闻使用群发接口，图片只编码一次，崩溃后可以续发
 
     def __init__(self):
         super().__init__()
@@ -29,7 +30,7 @@ class News(PluginBase):
         self.enable_schedule_news = config["enable-schedule-news"]
         self.command = config["command"]
 
-    @on_text_message
+    @on_text_message(command=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -72,33 +73,16 @@ class News(PluginBase):
     async def noon_news(self, bot: WechatAPIClient):
         if not self.enable_schedule_news:
             return
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
-
-        async with aiohttp.ClientSession() as session:
-            async with session.get("http://zj.v.api.aa1.cn/api/60s-v2/?cc=XYBot") as resp:
-                iamge_byte = await resp.read()
-
-        for id in chatrooms:
-            await bot.send_image_message(id, iamge_byte)
-            await asyncio.sleep(2)
+        await self.broadcast_news(bot, "http://zj.v.api.aa1.cn/api/60s-v2/?cc=XYBot", "noon")
 
     @schedule('cron', hour=18)
     async def night_news(self, bot: WechatAPIClient):
         if not self.enable_schedule_news:
             return
+        await self.broadcast_news(bot, "http://v.api.aa1.cn/api/60s-v3/?cc=XYBot", "night")
+
+    @staticmethod
+    async def broadcast_news(bot: WechatAPIClient, url: str, name: str):
         id_list = []
         wx_seq, chatroom_seq = 0, 0
         while True:
@@ -115,9 +99,8 @@ class News(PluginBase):
                 chatrooms.append(id)
 
         async with aiohttp.ClientSession() as session:
-            async with session.get("http://v.api.aa1.cn/api/60s-v3/?cc=XYBot") as resp:
-                iamge_byte = await resp.read()
+            async with session.get(url) as resp:
+                image_byte = await resp.read()
 
-        for id in chatrooms:
-            await bot.send_image_message(id, iamge_byte)
-            await asyncio.sleep(2)
+        await bot.broadcast(chatrooms, {"type": "image", "image": image_byte},
+                            job_id=f"news-{name}-{datetime.now().strftime('%Y%m%d')}")
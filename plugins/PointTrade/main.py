@@ -26,7 +26,7 @@ class PointTrade(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(command=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -55,19 +55,19 @@ class PointTrade(PluginBase):
         trader_wxid = message["SenderWxid"]
 
         # check points
-        trader_points = self.db.get_points(trader_wxid)
+        trader_points = await self.db.async_get_points(trader_wxid)
 
         if trader_points < points:
             await bot.send_at_message(message["FromWxid"], "\n-----XYBot-----\n转账失败❌\n积分不足！😭",
                                       [message["SenderWxid"]])
             return
 
-        self.db.safe_trade_points(trader_wxid, target_wxid, points)
+        await self.db.async_safe_trade_points(trader_wxid, target_wxid, points)
 
         trader_nick, target_nick = await bot.get_nickname([trader_wxid, target_wxid])
 
-        trader_points = self.db.get_points(trader_wxid)
-        target_points = self.db.get_points(target_wxid)
+        trader_points = await self.db.async_get_points(trader_wxid)
+        target_points = await self.db.async_get_points(target_wxid)
 
         output = (
             f"\n-----XYBot-----\n"
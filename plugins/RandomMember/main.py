@@ -23,7 +23,7 @@ class RandomMember(PluginBase):
         self.command = config["command"]
         self.count = config["count"]
 
-    @on_text_message
+    @on_text_message(command=lambda self: self.command)
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -38,11 +38,11 @@ class RandomMember(PluginBase):
             await bot.send_text_message(message["FromWxid"], "-----XYBot-----\n😠只能在群里使用！")
             return
 
-        memlist = await bot.get_chatroom_member_list(message["FromWxid"])
-        random_members = random.sample(memlist, self.count)
+        memlist = await bot.chatroom_members.get(message["FromWxid"])
+        random_members = random.sample(memlist, min(self.count, len(memlist)))
 
         output = "\n-----XYBot-----\n👋嘿嘿，我随机选到了这几位："
         for member in random_members:
-            output += f"\n✨{member['NickName']}"
+            output += f"\n✨{member.get('NickName') or member['UserName']}"
 
         await bot.send_at_message(message["FromWxid"], output, [message["SenderWxid"]])
@@ -25,7 +25,7 @@ class Revoke(PluginBase):
         self.admins = config["admins"]
 
     
-    @on_quote_message
+    @on_quote_message(command=lambda self: self.command)
     async def handle_quote(self, bot: WechatAPIClient, message: dict):
         """
         处理引用消息
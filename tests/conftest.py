@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+
+import pytest
+
+# 直接运行 pytest 时也能导入项目里的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.singleton import Singleton  # noqa: E402
+
+
+def _reset_singletons():
+    for cls in list(Singleton._instances):
+        if "_instance" in vars(cls):
+            cls._instance = None
+    Singleton.reset_all()
+
+
+@pytest.fixture
+def main_config(tmp_path, monkeypatch):
+    """在临时目录里写一份 main_config.toml 并切换过去
+
+    数据库类都是单例，创建时读取运行目录下的 main_config.toml，所以前后都重置单例。
+    返回写配置的函数，参数为 [XYBot] 下的配置项，例如 ``main_config({"msgDB-batch-size": 10})``
+    """
+    monkeypatch.chdir(tmp_path)
+    _reset_singletons()
+
+    def write(xybot: dict):
+        lines = ["[XYBot]"] + [f"{key} = {json.dumps(value)}" for key, value in xybot.items()]
+        (tmp_path / "main_config.toml").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    yield write
+    _reset_singletons()
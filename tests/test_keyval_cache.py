@@ -0,0 +1,117 @@
+import asyncio
+import sqlite3
+from datetime import timedelta
+
+import pytest
+
+from database.keyvalDB import KeyvalCache, KeyvalDB
+
+
+@pytest.fixture
+def db_path(main_config, tmp_path):
+    path = tmp_path / "keyval.db"
+    main_config({"keyvalDB-url": f"sqlite+aiosqlite:///{path}", "keyvalDB-cache-size": 3})
+    return path
+
+
+def write_directly(path, key, value):
+    """绕过 KeyvalDB 改数据库，用来判断读到的是缓存还是数据库"""
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE key_value_store SET value = ? WHERE key = ?", (value, key))
+
+
+def test_cache_evicts_least_recently_used():
+    cache = KeyvalCache(max_entries=2)
+    cache.put("a", "1", None)
+    cache.put("b", "2", None)
+    cache.get("a")
+    cache.put("c", "3", None)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ("1", None)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_skips_values_read_before_a_write():
+    cache = KeyvalCache()
+    version = cache.version
+    # 读数据库期间有写入，读到的旧值不能放进缓存
+    cache.write("a", "new", None)
+    cache.put("a", "old", None, version=version)
+    assert cache.get("a") == ("new", None)
+
+    version = cache.version
+    cache.discard("a")
+    cache.put("a", "old", None, version=version)
+    assert cache.get("a") is None
+
+
+def test_reads_are_cached_and_writes_update_the_cache(db_path):
+    async def main():
+        db = KeyvalDB()
+        await db.initialize()
+        assert await db.set("a", "1")
+        assert await db.get("a") == "1"
+
+        write_directly(db_path, "a", "changed")
+        assert await db.get("a") == "1"
+
+        assert await db.set("a", "2")
+        assert await db.get("a") == "2"
+        assert await db.incr("n") == 1
+        assert await db.get("n") == "1"
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_missing_key_is_cached_until_written(db_path):
+    async def main():
+        db = KeyvalDB()
+        await db.initialize()
+        assert await db.get("a") is None
+        misses = db.cache.stats()["misses"]
+        assert await db.get("a") is None
+        assert db.cache.stats()["misses"] == misses
+
+        assert await db.set("a", "1")
+        assert await db.get("a") == "1"
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_delete_and_expiry_invalidate_the_cache(db_path):
+    async def main():
+        db = KeyvalDB()
+        await db.initialize()
+        await db.set("a", "1")
+        await db.get("a")
+        assert await db.delete("a")
+        assert await db.get("a") is None
+
+        await db.set("b", "1", ex=timedelta(milliseconds=100))
+        assert await db.get("b") == "1"
+        await asyncio.sleep(0.15)
+        # 缓存里的值带着过期时间，过期后不会再从缓存返回
+        assert await db.get("b") is None
+        assert await db.mget(["a", "b"]) == [None, None]
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_failed_write_drops_the_cached_value(db_path):
+    async def main():
+        db = KeyvalDB()
+        await db.initialize()
+        await db.set("a", "not a number")
+        assert await db.get("a") == "not a number"
+
+        with pytest.raises(ValueError):
+            await db.incr("a")
+        assert db.cache.get("a") is None
+        assert await db.get("a") == "not a number"
+        await db.close()
+
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.messsagDB import MessageDB
+
+
+@pytest.fixture
+def db_path(main_config, tmp_path):
+    path = tmp_path / "message.db"
+    # 数据库被锁时只等0.2秒，测试不用等默认的5秒
+    main_config({"msgDB-url": f"sqlite+aiosqlite:///{path}?timeout=0.2",
+                 "msgDB-batch-size": 100,
+                 "msgDB-flush-interval": 100})
+    return path
+
+
+def saved_ids(path) -> list:
+    with sqlite3.connect(path) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT msg_id FROM messages"))
+
+
+async def save(db: MessageDB, ids):
+    for i in ids:
+        assert await db.save_message(i, "sender", "group", 1, f"消息{i}", True)
+
+
+def test_messages_are_buffered_until_flush(db_path):
+    async def main():
+        db = MessageDB()
+        await db.initialize()
+        await save(db, range(3))
+        assert saved_ids(db_path) == []
+        assert db.stats()["pending"] == 3
+
+        assert await db.flush() == 3
+        assert saved_ids(db_path) == [0, 1, 2]
+        assert db.stats()["batches"] == 1
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_bad_row_is_dropped_and_the_rest_written(db_path):
+    async def main():
+        db = MessageDB()
+        await db.initialize()
+        await save(db, range(5))
+        db._buffer[2]["content"] = {"不能写入": 1}
+
+        assert await db.flush() == -1
+        assert saved_ids(db_path) == [0, 1, 3, 4]
+        assert db.stats()["failed_rows"] == 1
+        assert db.stats()["pending"] == 0
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_locked_database_requeues_and_retries_on_timer(db_path):
+    async def main():
+        db = MessageDB()
+        await db.initialize()
+        await save(db, range(3))
+
+        lock = sqlite3.connect(db_path)
+        lock.execute("BEGIN EXCLUSIVE")
+        try:
+            assert await db.flush() == -1
+            assert db.stats()["pending"] == 3
+            assert db.stats()["requeued_rows"] == 3
+            assert db._flush_timer is not None
+        finally:
+            lock.rollback()
+            lock.close()
+
+        # 没有新消息也会在 flush_interval 后重试
+        for _ in range(50):
+            if not db.stats()["pending"]:
+                break
+            await asyncio.sleep(0.05)
+        assert saved_ids(db_path) == [0, 1, 2]
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_cancelled_flush_requeues_rows(db_path, monkeypatch):
+    async def main():
+        db = MessageDB()
+        await db.initialize()
+        await save(db, range(3))
+
+        started = asyncio.Event()
+        execute = AsyncSession.execute
+
+        async def hang(self, *args, **kwargs):
+            started.set()
+            await asyncio.sleep(60)
+
+        monkeypatch.setattr(AsyncSession, "execute", hang)
+        task = asyncio.create_task(db.flush())
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert db.stats()["pending"] == 3
+
+        monkeypatch.setattr(AsyncSession, "execute", execute)
+        assert await db.flush() == 3
+        assert saved_ids(db_path) == [0, 1, 2]
+        await db.close()
+
+    asyncio.run(main())
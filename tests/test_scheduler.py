@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from WechatAPI.Client.scheduler import SendPriority, SendScheduler, send_priority
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_same_recipient_sends_in_submit_order():
+    async def main():
+        scheduler = SendScheduler(rate=1000, burst=1000, global_rate=1000, concurrency=5)
+        sent = []
+
+        async def send(wxid, text):
+            await asyncio.sleep(0)
+            sent.append(text)
+            return text
+
+        futures = [scheduler.submit("a", send, str(i)) for i in range(10)]
+        assert await asyncio.gather(*futures) == [str(i) for i in range(10)]
+        assert sent == [str(i) for i in range(10)]
+
+    run(main())
+
+
+def test_high_priority_goes_before_queued_low_priority():
+    async def main():
+        scheduler = SendScheduler(rate=1000, burst=1000, global_rate=1000, concurrency=1)
+        release = asyncio.Event()
+        sent = []
+
+        async def send(wxid, text):
+            if text == "first":
+                await release.wait()
+            sent.append(text)
+
+        first = scheduler.submit("a", send, "first")
+        await asyncio.sleep(0.01)
+        low = scheduler.submit("a", send, "low", priority=SendPriority.LOW)
+        with send_priority(SendPriority.HIGH):
+            high = scheduler.submit("a", send, "high")
+        release.set()
+        await asyncio.gather(first, low, high)
+        assert sent == ["first", "high", "low"]
+
+    run(main())
+
+
+def test_per_recipient_rate_limit():
+    async def main():
+        scheduler = SendScheduler(rate=20, burst=1, global_rate=1000, concurrency=5)
+        loop = asyncio.get_running_loop()
+        times = []
+
+        async def send(wxid):
+            times.append(loop.time())
+
+        await asyncio.gather(*(scheduler.submit("a", send) for _ in range(3)))
+        # 桶里只有1个令牌，之后每条要等 1/20 秒
+        assert times[2] - times[0] >= 0.09
+
+    run(main())
+
+
+def test_send_error_is_raised_to_caller():
+    async def main():
+        scheduler = SendScheduler(rate=1000, burst=1000, global_rate=1000)
+
+        async def send(wxid):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            await scheduler.submit("a", send)
+        # 出错后这个接收人还能继续发送
+        assert await scheduler.submit("a", lambda wxid: asyncio.sleep(0, "ok")) == "ok"
+
+    run(main())
+
+
+def test_close_cancels_queued_and_in_flight_sends():
+    async def main():
+        scheduler = SendScheduler(rate=1000, burst=1000, global_rate=1000, concurrency=1)
+        started = asyncio.Event()
+
+        async def send(wxid):
+            started.set()
+            await asyncio.sleep(60)
+
+        in_flight = scheduler.submit("a", send)
+        queued = scheduler.submit("b", send)
+        await started.wait()
+        await scheduler.close()
+
+        assert in_flight.cancelled()
+        assert queued.cancelled()
+        assert not scheduler._sending
+        assert scheduler.pending() == 0
+
+    run(main())
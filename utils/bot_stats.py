@@ -0,0 +1,145 @@
+import asyncio
+import threading
+from typing import Dict, Optional, Set
+
+from loguru import logger
+
+from database.keyvalDB import KeyvalDB
+from utils.singleton import Singleton
+
+# 统计项名称，存到键值数据库时会加上 KEY_PREFIX
+MESSAGES = "message_count"
+USERS = "user_count"
+KEY_PREFIX = "bot:stats:"
+
+# 旧版本 XYBot.process_message 使用的消息数键名，第一次加载时迁移过来
+_LEGACY_KEYS = {MESSAGES: "messages"}
+
+
+def type_counter(msg_type) -> str:
+    """按消息类型统计的统计项名称"""
+    return f"type:{msg_type}"
+
+
+class BotStats(metaclass=Singleton):
+    """机器人统计计数器
+
+    计数只在内存中累加（加锁，机器人线程和 WebUI 线程可以同时使用），
+    定时以及关闭时写回键值数据库，不再每条消息读写一次数据库。
+
+    每个统计项第一次读取或写回前，会先从数据库加载已保存的值，再加上加载前内存中累加的部分。
+    """
+
+    def __init__(self):
+        self.db = KeyvalDB()
+
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._loaded: Set[str] = set()
+
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        """增加计数，返回内存中的当前值"""
+        with self._lock:
+            value = self._counts.get(name, 0) + amount
+            self._counts[name] = value
+            self._dirty.add(name)
+        return value
+
+    async def get(self, name: str) -> int:
+        """获取计数，包括还没写回数据库的部分"""
+        await self._load(name)
+        with self._lock:
+            return self._counts.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """获取内存中所有计数的副本"""
+        with self._lock:
+            return dict(self._counts)
+
+    async def _load(self, name: str):
+        await self._load_many([name])
+
+    async def _load_many(self, names):
+        """加载还没加载过的统计项，一次查询"""
+        with self._lock:
+            names = [name for name in names if name not in self._loaded]
+        if not names:
+            return
+
+        keys = [KEY_PREFIX + name for name in names]
+        legacy_names = [name for name in names if name in _LEGACY_KEYS]
+        values = await self.db.mget(keys + [_LEGACY_KEYS[name] for name in legacy_names])
+        saved = dict(zip(names, values))
+        legacy = {name: value for name, value in zip(legacy_names, values[len(keys):]) if value is not None}
+
+        with self._lock:
+            for name in names:
+                # 并发加载时只有第一个加载完成的生效
+                if name in self._loaded:
+                    continue
+                self._loaded.add(name)
+                value = saved[name]
+                if value is None and name in legacy:
+                    value = legacy[name]
+                    self._dirty.add(name)
+                if value is not None:
+                    self._counts[name] = self._counts.get(name, 0) + int(value)
+
+    async def flush(self) -> int:
+        """把有变化的计数在一个事务里写回数据库，返回写入的统计项数"""
+        with self._lock:
+            dirty = list(self._dirty)
+            self._dirty.clear()
+        if not dirty:
+            return 0
+
+        try:
+            await self._load_many(dirty)
+            with self._lock:
+                values = {KEY_PREFIX + name: str(self._counts.get(name, 0)) for name in dirty}
+            if not await self.db.mset(values):
+                raise RuntimeError("键值数据库写入失败")
+        except Exception as e:
+            # 写失败的留到下次再写
+            with self._lock:
+                self._dirty.update(dirty)
+            logger.warning("写回统计数据失败: {}", e)
+            return 0
+
+        return len(dirty)
+
+    def start(self, interval: int = 30):
+        """在当前事件循环中启动定时写回"""
+        if self._flush_task and not self._flush_task.done():
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop(max(interval, 1)))
+
+    async def stop(self):
+        """停止定时写回，并写回剩余的计数
+
+        WebUI 关闭时会在另一个线程的事件循环里调用，这时定时任务只能交给它所在的事件循环取消，不能在这里等待。
+        """
+        task, self._flush_task = self._flush_task, None
+        if task is not None:
+            loop = task.get_loop()
+            if loop is asyncio.get_running_loop():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+            elif not loop.is_closed():
+                try:
+                    loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    # 事件循环刚好关闭了
+                    pass
+        await self.flush()
+
+    async def _flush_loop(self, interval: int):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
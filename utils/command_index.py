@@ -0,0 +1,95 @@
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+
+CommandSpec = Union[None, str, Iterable[str], Callable[[object], Union[str, Iterable[str]]]]
+
+# 前缀树中标记“到这里是一个完整前缀”的键
+_END = ""
+
+
+def tokenize(content) -> str:
+    """取出消息的指令部分，和插件里的 str(content).strip().split(" ")[0] 保持一致"""
+    return str(content).strip().split(" ", 1)[0]
+
+
+def resolve_spec(spec: CommandSpec, instance: object) -> List[str]:
+    """把装饰器里写的指令参数转成列表
+
+    参数可以是字符串、字符串列表，也可以是接收插件实例的函数（用于从插件配置读取指令），
+    例如 ``lambda self: self.command``。
+    """
+    if spec is None:
+        return []
+    if callable(spec) and not isinstance(spec, re.Pattern):
+        spec = spec(instance)
+    if spec is None:
+        return []
+    if isinstance(spec, (str, re.Pattern)):
+        return [spec]
+    return list(spec)
+
+
+class CommandIndex:
+    """某一种事件的指令索引
+
+    - command: 消息第一个词完全等于指令
+    - prefix: 消息以前缀开头，使用前缀树匹配
+    - regex: 消息内容能被正则 search 到
+
+    没有声明任何指令的处理函数不在索引里，每条消息都会调用（例如 Dify 这种兜底插件）。
+    """
+
+    def __init__(self):
+        self._commands: Dict[str, Set[Callable]] = {}
+        self._trie: dict = {}
+        self._regexes: List[tuple[re.Pattern, Callable]] = []
+        self.indexed: Set[Callable] = set()
+
+    def __bool__(self):
+        return bool(self.indexed)
+
+    def add(self, handler: Callable, commands: List[str], prefixes: List[str], regexes: List[Union[str, re.Pattern]]):
+        if not (commands or prefixes or regexes):
+            return
+
+        self.indexed.add(handler)
+
+        for command in commands:
+            self._commands.setdefault(command, set()).add(handler)
+
+        for prefix in prefixes:
+            node = self._trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node.setdefault(_END, set()).add(handler)
+
+        for regex in regexes:
+            self._regexes.append((re.compile(regex) if isinstance(regex, str) else regex, handler))
+
+    def match(self, content) -> Set[Callable]:
+        """返回这条消息命中的处理函数"""
+        if content is None:
+            return set()
+
+        text = str(content).strip()
+        matched = set(self._commands.get(tokenize(text), ()))
+
+        node = self._trie
+        if _END in node:
+            matched |= node[_END]
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            if _END in node:
+                matched |= node[_END]
+
+        for pattern, handler in self._regexes:
+            if handler not in matched and pattern.search(text):
+                matched.add(handler)
+
+        return matched
+
+    def should_call(self, handler: Callable, matched: Optional[Set[Callable]]) -> bool:
+        """不在索引里的处理函数总是调用，在索引里的只有命中才调用"""
+        return matched is None or handler not in self.indexed or handler in matched
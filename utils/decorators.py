@@ -57,178 +57,89 @@ def remove_job_safe(scheduler: AsyncIOScheduler, job_id: str):
         pass
 
 
-def on_text_message(priority=50):
-    """文本消息装饰器"""
+def _message_decorator(event_type: str, priority=50, copy_message: bool = False, concurrent: bool = False,
+                       command=None, prefix=None, regex=None):
+    """消息装饰器的公共实现
+
+    Args:
+        event_type: 事件类型
+        priority: 优先级，0-99，越大越先执行。无参数调用时这里是被装饰的函数
+        copy_message: 是否给处理函数一份独立的深拷贝消息。默认处理函数拿到的是共享的写时复制视图
+        concurrent: 是否和同一优先级的其他 concurrent 处理函数并发执行，适合耗时的网络请求、LLM 调用等
+        command: 指令，消息第一个词等于指令时才调用处理函数
+        prefix: 前缀，消息以前缀开头时才调用处理函数
+        regex: 正则，消息内容能匹配时才调用处理函数
+
+    command/prefix/regex 可以是字符串、字符串列表，或者接收插件实例的函数，例如 ``lambda self: self.command``。
+    三者都不设置时，每条消息都会调用处理函数。
+    """
 
     def decorator(func):
-        if callable(priority):  # 无参数调用时
-            f = priority
-            setattr(f, '_event_type', 'text_message')
-            setattr(f, '_priority', 50)
-            return f
-        # 有参数调用时
-        setattr(func, '_event_type', 'text_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
+        setattr(func, '_event_type', event_type)
+        setattr(func, '_priority', min(max(priority, 0), 99) if not callable(priority) else 50)
+        setattr(func, '_copy_message', copy_message)
+        setattr(func, '_concurrent', concurrent)
+        setattr(func, '_command', command)
+        setattr(func, '_prefix', prefix)
+        setattr(func, '_regex', regex)
         return func
 
     return decorator if not callable(priority) else decorator(priority)
 
 
-def on_image_message(priority=50):
-    """图片消息装饰器"""
+def on_text_message(priority=50, copy_message: bool = False, concurrent: bool = False,
+                    command=None, prefix=None, regex=None):
+    """文本消息装饰器"""
+    return _message_decorator('text_message', priority, copy_message, concurrent, command, prefix, regex)
 
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'image_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'image_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
 
-    return decorator if not callable(priority) else decorator(priority)
+def on_image_message(priority=50, copy_message: bool = False, concurrent: bool = False):
+    """图片消息装饰器"""
+    return _message_decorator('image_message', priority, copy_message, concurrent)
 
 
-def on_voice_message(priority=50):
+def on_voice_message(priority=50, copy_message: bool = False, concurrent: bool = False):
     """语音消息装饰器"""
+    return _message_decorator('voice_message', priority, copy_message, concurrent)
 
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'voice_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'voice_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
 
-    return decorator if not callable(priority) else decorator(priority)
-
-
-def on_emoji_message(priority=50):
+def on_emoji_message(priority=50, copy_message: bool = False, concurrent: bool = False):
     """表情消息装饰器"""
-
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'emoji_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'emoji_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _message_decorator('emoji_message', priority, copy_message, concurrent)
 
 
-def on_file_message(priority=50):
+def on_file_message(priority=50, copy_message: bool = False, concurrent: bool = False):
     """文件消息装饰器"""
+    return _message_decorator('file_message', priority, copy_message, concurrent)
 
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'file_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'file_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
 
-    return decorator if not callable(priority) else decorator(priority)
-
-
-def on_quote_message(priority=50):
+def on_quote_message(priority=50, copy_message: bool = False, concurrent: bool = False,
+                    command=None, prefix=None, regex=None):
     """引用消息装饰器"""
-
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'quote_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'quote_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _message_decorator('quote_message', priority, copy_message, concurrent, command, prefix, regex)
 
 
-def on_video_message(priority=50):
+def on_video_message(priority=50, copy_message: bool = False, concurrent: bool = False):
     """视频消息装饰器"""
+    return _message_decorator('video_message', priority, copy_message, concurrent)
 
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'video_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'video_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
 
-    return decorator if not callable(priority) else decorator(priority)
-
-
-def on_pat_message(priority=50):
+def on_pat_message(priority=50, copy_message: bool = False, concurrent: bool = False):
     """拍一拍消息装饰器"""
-
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'pat_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'pat_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _message_decorator('pat_message', priority, copy_message, concurrent)
 
 
-def on_at_message(priority=50):
+def on_at_message(priority=50, copy_message: bool = False, concurrent: bool = False,
+                    command=None, prefix=None, regex=None):
     """被@消息装饰器"""
+    return _message_decorator('at_message', priority, copy_message, concurrent, command, prefix, regex)
 
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'at_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'at_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
 
-    return decorator if not callable(priority) else decorator(priority)
+def on_system_message(priority=50, copy_message: bool = False, concurrent: bool = False):
+    """系统消息装饰器"""
+    return _message_decorator('system_message', priority, copy_message, concurrent)
 
 
-def on_system_message(priority=50):
+def on_other_message(priority=50, copy_message: bool = False, concurrent: bool = False):
     """其他消息装饰器"""
-
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'system_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'other_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
-
-
-def on_other_message(priority=50):
-    """其他消息装饰器"""
-
-    def decorator(func):
-        if callable(priority):
-            f = priority
-            setattr(f, '_event_type', 'other_message')
-            setattr(f, '_priority', 50)
-            return f
-        setattr(func, '_event_type', 'other_message')
-        setattr(func, '_priority', min(max(priority, 0), 99))
-        return func
-
-    return decorator if not callable(priority) else decorator(priority)
+    return _message_decorator('other_message', priority, copy_message, concurrent)
@@ -1,9 +1,24 @@
+import asyncio
 import copy
-from typing import Callable, Dict, List
+import itertools
+from typing import Callable, ContextManager, Dict, List, Optional
+
+from .command_index import CommandIndex, resolve_spec
+from .message_view import MessageView
 
 
 class EventManager:
     _handlers: Dict[str, List[tuple[Callable, object, int]]] = {}
+    # 每种事件的指令索引，绑定/解绑时重建
+    _indexes: Dict[str, CommandIndex] = {}
+    _matchers: Dict[Callable, tuple[list, list, list]] = {}
+    # 处理函数的调用上下文，参数为处理函数是否声明了指令、消息，由 bot.py 设置
+    _call_context: Optional[Callable[[bool, dict], ContextManager]] = None
+
+    @classmethod
+    def set_call_context(cls, factory: Optional[Callable[[bool, dict], ContextManager]]):
+        """设置每次调用处理函数时进入的上下文，例如指令回复的发送优先级"""
+        cls._call_context = factory
 
     @classmethod
     def bind_instance(cls, instance: object):
@@ -13,40 +28,112 @@ class EventManager:
             if hasattr(method, '_event_type'):
                 event_type = getattr(method, '_event_type')
                 priority = getattr(method, '_priority', 50)
-                
+
+                cls._matchers[method] = (resolve_spec(getattr(method, '_command', None), instance),
+                                         resolve_spec(getattr(method, '_prefix', None), instance),
+                                         resolve_spec(getattr(method, '_regex', None), instance))
+
                 if event_type not in cls._handlers:
                     cls._handlers[event_type] = []
                 cls._handlers[event_type].append((method, instance, priority))
                 # 按优先级排序，优先级高的在前
                 cls._handlers[event_type].sort(key=lambda x: x[2], reverse=True)
+                cls._rebuild_index(event_type)
+
+    @classmethod
+    def _rebuild_index(cls, event_type: str):
+        """根据处理函数声明的指令重建索引"""
+        index = CommandIndex()
+        for handler, instance, priority in cls._handlers.get(event_type, []):
+            index.add(handler, *cls._matchers.get(handler, ([], [], [])))
+        cls._indexes[event_type] = index
 
     @classmethod
     async def emit(cls, event_type: str, *args, **kwargs) -> None:
-        """触发事件"""
+        """触发事件
+
+        按优先级从高到低分层执行。同一优先级中声明了 concurrent 的处理函数会并发执行，
+        其他处理函数仍按顺序执行。任意处理函数返回 False 时，更低优先级的处理函数都不再执行。
+        """
         if event_type not in cls._handlers:
             return
 
         api_client, message = args
-        for handler, instance, priority in cls._handlers[event_type]:
-            # 只对 message 进行深拷贝，api_client 保持不变
+        if isinstance(message, MessageView):
+            message = message.to_dict()
+
+        # 每条消息只分词匹配一次，声明了指令但没有命中的处理函数直接跳过
+        index = cls._indexes.get(event_type)
+        matched = index.match(message.get("Content")) if index else None
+
+        handlers = [(handler, priority) for handler, instance, priority in cls._handlers[event_type]
+                    if matched is None or index.should_call(handler, matched)]
+
+        # 处理函数已经按优先级排好序，相同优先级的连续排列
+        for priority, tier in itertools.groupby(handlers, key=lambda x: x[1]):
+            if not await cls._run_tier([handler for handler, _ in tier], api_client, message, kwargs):
+                break
+
+    @classmethod
+    async def _run_tier(cls, tier: List[Callable], api_client, message: dict, kwargs: dict) -> bool:
+        """执行同一优先级的处理函数，返回是否继续执行更低优先级的处理函数"""
+        tasks = [asyncio.ensure_future(cls._call(handler, api_client, message, kwargs))
+                 for handler in tier if getattr(handler, '_concurrent', False)]
+
+        keep_going = True
+        results = []
+        try:
+            for handler in tier:
+                if getattr(handler, '_concurrent', False):
+                    continue
+
+                result = await cls._call(handler, api_client, message, kwargs)
+
+                if isinstance(result, bool):
+                    # True 继续执行 False 停止执行
+                    if not result:
+                        keep_going = False
+                        break
+                else:
+                    continue  # 我也不知道你返回了个啥玩意，反正继续执行就是了
+        finally:
+            if tasks:
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+            if result is False:
+                keep_going = False
+
+        return keep_going
+
+    @classmethod
+    async def _call(cls, handler: Callable, api_client, message: dict, kwargs: dict):
+        # 默认给每个处理函数一个共享消息的写时复制视图，声明了 copy_message 的处理函数拿到深拷贝
+        if getattr(handler, '_copy_message', False):
             handler_args = (api_client, copy.deepcopy(message))
             new_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
+        else:
+            handler_args = (api_client, MessageView(message))
+            new_kwargs = {k: MessageView(v) if isinstance(v, dict) else copy.deepcopy(v)
+                          for k, v in kwargs.items()}
 
-            result = await handler(*handler_args, **new_kwargs)
-
-            if isinstance(result, bool):
-                # True 继续执行 False 停止执行
-                if not result:
-                    break
-            else:
-                continue  # 我也不知道你返回了个啥玩意，反正继续执行就是了
+        if cls._call_context is None:
+            return await handler(*handler_args, **new_kwargs)
+        with cls._call_context(any(cls._matchers.get(handler, ())), message):
+            return await handler(*handler_args, **new_kwargs)
 
     @classmethod
     def unbind_instance(cls, instance: object):
         """解绑实例的所有事件处理函数"""
         for event_type in cls._handlers:
+            for handler, inst, priority in cls._handlers[event_type]:
+                if inst is instance:
+                    cls._matchers.pop(handler, None)
             cls._handlers[event_type] = [
                 (handler, inst, priority)
                 for handler, inst, priority in cls._handlers[event_type]
                 if inst is not instance
             ]
+            cls._rebuild_index(event_type)
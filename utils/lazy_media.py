@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Optional
+
+_UNSET = object()
+
+
+class LazyMedia:
+    """延迟下载的媒体数据
+
+    图片、语音、视频、文件消息不再在触发事件前下载，消息中放的是一个 LazyMedia，
+    处理函数第一次 ``await`` 时才下载（和解码），之后所有处理函数共享同一份结果::
+
+        image_base64 = await message["Content"]
+
+    同时 await 的处理函数会等待同一次下载。下载失败时异常会抛给本次等待的处理函数，
+    下次 await 会重新下载。
+
+    Args:
+        loader: 无参数的协程函数，返回下载好的媒体数据
+        kind: 媒体类型，只用于日志显示
+    """
+
+    __slots__ = ("_loader", "_task", "_result", "kind")
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]], kind: str = "media"):
+        self._loader = loader
+        self._task: Optional[asyncio.Future] = None
+        self._result = _UNSET
+        self.kind = kind
+
+    @classmethod
+    def resolved(cls, value: Any, kind: str = "media") -> "LazyMedia":
+        """已经有数据时直接包装，await 时不再下载"""
+        media = cls(None, kind)
+        media._result = value
+        return media
+
+    @property
+    def loaded(self) -> bool:
+        """是否已经下载完成"""
+        return self._result is not _UNSET
+
+    @property
+    def result(self) -> Any:
+        """下载好的数据，还没下载时为 None"""
+        return None if self._result is _UNSET else self._result
+
+    async def fetch(self) -> Any:
+        """下载并返回媒体数据，已经下载过时直接返回"""
+        if self._result is not _UNSET:
+            return self._result
+
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loader())
+
+        task = self._task
+        try:
+            # shield: 某个处理函数被取消时，不影响其他等待同一次下载的处理函数
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if self._task is task:
+                self._task = None
+            raise
+
+        self._result = result
+        self._task = None
+        return result
+
+    def __await__(self):
+        return self.fetch().__await__()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # 深拷贝消息时也共享同一次下载
+        return self
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "pending"
+        return f"<LazyMedia {self.kind} {state}>"
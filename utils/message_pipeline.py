@@ -0,0 +1,171 @@
+import asyncio
+import traceback
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from loguru import logger
+
+
+class MessagePipeline:
+    """消息处理流水线
+
+    放在 XYBot.process_message 前面的一层，替代每条消息一个 create_task 的做法。
+
+    - 固定数量的 worker 并发处理消息
+    - 同一个会话（FromWxid）的消息进入同一条 FIFO 通道，按顺序处理
+    - 排队消息数达到上限时，submit 会阻塞，从而反压同步消息的循环
+
+    Args:
+        handler: 处理单条消息的协程函数，一般是 XYBot.process_message
+        workers: worker 数量
+        max_size: 排队中（含正在处理）的消息数上限
+        self_wxid: 机器人自己的wxid，用于把自己发到群里的消息归到对应群的通道
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 workers: int = 8, max_size: int = 1000, self_wxid: str = ""):
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.max_size = max(max_size, 1)
+        self.self_wxid = self_wxid
+
+        self._lanes: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # 没有排队（含正在处理）的消息时置位，stop(drain=True) 等待它
+        self._idle: Optional[asyncio.Event] = None
+        self._worker_tasks: list[asyncio.Task] = []
+
+        self._pending = 0
+        self._busy = 0
+        self._throttled = False
+        self.processed = 0
+        self.failed = 0
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._worker_tasks)
+
+    def start(self):
+        """启动worker"""
+        if self.is_running:
+            return
+
+        self._ready = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        for i in range(self.workers):
+            self._worker_tasks.append(asyncio.create_task(self._worker(), name=f"message-pipeline-{i}"))
+
+        logger.info("消息处理流水线已启动: worker数:{} 队列上限:{}", self.workers, self.max_size)
+
+    async def stop(self, drain: bool = True):
+        """停止worker
+
+        Args:
+            drain: 是否先等待已排队的消息处理完
+        """
+        if not self.is_running:
+            return
+
+        if drain:
+            await self._idle.wait()
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks.clear()
+        self._lanes.clear()
+        self._pending = 0
+
+        logger.info("消息处理流水线已停止")
+
+    def lane_key(self, message: Dict[str, Any]) -> str:
+        """计算消息所属的会话通道，与 process_message 中的 FromWxid 预处理保持一致"""
+        from_wxid = message.get("FromWxid") or message.get("FromUserName", {}).get("string", "")
+        to_wxid = message.get("ToWxid", "")
+        if isinstance(to_wxid, dict):
+            to_wxid = to_wxid.get("string", "")
+
+        # 自己发的消息归到对方（群聊或私聊对象）的通道
+        if from_wxid and from_wxid == self.self_wxid and to_wxid:
+            return to_wxid
+        return from_wxid
+
+    async def submit(self, message: Dict[str, Any]):
+        """提交一条消息，队列满时等待"""
+        if not self.is_running:
+            self.start()
+
+        if self._slots.locked() and not self._throttled:
+            # 只在刚满的时候提示一次，避免持续高负载时刷屏
+            self._throttled = True
+            logger.warning("消息处理队列已满({})，暂停接收新消息", self.max_size)
+        await self._slots.acquire()
+        if self._throttled and self._pending < self.max_size // 2:
+            self._throttled = False
+
+        key = self.lane_key(message)
+        self._pending += 1
+        self._idle.clear()
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            # 新通道，交给worker调度
+            self._lanes[key] = deque([message])
+            self._ready.put_nowait(key)
+        else:
+            # 通道已在调度中，排到末尾即可
+            lane.append(message)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            message = lane.popleft()
+
+            self._busy += 1
+            try:
+                await self.handler(message)
+                self.processed += 1
+            except asyncio.CancelledError:
+                # 这个通道不会再被调度，删掉通道，剩下的消息一起丢弃，之后同一会话的消息会新建通道
+                del self._lanes[key]
+                self._release(len(lane))
+                raise
+            except Exception:
+                self.failed += 1
+                logger.error("处理消息时发生错误: {}", traceback.format_exc())
+            finally:
+                self._busy -= 1
+                self._release(1)
+                self._ready.task_done()
+
+            if lane:
+                # 同一通道还有消息，重新排队，让其他通道也有机会被处理
+                self._ready.put_nowait(key)
+            else:
+                del self._lanes[key]
+
+    def _release(self, count: int):
+        """count 条消息处理完或被丢弃"""
+        for _ in range(count):
+            self._slots.release()
+        self._pending -= count
+        if not self._pending:
+            self._idle.set()
+
+    def stats(self) -> Dict[str, int]:
+        """获取流水线状态，用于调整worker数和队列上限"""
+        return {
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "max_size": self.max_size,
+            "queue_depth": self._pending,
+            "lanes": len(self._lanes),
+            "ready_lanes": self._ready.qsize() if self._ready else 0,
+            "max_lane_depth": max((len(lane) for lane in self._lanes.values()), default=0),
+            "processed": self.processed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,74 @@
+import copy
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator
+
+
+class MessageView(MutableMapping):
+    """消息的写时复制视图
+
+    EventManager.emit 不再给每个处理函数深拷贝一份消息，而是给每个处理函数一个视图，
+    所有视图共享同一个消息字典：
+
+    - 只读访问直接读共享字典，不产生复制
+    - 第一次写入（赋值、删除、pop、update 等）时才浅拷贝一份，之后只改自己的那份
+    - 嵌套的 dict/list/set（例如 Ats、Quote）在第一次取出时复制一份，避免改到共享数据
+
+    需要完整独立副本的插件可以调用 to_dict()，或者在装饰器上设置 copy_message=True。
+    """
+
+    __slots__ = ("_data", "_owned", "_detached")
+
+    def __init__(self, data: Dict[str, Any]):
+        self._data = data
+        self._owned = False
+        self._detached = set()
+
+    def _own(self):
+        if not self._owned:
+            self._data = dict(self._data)
+            self._owned = True
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if key not in self._detached and isinstance(value, (dict, list, set)):
+            # 可变的嵌套对象，取出来之前先复制一份
+            self._own()
+            value = copy.deepcopy(value)
+            self._data[key] = value
+            self._detached.add(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._own()
+        self._data[key] = value
+        self._detached.add(key)
+
+    def __delitem__(self, key):
+        self._own()
+        del self._data[key]
+        self._detached.discard(key)
+
+    def __iter__(self) -> Iterator:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __repr__(self) -> str:
+        return repr(self._data)
+
+    def copy(self) -> "MessageView":
+        """返回一个新的视图，嵌套对象仍然在取出时才复制"""
+        return MessageView(dict(self._data))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """返回一份完整的深拷贝"""
+        return copy.deepcopy(self._data)
+
+    @property
+    def is_copied(self) -> bool:
+        """是否已经因为写入复制过"""
+        return self._owned
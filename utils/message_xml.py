@@ -0,0 +1,217 @@
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 一个字段的声明: (路径, 类型, 默认值)
+# 路径相对于根节点，用 / 分隔子节点，用 @ 取属性，例如 "appmsg/title"、"img@aeskey"、"@type"
+FieldSpec = Tuple[str, Callable[[str], Any], Any]
+
+_TARGETS = "@"  # 前缀树中存放字段的键，tag 不会是这个值
+_MISSING = object()
+
+
+@lru_cache(maxsize=256)
+def parse_xml(content: str) -> ET.Element:
+    """解析XML，同一段内容只解析一次
+
+    process_xml_message 和 process_quote_message / process_file_message、
+    process_system_message 和 process_pat_message 会拿到同一段内容，直接复用解析结果。
+    返回的节点是共享的，不要修改。
+    """
+    return ET.fromstring(content)
+
+
+class XmlFields:
+    """声明式的XML字段提取
+
+    用一个字段表（可以嵌套，嵌套的字典会输出为嵌套的字典）描述要取的字段，
+    提取时只遍历一次字段表涉及到的节点，取代一连串 find() 和 isinstance 判断::
+
+        FILE_FIELDS = XmlFields({
+            "Filename": ("appmsg/title", str, ""),
+            "AttachId": ("appmsg/appattach/attachid", str, ""),
+        })
+        fields = FILE_FIELDS.extract(parse_xml(message["Content"]))
+
+    节点不存在、没有文本或者类型转换失败时，使用默认值。同名节点只取第一个，和 find() 一致。
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        # 路径前缀树: {子节点tag: 子树}，叶子上挂着要输出的字段
+        self._tree: Dict[str, Any] = {}
+        self._fields: List[Tuple[Tuple[str, ...], Callable, Any]] = []
+        self._compile(spec, ())
+
+    def _compile(self, spec: Dict[str, Any], prefix: Tuple[str, ...]):
+        for key, value in spec.items():
+            out = prefix + (key,)
+            if isinstance(value, dict):
+                self._compile(value, out)
+                continue
+
+            path, convert, default = value
+            self._fields.append((out, convert, default))
+            index = len(self._fields) - 1
+
+            node_path, _, attr = path.partition("@")
+            node = self._tree
+            for tag in filter(None, node_path.split("/")):
+                node = node.setdefault(tag, {})
+            node.setdefault(_TARGETS, []).append((attr or None, index))
+
+    def extract(self, root: Optional[ET.Element]) -> Dict[str, Any]:
+        """从节点中取出所有字段"""
+        values: List[Any] = [_MISSING] * len(self._fields)
+        if root is not None:
+            self._walk(root, self._tree, values)
+
+        result: Dict[str, Any] = {}
+        for (out, convert, default), raw in zip(self._fields, values):
+            value = default
+            if raw is not _MISSING and raw is not None:
+                try:
+                    value = convert(raw)
+                except (TypeError, ValueError):
+                    value = default
+
+            target = result
+            for key in out[:-1]:
+                target = target.setdefault(key, {})
+            target[out[-1]] = value
+        return result
+
+    def _walk(self, element: ET.Element, node: Dict[str, Any], values: List[Any]):
+        for attr, index in node.get(_TARGETS, ()):
+            values[index] = element.get(attr) if attr else element.text
+
+        seen = set()
+        for child in element:
+            tag = child.tag
+            if tag in seen or tag not in node:
+                continue
+            seen.add(tag)
+            self._walk(child, node[tag], values)
+
+
+def _int(text: str) -> int:
+    return int(text.strip())
+
+
+def _str(text: str) -> str:
+    return text
+
+
+# 各类消息用到的字段表
+XML_TYPE_FIELDS = XmlFields({
+    "type": ("appmsg/type", _int, None),
+})
+
+ATUSERLIST_FIELDS = XmlFields({
+    "Ats": ("atuserlist", _str, ""),
+})
+
+IMAGE_FIELDS = XmlFields({
+    "aeskey": ("img@aeskey", _str, None),
+    "cdnmidimgurl": ("img@cdnmidimgurl", _str, None),
+})
+
+VOICE_FIELDS = XmlFields({
+    "voiceurl": ("voicemsg@voiceurl", _str, None),
+    "length": ("voicemsg@length", _int, None),
+})
+
+FILE_FIELDS = XmlFields({
+    "Filename": ("appmsg/title", _str, None),
+    "AttachId": ("appmsg/appattach/attachid", _str, None),
+    "FileExtend": ("appmsg/appattach/fileext", _str, None),
+})
+
+PAT_FIELDS = XmlFields({
+    "Patter": ("pat/fromusername", _str, None),
+    "Patted": ("pat/pattedusername", _str, None),
+    "PatSuffix": ("pat/patsuffix", _str, None),
+})
+
+# 引用消息本身
+QUOTE_FIELDS = XmlFields({
+    "Content": ("appmsg/title", _str, None),
+    "Quote": {
+        "MsgType": ("appmsg/refermsg/type", _int, None),
+        "NewMsgId": ("appmsg/refermsg/svrid", _str, None),
+        "ToWxid": ("appmsg/refermsg/fromusr", _str, None),
+        "FromWxid": ("appmsg/refermsg/chatusr", _str, None),
+        "Nickname": ("appmsg/refermsg/displayname", _str, None),
+        "MsgSource": ("appmsg/refermsg/msgsource", _str, None),
+        "Content": ("appmsg/refermsg/content", _str, None),
+        "Createtime": ("appmsg/refermsg/createtime", _str, None),
+    },
+})
+
+# 被引用的是xml消息（MsgType 49）时，被引用消息里的字段
+QUOTED_APPMSG_FIELDS = XmlFields({
+    "Content": ("appmsg/title", _str, ""),
+    "destination": ("appmsg/des", _str, ""),
+    "action": ("appmsg/action", _str, ""),
+    "XmlType": ("appmsg/type", _int, 0),
+    "showtype": ("appmsg/showtype", _int, 0),
+    "soundtype": ("appmsg/soundtype", _int, 0),
+    "url": ("appmsg/url", _str, ""),
+    "lowurl": ("appmsg/lowurl", _str, ""),
+    "dataurl": ("appmsg/dataurl", _str, ""),
+    "lowdataurl": ("appmsg/lowdataurl", _str, ""),
+    "songlyric": ("appmsg/songlyric", _str, ""),
+    "appattach": {
+        "totallen": ("appmsg/appattach/totallen", _int, 0),
+        "attachid": ("appmsg/appattach/attachid", _str, ""),
+        "emoticonmd5": ("appmsg/appattach/emoticonmd5", _str, ""),
+        "fileext": ("appmsg/appattach/fileext", _str, ""),
+        "cdnthumbaeskey": ("appmsg/appattach/cdnthumbaeskey", _str, ""),
+        "aeskey": ("appmsg/appattach/aeskey", _str, ""),
+    },
+    "extinfo": ("appmsg/extinfo", _str, ""),
+    "sourceusername": ("appmsg/sourceusername", _str, ""),
+    "sourcedisplayname": ("appmsg/sourcedisplayname", _str, ""),
+    "thumburl": ("appmsg/thumburl", _str, ""),
+    "md5": ("appmsg/md5", _str, ""),
+    "statextstr": ("appmsg/statextstr", _str, ""),
+    "directshare": ("appmsg/directshare", _int, 0),
+})
+
+
+# 群成员变动的系统消息模板: 模板中的关键文字 -> (变动类型, 成员列表所在的link)
+MEMBER_CHANGE_TEMPLATES = [
+    ('"$names$"加入了群聊', "join", "names"),  # 直接加入、被邀请加入、自己邀请
+    ('"$adder$"通过扫描"$from$"分享的二维码加入群聊', "join", "adder"),
+    ('"$adder$"通过"$from$"的邀请二维码加入群聊', "join", "adder"),
+    ('"$kickoutname$"移出了群聊', "kick", "kickoutname"),
+]
+
+
+def parse_member_change(root: ET.Element) -> Tuple[str, List[Dict[str, str]]]:
+    """解析群成员变动的系统消息(sysmsgtemplate)
+
+    Returns:
+        (变动类型, 成员列表): 变动类型为 "join" 或 "kick"，成员为 {"wxid": ..., "nickname": ...}；
+        是成员变动模板但不认识模板内容时返回 ("unknown", [])，不是群成员变动消息时返回 ("", [])
+    """
+    if root.tag != "sysmsg" or root.attrib.get("type") != "sysmsgtemplate":
+        return "", []
+
+    template = root.find("sysmsgtemplate/content_template")
+    if template is None or template.attrib.get("type") not in ("tmpl_type_profile", "tmpl_type_profilewithrevoke"):
+        return "", []
+
+    text = template.findtext("template") or ""
+    for keyword, action, link_name in MEMBER_CHANGE_TEMPLATES:
+        if keyword in text:
+            break
+    else:
+        return "unknown", []
+
+    members = []
+    for member in root.findall(f".//link[@name='{link_name}']/memberlist/member"):
+        wxid = (member.findtext("username") or "").strip()
+        if wxid:
+            members.append({"wxid": wxid, "nickname": (member.findtext("nickname") or "").strip()})
+    return action, members
@@ -0,0 +1,127 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from loguru import logger
+
+
+class SyncRecorder:
+    """把 sync_message 同步到的原始数据追加保存到文件，用于离线回放
+
+    XYBot.process_message 会原地修改消息，所以要在处理之前记录：设置 ``bot.sync_recorder`` 后，
+    WechatAPIClient.sync_message 每次拿到数据都会调用 :meth:`record`，数据在这时就序列化好，之后的修改不影响记录。
+
+    文件是 gzip 压缩的 JSON Lines，每行一条: ``{"t": 时间戳, "wxid": 机器人wxid, "data": 同步到的数据}``。
+    只追加不改写，重启后继续写在同一个文件末尾（gzip 允许多段拼接）。每隔 flush_interval 秒把缓冲写到磁盘，
+    进程意外退出时最多丢失这段时间内的数据，读取时会跳过末尾不完整的部分。
+
+    Args:
+        path: 保存路径，一般以 .jsonl.gz 结尾
+        flush_interval: 写到磁盘的间隔(秒)
+        only_messages: 为 True 时只记录带有新消息(AddMsgs)的数据，空的同步结果不记录
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5, only_messages: bool = True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.only_messages = only_messages
+
+        self._file: Optional[gzip.GzipFile] = None
+        self._last_flush = 0.0
+        self.records = 0
+        self.messages = 0
+
+    def record(self, data: Optional[Dict[str, Any]], wxid: str = ""):
+        """记录一次同步结果，写入失败只记日志，不影响消息处理"""
+        if not data:
+            return
+        add_msgs = data.get("AddMsgs") or []
+        if self.only_messages and not add_msgs:
+            return
+
+        try:
+            line = json.dumps({"t": time.time(), "wxid": wxid, "data": data}, ensure_ascii=False,
+                              separators=(",", ":"))
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = gzip.open(self.path, "ab")
+                self._last_flush = time.monotonic()
+            self._file.write(line.encode("utf-8") + b"\n")
+        except Exception as e:
+            logger.warning("记录同步消息失败: {}", e)
+            return
+
+        self.records += 1
+        self.messages += len(add_msgs)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            return
+        try:
+            # Z_SYNC_FLUSH 之后，已写入的部分即使没有正常关闭也能解压
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+        except Exception as e:
+            logger.warning("写入同步消息记录失败: {}", e)
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+        except Exception as e:
+            logger.warning("关闭同步消息记录失败: {}", e)
+        self._file = None
+        logger.info("同步消息记录已保存: {} 共 {} 次同步 {} 条消息", self.path, self.records, self.messages)
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, str, Dict[str, Any]]]:
+    """逐条读取记录文件，返回 (时间戳, 机器人wxid, 同步到的数据)，文件末尾不完整时在那里停止"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                yield record["t"], record.get("wxid", ""), record["data"]
+        except (EOFError, gzip.BadGzipFile, zlib.error, json.JSONDecodeError) as e:
+            logger.warning("同步消息记录 {} 末尾不完整，已读取到此为止: {}", path, e)
+
+
+async def replay_capture(path: str, submit: Callable[[Dict[str, Any]], Awaitable[Any]], speed: float = 1.0,
+                         on_sync: Callable[[Dict[str, Any]], Any] = None) -> int:
+    """按记录时的节奏把消息重新送入 submit（一般是 MessagePipeline.submit）
+
+    Args:
+        path: 记录文件
+        submit: 处理单条消息的协程函数，传入的是新反序列化出来的消息，可以随意修改
+        speed: 回放速度，1 为原速，10 为十倍速，0 为不等待、尽快送入
+        on_sync: 每次同步的数据送入前调用，例如 ``bot.contacts.apply_sync``
+
+    Returns:
+        int: 送入的消息数
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    first = None
+    count = 0
+    for timestamp, _, data in read_capture(path):
+        if first is None:
+            first = timestamp
+        if speed > 0:
+            # 按记录的时间对齐，处理慢了不会累积误差
+            delay = start + (timestamp - first) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if on_sync is not None:
+            on_sync(data)
+        for message in data.get("AddMsgs") or []:
+            await submit(message)
+            count += 1
+    return count
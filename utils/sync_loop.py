@@ -0,0 +1,164 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import aiohttp
+from loguru import logger
+
+
+class SyncLoop:
+    """同步消息的主循环
+
+    替代固定 sleep(0.5) 的轮询：
+
+    - 同步到新消息时马上再同步一次，消息多的时候不额外等待
+    - 没有新消息时等待时间从 min_interval 开始翻倍，最长 max_interval；接口本身是长轮询时把 max_interval 设为0
+    - 同步出错时等待时间从1秒开始翻倍，最长 max_error_interval，恢复后重置
+    - 设置了 push_url 时通过 websocket 接收推送的同步数据，连接断开后改回轮询，push_retry 秒后再尝试连接
+
+    同步到的数据先交给 ``bot.contacts.apply_sync`` 更新联系人缓存，再把每条新消息交给 submit（一般是 MessagePipeline.submit）。
+
+    Args:
+        bot: WechatAPI客户端
+        submit: 处理单条消息的协程函数，队列满时应当阻塞，从而暂停同步
+        min_interval: 没有新消息时第一次等待的时间(秒)
+        max_interval: 没有新消息时最长等待的时间(秒)
+        max_error_interval: 同步出错时最长等待的时间(秒)
+        push_url: WechatAPI 推送同步数据的 websocket 地址，为空时只轮询
+        push_retry: 推送连接失败后多久再尝试(秒)
+    """
+
+    def __init__(self, bot, submit: Callable[[Dict[str, Any]], Awaitable[Any]], min_interval: float = 0.05,
+                 max_interval: float = 0.5, max_error_interval: float = 60, push_url: str = "",
+                 push_retry: float = 30):
+        self.bot = bot
+        self.submit = submit
+        self.min_interval = max(min_interval, 0)
+        self.max_interval = max(max_interval, 0)
+        self.max_error_interval = max(max_error_interval, 1)
+        self.push_url = push_url
+        self.push_retry = push_retry
+
+        self.interval = 0.0
+        self._errors = 0
+        self._push_retry_at = 0.0
+        self._pushing = False
+
+        # 最近的同步时间和消息接收延迟，用于计算每秒同步次数和延迟分位数
+        self._poll_times: Deque[float] = deque(maxlen=10000)
+        self._delays: Deque[float] = deque(maxlen=1000)
+        self.polls = 0
+        self.empty_polls = 0
+        self.errors = 0
+        self.messages = 0
+        self.pushes = 0
+
+    async def run(self):
+        """一直运行，直到被取消"""
+        while True:
+            if self.push_url and time.monotonic() >= self._push_retry_at:
+                await self._run_push()
+                continue
+            await self._poll_once()
+
+    async def _poll_once(self):
+        if not self.bot.wxid:
+            # 还没登录
+            await asyncio.sleep(1)
+            return
+
+        try:
+            self.polls += 1
+            self._poll_times.append(time.monotonic())
+            data = await self.bot.sync_message()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.errors += 1
+            self._errors += 1
+            wait = min(2 ** (self._errors - 1), self.max_error_interval)
+            logger.warning("获取新消息失败 {}，{} 秒后重试", e, wait)
+            await asyncio.sleep(wait)
+            return
+
+        if self._errors:
+            logger.info("同步消息已恢复")
+            self._errors = 0
+
+        if await self._handle(data):
+            # 可能还有没同步完的消息，马上再同步一次
+            self.interval = 0
+            return
+
+        self.empty_polls += 1
+        self.interval = min(max(self.interval * 2, self.min_interval), self.max_interval)
+        if self.interval:
+            await asyncio.sleep(self.interval)
+
+    async def _run_push(self):
+        """接收推送直到连接断开，之后 push_retry 秒内改用轮询"""
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.ws_connect(self.push_url, heartbeat=30) as ws:
+                    logger.success("已连接同步消息推送: {}", self.push_url)
+                    self._pushing = True
+                    async for frame in ws:
+                        if frame.type != aiohttp.WSMsgType.TEXT:
+                            continue
+                        data = json.loads(frame.data)
+                        # 推送的格式和 /Sync 相同，可能带有外层的 Data
+                        data = data.get("Data", data) if isinstance(data, dict) else None
+                        self.pushes += 1
+                        if self.bot.sync_recorder is not None:
+                            self.bot.sync_recorder.record(data, self.bot.wxid)
+                        await self._handle(data)
+            logger.warning("同步消息推送连接已关闭，改为轮询")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("同步消息推送不可用，改为轮询: {}", e)
+        finally:
+            self._pushing = False
+        self._push_retry_at = time.monotonic() + self.push_retry
+
+    async def _handle(self, data: Optional[Dict[str, Any]]) -> int:
+        """处理一次同步到的数据，返回新消息数"""
+        if not data:
+            return 0
+
+        self.bot.contacts.apply_sync(data)
+
+        messages = data.get("AddMsgs") or []
+        now = time.time()
+        for message in messages:
+            create_time = message.get("CreateTime")
+            if create_time:
+                self._delays.append(max(now - create_time, 0))
+            await self.submit(message)  # 队列满时会在这里等待
+        self.messages += len(messages)
+        return len(messages)
+
+    def stats(self) -> Dict[str, Any]:
+        """获取同步状态
+
+        polls_per_sec 是最近一分钟的平均值；receive_delay 是消息从发出(CreateTime)到被同步到的时间，
+        CreateTime 只精确到秒，所以只适合看整体情况。
+        """
+        now = time.monotonic()
+        recent = sum(1 for t in self._poll_times if t > now - 60)
+        window = min(60.0, now - self._poll_times[0]) if self._poll_times else 0
+        delays = sorted(self._delays)
+        return {
+            "mode": "push" if self._pushing else "poll",
+            "polls": self.polls,
+            "empty_polls": self.empty_polls,
+            "errors": self.errors,
+            "messages": self.messages,
+            "pushes": self.pushes,
+            "interval": self.interval,
+            "polls_per_sec": round(recent / window, 2) if window else 0,
+            "receive_delay_p50": round(delays[len(delays) // 2], 3) if delays else 0,
+            "receive_delay_p99": round(delays[max(0, int(len(delays) * 0.99) - 1)], 3) if delays else 0,
+        }
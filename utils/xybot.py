@@ -1,7 +1,6 @@
 import html
 import re
 import tomllib
-import xml.etree.ElementTree as ET
 from typing import Dict, Any
 
 from loguru import logger
@@ -10,7 +9,11 @@ from WechatAPI import WechatAPIClient
 from WechatAPI.Client.protect import protector
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from utils.bot_stats import BotStats, MESSAGES, type_counter
 from utils.event_manager import EventManager
+from utils.lazy_media import LazyMedia
+from utils.message_xml import (parse_xml, ATUSERLIST_FIELDS, IMAGE_FIELDS, VOICE_FIELDS, XML_TYPE_FIELDS, FILE_FIELDS,
+                               PAT_FIELDS, QUOTE_FIELDS, QUOTED_APPMSG_FIELDS, parse_member_change)
 
 
 class XYBot:
@@ -32,7 +35,10 @@ class XYBot:
 
         self.msg_db = MessageDB()
         self.key_db = KeyvalDB()
+        self.stats = BotStats()
 
+        # 消息处理流水线，由 bot.py 创建
+        self.pipeline = None
 
     def update_profile(self, wxid: str, nickname: str, alias: str, phone: str):
         """更新机器人信息"""
@@ -44,11 +50,12 @@ class XYBot:
     async def process_message(self, message: Dict[str, Any]):
         """处理接收到的消息"""
 
-        # 数据库消息数+1先
-        await self.key_db.set("messages", str(int(await self.key_db.get("messages") or 0) + 1))
-
         msg_type = message.get("MsgType")
 
+        # 消息数+1先，只在内存中累加，定时写回数据库
+        self.stats.incr(MESSAGES)
+        self.stats.incr(type_counter(msg_type))
+
         # 预处理消息
         message["FromWxid"] = message.get("FromUserName").get("string")
         message.pop("FromUserName")
@@ -118,8 +125,7 @@ class XYBot:
             message["IsGroup"] = False
 
         try:
-            root = ET.fromstring(message["MsgSource"])
-            ats = root.find("atuserlist").text if root.find("atuserlist") is not None else ""
+            ats = ATUSERLIST_FIELDS.extract(parse_xml(message["MsgSource"]))["Ats"]
         except Exception as e:
             logger.error("解析文本消息失败: {}", e)
             return
@@ -194,6 +200,10 @@ class XYBot:
                     message["SenderWxid"],
                     message["Content"])
 
+        # 自己上传的图片，记下CDN XML，之后发送相同的图片直接转发
+        if message["SenderWxid"] == self.wxid:
+            self.bot.media_cache.observe(message["NewMsgId"], "image", message["Content"])
+
         await self.msg_db.save_message(
             msg_id=int(message["NewMsgId"]),
             sender_wxid=message["SenderWxid"],
@@ -204,20 +214,18 @@ class XYBot:
         )
 
         # 解析图片消息
-        aeskey, cdnmidimgurl = None, None
         try:
-            root = ET.fromstring(message["Content"])
-            img_element = root.find('img')
-            if img_element is not None:
-                aeskey = img_element.get('aeskey')
-                cdnmidimgurl = img_element.get('cdnmidimgurl')
+            fields = IMAGE_FIELDS.extract(parse_xml(message["Content"]))
+            aeskey, cdnmidimgurl = fields["aeskey"], fields["cdnmidimgurl"]
         except Exception as e:
             logger.error("解析图片消息失败: {}", e)
             return
 
-        # 下载图片
+        # 图片在处理函数第一次 await message["Content"] 时才下载；没有下载信息时 await 得到原始 XML
         if aeskey and cdnmidimgurl:
-            message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
+            message["Content"] = LazyMedia(lambda: self.bot.download_image(aeskey, cdnmidimgurl), "image")
+        else:
+            message["Content"] = LazyMedia.resolved(message["Content"], "image")
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
@@ -262,24 +270,22 @@ class XYBot:
 
         if message["IsGroup"] or not message.get("ImgBuf", {}).get("buffer", ""):
             # 解析语音消息
-            voiceurl, length = None, None
             try:
-                root = ET.fromstring(message["Content"])
-                voicemsg_element = root.find('voicemsg')
-                if voicemsg_element is not None:
-                    voiceurl = voicemsg_element.get('voiceurl')
-                    length = int(voicemsg_element.get('length'))
+                fields = VOICE_FIELDS.extract(parse_xml(message["Content"]))
+                voiceurl, length = fields["voiceurl"], fields["length"]
             except Exception as e:
                 logger.error("解析语音消息失败: {}", e)
                 return
 
-            # 下载语音
+            # 语音在处理函数第一次 await message["Content"] 时才下载和解码；没有下载信息时 await 得到原始 XML
             if voiceurl and length:
-                silk_base64 = await self.bot.download_voice(message["NewMsgId"], voiceurl, length)
-                message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
+                msg_id = message["NewMsgId"]
+                message["Content"] = LazyMedia(lambda: self._download_voice(msg_id, voiceurl, length), "voice")
+            else:
+                message["Content"] = LazyMedia.resolved(message["Content"], "voice")
         else:
             silk_base64 = message["ImgBuf"]["buffer"]
-            message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
+            message["Content"] = LazyMedia(lambda: self.bot.silk_base64_to_wav_byte(silk_base64), "voice")
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
@@ -287,6 +293,11 @@ class XYBot:
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    async def _download_voice(self, msg_id: str, voiceurl: str, length: int) -> bytes:
+        """下载语音并解码为wav"""
+        silk_base64 = await self.bot.download_voice(msg_id, voiceurl, length)
+        return await self.bot.silk_base64_to_wav_byte(silk_base64)
+
     async def process_xml_message(self, message: Dict[str, Any]):
         """处理xml消息"""
         message["Content"] = message.get("Content").get("string").replace("\n", "").replace("\t", "")
@@ -317,8 +328,7 @@ class XYBot:
 
         logger.info("保存xml消息: {}",message)
         try:
-            root = ET.fromstring(message["Content"])
-            type = int(root.find("appmsg").find("type").text)
+            type = XML_TYPE_FIELDS.extract(parse_xml(message["Content"]))["type"]
         except Exception as e:
             logger.error(f"解析xml消息失败: {e}")
             return
@@ -336,52 +346,18 @@ class XYBot:
     async def process_quote_message(self, message: Dict[str, Any]):
         """处理引用消息"""
         logger.info("处理引用消息: {}",message)
-        quote_messsage = {}
         try:
-            root = ET.fromstring(message["Content"])
-            appmsg = root.find("appmsg")
-            text = appmsg.find("title").text
-            refermsg = appmsg.find("refermsg")
-
-            quote_messsage["MsgType"] = int(refermsg.find("type").text)
-            quote_messsage["NewMsgId"] = refermsg.find("svrid").text
-            quote_messsage["ToWxid"] = refermsg.find("fromusr").text
-            quote_messsage["FromWxid"] = refermsg.find("chatusr").text
-            quote_messsage["Nickname"] = refermsg.find("displayname").text
-            quote_messsage["MsgSource"] = refermsg.find("msgsource").text
-            quote_messsage["Content"] = refermsg.find("content").text
-            quote_messsage["Createtime"] = refermsg.find("createtime").text
-            # if quote_messsage["MsgType"] == 1:  # 文本消息
-            #     quote_messsage["NewMsgId"] = refermsg.find("svrid").text
-            #     quote_messsage["ToWxid"] = refermsg.find("fromusr").text
-            #     quote_messsage["FromWxid"] = refermsg.find("chatusr").text
-            #     quote_messsage["Nickname"] = refermsg.find("displayname").text
-            #     quote_messsage["MsgSource"] = refermsg.find("msgsource").text
-            #     quote_messsage["Content"] = refermsg.find("content").text
-            #     quote_messsage["Createtime"] = refermsg.find("createtime").text
-
-            # elif quote_messsage["MsgType"] in [48, 3]:  # 地图消息, 图片消息
-            #     quote_messsage["NewMsgId"] = refermsg.find("svrid").text
-            #     quote_messsage["ToWxid"] = refermsg.find("fromusr").text
-            #     quote_messsage["FromWxid"] = refermsg.find("chatusr").text
-            #     quote_messsage["Nickname"] = refermsg.find("displayname").text
-            #     quote_messsage["Content"] = refermsg.find("content").text
-            #     quote_messsage["Createtime"] = refermsg.find("createtime").text
-            #     quote_messsage["MsgSource"] = refermsg.find("msgsource").text
-
-            if quote_messsage["MsgType"] == 49 :  # 引用消息
-                # quote_messsage["NewMsgId"] = refermsg.find("svrid").text
-                # quote_messsage["ToWxid"] = refermsg.find("fromusr").text
-                # quote_messsage["FromWxid"] = refermsg.find("chatusr").text
-                # quote_messsage["Nickname"] = refermsg.find("displayname").text
-                # quote_messsage["MsgSource"] = refermsg.find("msgsource").text
-                # quote_messsage["Createtime"] = refermsg.find("createtime").text
-
-                # quote_messsage["Content"] = refermsg.find("content").text
-                
+            # 引用消息和 process_xml_message 解析的是同一段内容，直接复用解析结果
+            fields = QUOTE_FIELDS.extract(parse_xml(message["Content"]))
+            text = fields["Content"]
+            quote_messsage = fields["Quote"]
+            if quote_messsage["MsgType"] is None:
+                raise ValueError("缺少refermsg")
+
+            if quote_messsage["MsgType"] == 49:  # 引用消息
                 # 先转义 小程序的应用消息没有转义
-                xml_start = quote_messsage["Content"].find('<?xml')    
-                xml_content = ""           
+                xml_start = quote_messsage["Content"].find('<?xml')
+                xml_content = ""
                 if xml_start != -1:
                     unescaped_xml = html.unescape(quote_messsage["Content"])
                     # 把开头的微信id移除掉
@@ -392,61 +368,7 @@ class XYBot:
                     xml_content = quote_messsage["Content"]
                 logger.info(f"xml_content -> {xml_content}")
 
-                quote_root = ET.fromstring(xml_content)
-                quote_appmsg = quote_root.find("appmsg")
-
-                quote_messsage["Content"] = quote_appmsg.find("title").text if isinstance(quote_appmsg.find("title"),
-                                                                                          ET.Element) else ""
-                quote_messsage["destination"] = quote_appmsg.find("des").text if isinstance(quote_appmsg.find("des"),
-                                                                                            ET.Element) else ""
-                quote_messsage["action"] = quote_appmsg.find("action").text if isinstance(quote_appmsg.find("action"),
-                                                                                          ET.Element) else ""
-                quote_messsage["XmlType"] = int(quote_appmsg.find("type").text) if isinstance(quote_appmsg.find("type"),
-                                                                                              ET.Element) else 0
-                quote_messsage["showtype"] = int(quote_appmsg.find("showtype").text) if isinstance(
-                    quote_appmsg.find("showtype"), ET.Element) else 0
-                quote_messsage["soundtype"] = int(quote_appmsg.find("soundtype").text) if isinstance(
-                    quote_appmsg.find("soundtype"), ET.Element) else 0
-                quote_messsage["url"] = quote_appmsg.find("url").text if isinstance(quote_appmsg.find("url"),
-                                                                                    ET.Element) else ""
-                quote_messsage["lowurl"] = quote_appmsg.find("lowurl").text if isinstance(quote_appmsg.find("lowurl"),
-                                                                                          ET.Element) else ""
-                quote_messsage["dataurl"] = quote_appmsg.find("dataurl").text if isinstance(
-                    quote_appmsg.find("dataurl"), ET.Element) else ""
-                quote_messsage["lowdataurl"] = quote_appmsg.find("lowdataurl").text if isinstance(
-                    quote_appmsg.find("lowdataurl"), ET.Element) else ""
-                quote_messsage["songlyric"] = quote_appmsg.find("songlyric").text if isinstance(
-                    quote_appmsg.find("songlyric"), ET.Element) else ""
-                quote_messsage["appattach"] = {}
-                quote_messsage["appattach"]["totallen"] = int(
-                    quote_appmsg.find("appattach").find("totallen").text) if isinstance(
-                    quote_appmsg.find("appattach").find("totallen"), ET.Element) else 0
-                quote_messsage["appattach"]["attachid"] = quote_appmsg.find("appattach").find(
-                    "attachid").text if isinstance(quote_appmsg.find("appattach").find("attachid"), ET.Element) else ""
-                quote_messsage["appattach"]["emoticonmd5"] = quote_appmsg.find("appattach").find(
-                    "emoticonmd5").text if isinstance(quote_appmsg.find("appattach").find("emoticonmd5"),
-                                                      ET.Element) else ""
-                quote_messsage["appattach"]["fileext"] = quote_appmsg.find("appattach").find(
-                    "fileext").text if isinstance(quote_appmsg.find("appattach").find("fileext"), ET.Element) else ""
-                quote_messsage["appattach"]["cdnthumbaeskey"] = quote_appmsg.find("appattach").find(
-                    "cdnthumbaeskey").text if isinstance(quote_appmsg.find("appattach").find("cdnthumbaeskey"),
-                                                         ET.Element) else ""
-                quote_messsage["appattach"]["aeskey"] = quote_appmsg.find("appattach").find(
-                    "aeskey").text if isinstance(quote_appmsg.find("appattach").find("aeskey"), ET.Element) else ""
-                quote_messsage["extinfo"] = quote_appmsg.find("extinfo").text if isinstance(
-                    quote_appmsg.find("extinfo"), ET.Element) else ""
-                quote_messsage["sourceusername"] = quote_appmsg.find("sourceusername").text if isinstance(
-                    quote_appmsg.find("sourceusername"), ET.Element) else ""
-                quote_messsage["sourcedisplayname"] = quote_appmsg.find("sourcedisplayname").text if isinstance(
-                    quote_appmsg.find("sourcedisplayname"), ET.Element) else ""
-                quote_messsage["thumburl"] = quote_appmsg.find("thumburl").text if isinstance(
-                    quote_appmsg.find("thumburl"), ET.Element) else ""
-                quote_messsage["md5"] = quote_appmsg.find("md5").text if isinstance(quote_appmsg.find("md5"),
-                                                                                    ET.Element) else ""
-                quote_messsage["statextstr"] = quote_appmsg.find("statextstr").text if isinstance(
-                    quote_appmsg.find("statextstr"), ET.Element) else ""
-                quote_messsage["directshare"] = int(quote_appmsg.find("directshare").text) if isinstance(
-                    quote_appmsg.find("directshare"), ET.Element) else 0
+                quote_messsage.update(QUOTED_APPMSG_FIELDS.extract(parse_xml(xml_content)))
 
         except Exception as e:
             logger.error(f"解析引用消息失败: {e}")
@@ -493,6 +415,9 @@ class XYBot:
                     message["SenderWxid"],
                     str(message["Content"]).replace("\n", ""))
 
+        if message["SenderWxid"] == self.wxid:
+            self.bot.media_cache.observe(message["NewMsgId"], "video", message["Content"])
+
         await self.msg_db.save_message(
             msg_id=int(message["NewMsgId"]),
             sender_wxid=message["SenderWxid"],
@@ -502,7 +427,8 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["Video"] = await self.bot.download_video(message["NewMsgId"])
+        msg_id = message["NewMsgId"]
+        message["Video"] = LazyMedia(lambda: self.bot.download_video(msg_id), "video")
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
@@ -513,10 +439,10 @@ class XYBot:
     async def process_file_message(self, message: Dict[str, Any]):
         """处理文件消息"""
         try:
-            root = ET.fromstring(message["Content"])
-            filename = root.find("appmsg").find("title").text
-            attach_id = root.find("appmsg").find("appattach").find("attachid").text
-            file_extend = root.find("appmsg").find("appattach").find("fileext").text
+            fields = FILE_FIELDS.extract(parse_xml(message["Content"]))
+            filename, attach_id, file_extend = fields["Filename"], fields["AttachId"], fields["FileExtend"]
+            if attach_id is None:
+                raise ValueError("缺少attachid")
         except Exception as error:
             logger.error(f"解析文件消息失败: {error}")
             return
@@ -539,7 +465,7 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["File"] = await self.bot.download_attach(attach_id)
+        message["File"] = LazyMedia(lambda: self.bot.download_attach(attach_id), "file")
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
@@ -568,12 +494,16 @@ class XYBot:
             message["IsGroup"] = False
 
         try:
-            root = ET.fromstring(message["Content"])
-            msg_type = root.attrib["type"]
+            msg_type = parse_xml(message["Content"]).attrib["type"]
         except Exception as e:
             logger.error(f"解析系统消息失败: {e}")
             return
 
+        if message["IsGroup"] and msg_type != "pat":
+            # 进群、退群、改群名等都会改变群聊的联系人信息
+            self.bot.contacts.invalidate(message["FromWxid"])
+            self.update_chatroom_members(message)
+
         if msg_type == "pat":
             await self.process_pat_message(message)
         elif msg_type == "ClientCheckGetExtInfo":
@@ -586,22 +516,24 @@ class XYBot:
                 else:
                     logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    def update_chatroom_members(self, message: Dict[str, Any]):
+        """根据进群、踢人的系统消息增量更新群成员列表缓存"""
+        action, members = parse_member_change(parse_xml(message["Content"]))
+        if action == "join":
+            self.bot.chatroom_members.add(message["FromWxid"], [{"UserName": member["wxid"],
+                                                                 "NickName": member["nickname"]}
+                                                                for member in members])
+        elif action == "kick":
+            self.bot.chatroom_members.remove(message["FromWxid"], [member["wxid"] for member in members])
+
     async def process_pat_message(self, message: Dict[str, Any]):
         """处理拍一拍请求消息"""
         try:
-            root = ET.fromstring(message["Content"])
-            pat = root.find("pat")
-            patter = pat.find("fromusername").text
-            patted = pat.find("pattedusername").text
-            pat_suffix = pat.find("patsuffix").text
+            message.update(PAT_FIELDS.extract(parse_xml(message["Content"])))
         except Exception as e:
             logger.error(f"解析拍一拍消息失败: {e}")
             return
 
-        message["Patter"] = patter
-        message["Patted"] = patted
-        message["PatSuffix"] = pat_suffix
-
         logger.info("收到拍一拍消息: 消息ID:{} 来自:{} 发送人:{} 拍者:{} 被拍:{} 后缀:{}",
                     message["NewMsgId"],
                     message["FromWxid"],